@@ -44,6 +44,7 @@ def job_history(job_id):
             return jsonify({
                 "job_id": job_id,
                 "status": overall_status,
+                "preview_ready": job_data.get('preview_status') == "PreviewReady",
                 "timestamp": job_data.get('timestamp')
             })
         else:
@@ -27,6 +27,22 @@ def test_job_history_complete(mock_firestore, client):
     assert res.status_code == 200
     assert res.json["status"] == "complete"
 
+@patch("app.firestore_client")
+def test_job_history_preview_ready(mock_firestore, client):
+    mock_doc = MagicMock()
+    mock_doc.exists = True
+    mock_doc.to_dict.return_value = {
+        "lyrics_status": "inProcess",
+        "vocals_status": "inProcess",
+        "preview_status": "PreviewReady"
+    }
+    mock_firestore.collection.return_value.document.return_value.get.return_value = mock_doc
+
+    res = client.get("/job-history/job123")
+    assert res.status_code == 200
+    assert res.json["status"] == "inProcess"
+    assert res.json["preview_ready"] is True
+
 @patch("app.firestore_client")
 def test_job_history_not_found(mock_firestore, client):
     mock_doc = MagicMock()
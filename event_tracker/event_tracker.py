@@ -47,6 +47,9 @@ def update_firestore(job_id, song_id, source, status, timestamp, error_message):
         raise ValueError(f"Unknown service source: {source}")
 
     status_field = field_map[source]
+    if status == "PreviewReady":
+        # A playable instrumental prefix exists; the split itself is still running.
+        status_field = "preview_status"
 
     update_data = {
         status_field: status,
@@ -77,10 +80,12 @@ def handle_job_update(data):
     if not all([job_id, song_id, timestamp, status]):
         raise ValueError("Missing required fields for processing update")
 
-    if status not in ["Completed", "Failed"]:
-        raise ValueError(f"Invalid status: {status}. Must be 'Completed' or 'Failed'.")
+    if status not in ["Completed", "Failed", "PreviewReady"]:
+        raise ValueError(f"Invalid status: {status}. Must be 'Completed', 'Failed' or 'PreviewReady'.")
 
     source = data.get("source")
+    if status == "PreviewReady" and source != "splitter":
+        raise ValueError(f"Only the splitter can publish previews, got source: {source}")
     update_firestore(job_id, song_id, source, status, timestamp, error_message)
 
 # Handle "history" source: track song in user history
@@ -53,6 +53,34 @@ class TestEventTrackerCallback(unittest.TestCase):
         mock_handler.assert_called_once_with(message)
         self.mock_ch.basic_ack.assert_called_once()
 
+    @patch("event_tracker.update_firestore")
+    def test_splitter_preview_ready_updates_preview_status(self, mock_update):
+        from event_tracker import handle_job_update
+        message = {
+            "source": "splitter",
+            "job_id": "job1",
+            "song_id": "song2",
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "PreviewReady"
+        }
+
+        handle_job_update(message)
+        mock_update.assert_called_once_with("job1", "song2", "splitter", "PreviewReady",
+                                            message["timestamp"], "NULL")
+
+    def test_preview_ready_from_lyrics_syncer_is_rejected(self):
+        from event_tracker import handle_job_update
+        message = {
+            "source": "lyrics_syncer",
+            "job_id": "job1",
+            "song_id": "song2",
+            "timestamp": datetime.utcnow().isoformat(),
+            "status": "PreviewReady"
+        }
+
+        with self.assertRaises(ValueError):
+            handle_job_update(message)
+
     def test_invalid_source_raises_nack(self):
         from event_tracker import callback
         message = {
@@ -7,11 +7,18 @@ from google.oauth2 import service_account
 from dotenv import load_dotenv
 import os
 import uuid
+import shutil
+import tempfile
 import pika
 import json
-from shared.gcs_utils import upload_file_to_gcs, gcs_file_exists
+from shared.gcs_utils import (
+    upload_file_to_gcs, upload_bytes_to_gcs, gcs_file_exists, get_stem_artifact, STEM_RENDITIONS,
+    ORIGINAL_RENDITIONS, find_original_url, get_original_url
+)
+from shared.lyrics_store import lookup_lyrics
 import yt_dlp
 from shared import constants
+from shared.lyrics_timing import COMPACT_ARTIFACT as LYRICS_COMPACT_ARTIFACT
 from urllib.parse import quote_plus
 from flask_cors import CORS
 
@@ -72,6 +79,23 @@ def generate_signed_url(bucket_name, blob_name, expiration_minutes=10):
     )
     return url
 
+def get_stem_sources(song_id, stem):
+    # The renditions the splitter writes for this stem, smallest first; the browser plays the
+    # first <source> whose type it supports. Full stems also list WAV, the only rendition of
+    # songs split before compressed stems existed. Previews were never written as WAV.
+    if stem.endswith("_preview"):
+        written = constants.PREVIEW_FORMATS
+    else:
+        written = constants.STEM_OUTPUT_FORMATS + ["wav"]
+    formats = [f for f in STEM_RENDITIONS if f in written]
+    return [
+        {
+            "url": generate_signed_url(BUCKET_NAME, f"songs/{song_id}/{get_stem_artifact(stem, fmt)}"),
+            "type": STEM_RENDITIONS[fmt][1]
+        }
+        for fmt in formats
+    ]
+
 def get_title_artist_from_genius(song_id):
     headers = {"Authorization": f"Bearer {GENIUS_API_KEY}"}
     response = requests.get(f"https://api.genius.com/songs/{song_id}", headers=headers)
@@ -187,82 +211,18 @@ def search():
     print("Genius error:", response.status_code, response.text)
     return jsonify([])
 
-def build_azlyrics_url(artist, title):
-    artist = re.split(r'\s*(?:ft\.?|feat\.?|featuring|&|,|/|\+|x)\s*', artist, flags=re.IGNORECASE)[0]
-    def clean(string):
-        return re.sub(r'[^a-z0-9]', '', string.lower())
-    return f"https://www.azlyrics.com/lyrics/{clean(artist)}/{clean(title)}.html"
-
-def scrape_azlyrics(url):
-    headers = {"User-Agent": "Mozilla/5.0"}
-    res = requests.get(url, headers=headers)
-    if res.status_code != 200:
-        raise Exception(f"Failed to fetch AZLyrics: {res.status_code}")
-    
-    from bs4 import BeautifulSoup
-    soup = BeautifulSoup(res.text, "html.parser")
-    divs = soup.find_all("div", attrs={"class": None, "id": None})
-
-    for div in divs:
-        if div.text.strip():
-            lines = div.text.strip().splitlines()
-            cleaned_lines = []
-            for line in lines:
-                stripped = line.strip()
-                if stripped.startswith("[Explicit:]"):
-                    continue
-                stripped = re.sub(r"^\[\s*clean[^\]]*\]\s*:? ?", "", stripped, flags=re.IGNORECASE)
-                cleaned_lines.append(stripped)
-            return "\n".join(cleaned_lines)
-
-    raise Exception("No valid lyrics div found.")
-
 def download_lyrics_and_upload(song_id, title, artist):
-    print(f"[Lyrics] Attempting AZLyrics for: {artist} - {title}")
-    lyrics = None
-    try:
-        url = build_azlyrics_url(artist, title)
-        lyrics = scrape_azlyrics(url)
-        print(f"[Lyrics] Scraped from AZLyrics")
-    except Exception as e:
-        print(f"[Lyrics] AZLyrics failed: {e}")
-        print(f"[Lyrics] Trying Genius fallback...")
-
-        # Genius fallback
-        headers = {"User-Agent": "Mozilla/5.0"}
-        genius_url = f"https://genius.com/songs/{song_id}"
-        try:
-            res = requests.get(genius_url, headers=headers)
-            if res.status_code != 200:
-                raise Exception(f"Genius failed: {res.status_code}")
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(res.text, "html.parser")
-            divs = soup.find_all("div", {"data-lyrics-container": "true"})
-            if not divs:
-                raise Exception("No Genius lyrics found")
-
-            lyrics = "\n".join([
-                elem.get_text(separator="\n").strip()
-                for div in divs
-                for elem in div.children
-                if (elem.name is None or elem.name == "a")
-            ])
-        except Exception as gerr:
-            print(f"[Lyrics] Genius fallback also failed: {gerr}")
-            return None
-
-    if not lyrics or not lyrics.strip():
-        print(f"[Lyrics] Both AZLyrics and Genius returned empty.")
+    print(f"[Lyrics] Fetching lyrics for: {artist} - {title}")
+    found = lookup_lyrics(artist, title, song_id)
+    if not found:
+        print(f"[Lyrics] Neither AZLyrics nor Genius had lyrics.")
         return None
-
-    local_path = os.path.join(DOWNLOAD_FOLDER, f"{song_id}_lyrics.txt")
-    with open(local_path, "w") as f:
-        f.write(lyrics)
+    source, lyrics = found
 
     gcs_path = f"songs/{song_id}/lyrics.txt"
-    upload_file_to_gcs(f"gs://{BUCKET_NAME}/{gcs_path}", local_path)
-    os.remove(local_path)
-    print(f"[Lyrics] Uploaded lyrics.txt to GCS: {gcs_path}")
+    upload_bytes_to_gcs(f"gs://{BUCKET_NAME}/{gcs_path}", lyrics.encode("utf-8"),
+                        content_type="text/plain; charset=utf-8")
+    print(f"[Lyrics] Uploaded {source} lyrics.txt to GCS: {gcs_path}")
     return True
 
 
@@ -315,32 +275,43 @@ def download_song_to_gcs_and_queue_job(song_id, song_name, artist_name):
     print(f"Downloading: {song_name} by {artist_name} (ID: {song_id})")
 
     query = f"{song_name} {artist_name} audio"
-    local_wav_path = os.path.join(DOWNLOAD_FOLDER, f"{song_id}.wav")
-    gcs_audio_path = f"songs/{song_id}/original.wav"
     gcs_lyrics_path = f"songs/{song_id}/lyrics.txt"
 
-    # Skip download if audio already exists
-    if not gcs_file_exists(f"gs://{BUCKET_NAME}/{gcs_audio_path}"):
+    # Skip download if audio already exists, in any format. The source stream
+    # (usually Opus or M4A) is stored as is; the splitter decodes it on read.
+    if not find_original_url(song_id):
+        # A directory per call, so a leftover or a concurrent download of the same song is never uploaded instead.
+        os.makedirs(DOWNLOAD_FOLDER, exist_ok=True)
+        job_dir = tempfile.mkdtemp(prefix=f"{song_id}-", dir=DOWNLOAD_FOLDER)
         ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': os.path.join(DOWNLOAD_FOLDER, f"{song_id}.%(ext)s"),
+            'format': 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best',
+            'outtmpl': os.path.join(job_dir, "original.%(ext)s"),
             'postprocessors': [
                 {
                     'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'wav',
-                    'preferredquality': '192',
+                    'preferredcodec': 'best',
                 }
             ],
         }
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([f"ytsearch:{query}"])
+                results = ydl.extract_info(f"ytsearch1:{query}", download=True)
+            entries = list(results.get("entries") or [])
+            if not entries:
+                raise FileNotFoundError(f"No YouTube results for: {query}")
+            # The file left after the postprocessors ran, e.g. original.opus.
+            local_path = entries[0]["requested_downloads"][0]["filepath"]
+            fmt = os.path.splitext(local_path)[1].lstrip(".").lower()
+            if fmt not in ORIGINAL_RENDITIONS:
+                raise ValueError(f"Unsupported audio format downloaded for {song_id}: {fmt}")
+            upload_file_to_gcs(get_original_url(song_id, fmt), local_path,
+                               content_type=ORIGINAL_RENDITIONS[fmt][1])
         except Exception as e:
             print(f"Error downloading from YouTube: {e}")
             raise
-        upload_file_to_gcs(f"gs://{BUCKET_NAME}/{gcs_audio_path}", local_wav_path)
-        os.remove(local_wav_path)
-        print(f"Upload complete for: {song_id}")
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        print(f"Upload complete for: {song_id} ({fmt})")
     else:
         print(f"[Skip] Audio already exists in GCS for {song_id}")
 
@@ -586,7 +557,9 @@ def get_lyrics(song_path):
     if res.status_code != 200:
         return "Failed to fetch lyrics", 500
 
-    return Response(res.content, content_type='application/json')
+    # The compact timing file is stored gzipped; let the browser inflate it.
+    headers = {'Content-Encoding': 'gzip'} if song_path.endswith('.gz') else None
+    return Response(res.content, content_type='application/json', headers=headers)
 
 @app.route('/song/<song_id>')
 def song_page(song_id):
@@ -605,8 +578,8 @@ def song_page(song_id):
     # Fetch similar songs
     similar_songs = get_similar_songs_from_lastfm(artist, track)
 
-    audio_blob = f"songs/{song_id}/instrumental.wav"
-    song_url = generate_signed_url(BUCKET_NAME, audio_blob)
+    # Fall back to the instrumental preview while the full split is still being produced.
+    audio_sources = get_stem_sources(song_id, "instrumental") + get_stem_sources(song_id, "instrumental_preview")
 
     # user_email = session.get("email")
     # if user_email:
@@ -638,8 +611,9 @@ def song_page(song_id):
                         song_title=raw_title,
                         song_artist=raw_artist,
                         song_id=song_id,
-                        song_url=song_url,
+                        audio_sources=audio_sources,
                         lyrics_url=f"/get_lyrics/{song_id}/lyrics.json",
+                        compact_lyrics_url=f"/get_lyrics/{song_id}/{LYRICS_COMPACT_ARTIFACT}",
                         similar_songs=similar_songs)
 
 # @app.route('/local_status/<job_id>')
@@ -660,6 +634,10 @@ def song_page(song_id):
 #         frontend_check_url=frontend_check_url
 #     )
 
+@app.route('/preview_sources/<song_id>')
+def preview_sources(song_id):
+    return jsonify(get_stem_sources(song_id, "instrumental_preview"))
+
 @app.route('/processing/<job_id>')
 def processing_page(job_id):
     title = request.args.get("title", "Loading...")
@@ -10,6 +10,8 @@ import uuid
 import pika
 import json
 from shared import constants
+from shared.lyrics_timing import COMPACT_ARTIFACT as LYRICS_COMPACT_ARTIFACT
+from shared.gcs_utils import get_stem_artifact, STEM_RENDITIONS
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -86,6 +88,23 @@ def generate_signed_url(bucket_name, blob_name, expiration_minutes=10):
     )
     return url
 
+def get_stem_sources(song_id, stem):
+    # The renditions the splitter writes for this stem, smallest first; the browser plays the
+    # first <source> whose type it supports. Full stems also list WAV, the only rendition of
+    # songs split before compressed stems existed. Previews were never written as WAV.
+    if stem.endswith("_preview"):
+        written = constants.PREVIEW_FORMATS
+    else:
+        written = constants.STEM_OUTPUT_FORMATS + ["wav"]
+    formats = [f for f in STEM_RENDITIONS if f in written]
+    return [
+        {
+            "url": generate_signed_url(BUCKET_NAME, f"songs/{song_id}/{get_stem_artifact(stem, fmt)}"),
+            "type": STEM_RENDITIONS[fmt][1]
+        }
+        for fmt in formats
+    ]
+
 def get_title_artist_from_genius(song_id):
     headers = {"Authorization": f"Bearer {GENIUS_API_KEY}"}
     response = requests.get(f"https://api.genius.com/songs/{song_id}", headers=headers)
@@ -258,7 +277,9 @@ def get_lyrics(song_path):
     if res.status_code != 200:
         return "Failed to fetch lyrics", 500
 
-    return Response(res.content, content_type='application/json')
+    # The compact timing file is stored gzipped; let the browser inflate it.
+    headers = {'Content-Encoding': 'gzip'} if song_path.endswith('.gz') else None
+    return Response(res.content, content_type='application/json', headers=headers)
 
 @app.route('/song/<song_id>')
 def song_page(song_id):
@@ -277,8 +298,8 @@ def song_page(song_id):
     # Fetch similar songs
     similar_songs = get_similar_songs_from_lastfm(artist, track)
 
-    audio_blob = f"songs/{song_id}/instrumental.wav"
-    song_url = generate_signed_url(BUCKET_NAME, audio_blob)
+    # Fall back to the instrumental preview while the full split is still being produced.
+    audio_sources = get_stem_sources(song_id, "instrumental") + get_stem_sources(song_id, "instrumental_preview")
 
     user_email = session.get("email")
     if user_email:
@@ -305,8 +326,9 @@ def song_page(song_id):
                         song_title=raw_title,
                         song_artist=raw_artist,
                         song_id=song_id,
-                        song_url=song_url,
+                        audio_sources=audio_sources,
                         lyrics_url=f"/get_lyrics/{song_id}/lyrics.json",
+                        compact_lyrics_url=f"/get_lyrics/{song_id}/{LYRICS_COMPACT_ARTIFACT}",
                         similar_songs=similar_songs)
 
 @app.route('/start_processing', methods=['POST'])
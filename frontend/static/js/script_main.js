@@ -119,11 +119,61 @@ function formatTime(seconds) {
     return `${m}:${s.toString().padStart(2, '0')}`;
 }
 
+const compactLyricsUrl = lyricsDiv.dataset.compact;
+const COMPACT_LYRICS_VERSION = 1;
+
 let lyrics = [];
 let currentLineIndex = -1;
+let currentWordEl = null;
 
-fetch(lyricsUrl)
-    .then(res => res.json())
+// Inverse of shared/lyrics_timing.py encode_compact(): delta-encoded tick columns
+// back to lyrics.json entries ({line, start, end, words?}).
+function decodeCompactLyrics(data) {
+    if (data.v !== COMPACT_LYRICS_VERSION) {
+        throw new Error(`Unsupported compact lyrics version ${data.v}`);
+    }
+    const result = [];
+    let lineTick = 0;
+    let wordTick = 0;
+    let wordIndex = 0;
+    data.lines.forEach((text, i) => {
+        lineTick += data.line_start[i];
+        const entry = { line: text, start: lineTick * data.unit, end: (lineTick + data.line_length[i]) * data.unit };
+        const count = data.word_count[i];
+        if (count >= 0) {
+            const words = text.split(" ");
+            entry.words = [];
+            for (let k = 0; k < count; k++, wordIndex++) {
+                wordTick += data.word_start[wordIndex];
+                entry.words.push({
+                    word: words[k] || "",
+                    start: wordTick * data.unit,
+                    end: (wordTick + data.word_length[wordIndex]) * data.unit
+                });
+            }
+        }
+        result.push(entry);
+    });
+    return result;
+}
+
+function fetchJson(url) {
+    return fetch(url).then(res => {
+        if (!res.ok) throw new Error(`${url}: ${res.status}`);
+        return res.json();
+    });
+}
+
+// Prefer the compact timing file; songs synced before it existed (or any decode
+// problem) fall back to the plain lyrics.json.
+function loadLyrics() {
+    if (!compactLyricsUrl) return fetchJson(lyricsUrl);
+    return fetchJson(compactLyricsUrl)
+        .then(decodeCompactLyrics)
+        .catch(() => fetchJson(lyricsUrl));
+}
+
+loadLyrics()
     .then(data => {
         lyrics = data;
         renderLyricsLines();
@@ -135,12 +185,41 @@ function renderLyricsLines() {
 
     lyrics.forEach((lineObj, index) => {
         const div = document.createElement("div");
-        div.textContent = lineObj.line;
         div.id = `line-${index}`;
+        if (lineObj.words && lineObj.words.length) {
+            lineObj.words.forEach((wordObj, w) => {
+                const span = document.createElement("span");
+                span.textContent = wordObj.word;
+                span.id = `word-${index}-${w}`;
+                span.className = "lyric-word";
+                div.appendChild(span);
+                if (w < lineObj.words.length - 1) div.appendChild(document.createTextNode(" "));
+            });
+        } else {
+            div.textContent = lineObj.line;
+        }
         lyricsDiv.appendChild(div);
     });
 }
 
+function highlightWord(lineIndex, t) {
+    const words = lyrics[lineIndex] && lyrics[lineIndex].words;
+    let wordEl = null;
+    if (words) {
+        for (let w = words.length - 1; w >= 0; w--) {
+            if (t >= words[w].start) {
+                wordEl = document.getElementById(`word-${lineIndex}-${w}`);
+                break;
+            }
+        }
+    }
+    if (wordEl !== currentWordEl) {
+        if (currentWordEl) currentWordEl.classList.remove("sung");
+        if (wordEl) wordEl.classList.add("sung");
+        currentWordEl = wordEl;
+    }
+}
+
 function highlightLine(index) {
     // Remove existing highlight
     document.querySelectorAll(".highlight").forEach(el => el.classList.remove("highlight"));
@@ -183,6 +262,7 @@ audio.ontimeupdate = () => {
                 currentLineIndex = i;
                 highlightLine(i);
             }
+            highlightWord(i, t);
             break;
         }
     }
@@ -0,0 +1,60 @@
+"""
+Limits for the downloads one downloader process runs at once.
+
+DiskBudget caps the local disk all in-flight downloads use together: each job
+reserves what it expects to write before it starts and waits while the budget
+is spent. deadline_hook() gives yt_dlp a wall-clock limit per download.
+"""
+import contextlib
+import threading
+import time
+
+# For streams that report neither filesize nor filesize_approx: a generous 256 kbit/s.
+FALLBACK_BYTES_PER_SECOND = 256 * 1000 // 8
+
+
+class DownloadTimeout(TimeoutError):
+    pass
+
+
+class DiskBudget:
+    """
+    Bytes of local disk shared by concurrent downloads; reserve() blocks until enough
+    is free, or raises DownloadTimeout once timeout seconds have passed.
+    """
+
+    def __init__(self, cap_bytes: int):
+        self.cap_bytes = cap_bytes
+        self.used_bytes = 0
+        self.condition = threading.Condition()
+
+    @contextlib.contextmanager
+    def reserve(self, nbytes: int, timeout: float = None):
+        if nbytes > self.cap_bytes:
+            raise ValueError(f"Download needs {nbytes / 2**20:.0f} MB, over the "
+                             f"{self.cap_bytes / 2**20:.0f} MB disk cap")
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.used_bytes + nbytes <= self.cap_bytes, timeout):
+                raise DownloadTimeout(f"No room for {nbytes / 2**20:.0f} MB of downloads within {timeout:.0f}s")
+            self.used_bytes += nbytes
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.used_bytes -= nbytes
+                self.condition.notify_all()
+
+
+def expected_disk_bytes(info) -> int:
+    """Disk a yt_dlp result will take at its peak: the downloaded stream and the remuxed copy made from it."""
+    duration = info.get("duration") or 0
+    stream = info.get("filesize") or info.get("filesize_approx") or duration * FALLBACK_BYTES_PER_SECOND
+    return int(2 * stream)
+
+
+def deadline_hook(deadline: float):
+    """yt_dlp progress/postprocessor hook that aborts the job once time.monotonic() passes deadline."""
+    def hook(status):
+        if time.monotonic() > deadline:
+            raise DownloadTimeout(f"Download ran past its time limit ({status.get('status')})")
+    return hook
@@ -0,0 +1,63 @@
+import unittest
+import threading
+import time
+
+from download_limits import DiskBudget, DownloadTimeout, deadline_hook, expected_disk_bytes
+
+
+class TestDiskBudget(unittest.TestCase):
+
+    def test_reservations_wait_for_room(self):
+        budget = DiskBudget(100)
+        order = []
+
+        def second():
+            with budget.reserve(60):
+                order.append("second")
+
+        with budget.reserve(60):
+            t = threading.Thread(target=second)
+            t.start()
+            time.sleep(0.1)
+            order.append("first done")
+        t.join(2)
+
+        self.assertEqual(order, ["first done", "second"])
+        self.assertEqual(budget.used_bytes, 0)
+
+    def test_small_jobs_share_the_budget(self):
+        budget = DiskBudget(100)
+        with budget.reserve(40), budget.reserve(40):
+            self.assertEqual(budget.used_bytes, 80)
+            with self.assertRaises(TimeoutError):
+                with budget.reserve(40, timeout=0.05):
+                    pass
+        self.assertEqual(budget.used_bytes, 0)
+
+    def test_jobs_bigger_than_the_cap_fail(self):
+        with self.assertRaises(ValueError):
+            with DiskBudget(100).reserve(101):
+                pass
+
+    def test_reservation_is_released_on_error(self):
+        budget = DiskBudget(100)
+        with self.assertRaises(RuntimeError):
+            with budget.reserve(50):
+                raise RuntimeError("download failed")
+        self.assertEqual(budget.used_bytes, 0)
+
+
+class TestEstimatesAndDeadlines(unittest.TestCase):
+
+    def test_expected_disk_bytes_counts_the_stream_and_its_remux(self):
+        self.assertEqual(expected_disk_bytes({"duration": 200, "filesize": 3000000}), 2 * 3000000)
+        self.assertGreater(expected_disk_bytes({"duration": 200}), 0)
+
+    def test_deadline_hook_raises_once_past_the_deadline(self):
+        deadline_hook(time.monotonic() + 60)({"status": "downloading"})
+        with self.assertRaises(DownloadTimeout):
+            deadline_hook(time.monotonic() - 1)({"status": "downloading"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,20 @@
 import datetime
 import json
 import os
+import shutil
+import tempfile
+import time
 import traceback
 import yt_dlp
 import pika
 
-from shared.gcs_utils import upload_file_to_gcs, gcs_file_exists, get_instrumental_url, get_vocals_url  # Fixed import
+from download_limits import DiskBudget, DownloadTimeout, deadline_hook, expected_disk_bytes
+
+from shared.gcs_utils import (
+    ORIGINAL_RENDITIONS, find_original_url, get_original_artifact, get_original_url, upload_file_to_gcs
+)
 from shared import constants
+from shared.worker_runtime import WorkerRuntime
 
 # Constants
 DOWNLOAD_FOLDER = "downloads"
@@ -16,6 +24,17 @@ DOWNLOAD_QUEUE_NAME = constants.DOWNLOAD_QUEUE_NAME
 MUSIC_SPLITTER_QUEUE_NAME = constants.SPLIT_QUEUE_NAME
 BUCKET_NAME = constants.GCS_BUCKET_NAME
 EVENT_TRACKER_QUEUE_NAME = constants.EVENT_TRACKER_QUEUE_NAME
+# Downloads handled concurrently by one process (each runs on its own executor thread).
+# The work is mostly waiting on the network, so several per pod keep it busy.
+DOWNLOADER_MAX_IN_FLIGHT = int(os.getenv("DOWNLOADER_MAX_IN_FLIGHT", "4"))
+# Wall-clock limit for one song's search, download and conversion.
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "600"))
+# yt_dlp gives up on a connection that sends nothing for this long.
+DOWNLOAD_SOCKET_TIMEOUT = float(os.getenv("DOWNLOAD_SOCKET_TIMEOUT", "30"))
+# Local disk all in-flight downloads may use together; jobs wait for room.
+DOWNLOADER_DISK_CAP_MB = int(os.getenv("DOWNLOADER_DISK_CAP_MB", "4096"))
+
+disk_budget = DiskBudget(DOWNLOADER_DISK_CAP_MB * 1024 * 1024)
 
 # Queue functions
 def notify_event_tracker(ch, status, job_id="", song_id="", error_message=None):
@@ -53,40 +72,70 @@ def publish_to_music_splitter_queue(ch, job_id, song_id, song_name, artist_name)
     print(f"Published to Music Splitter Queue for job_id: {job_id}, song_id: {song_id}")
 
 # Core functionality
+def find_downloaded_original(job_dir):
+    """(format, path) of the audio yt_dlp left in job_dir, in the first ORIGINAL_RENDITIONS format found."""
+    for fmt in ORIGINAL_RENDITIONS:
+        path = os.path.join(job_dir, get_original_artifact(fmt))
+        if os.path.isfile(path):
+            return fmt, path
+    raise FileNotFoundError(f"No supported audio file among: {os.listdir(job_dir)}")
+
 def download_song_to_gcs(song_id, song_name, artist_name):
     print(f"Downloading: {song_name} by {artist_name} (ID: {song_id})")
 
     query = f"{song_name} {artist_name} audio"
-    local_wav_path = os.path.join(DOWNLOAD_FOLDER, f"{song_id}.wav")
-    gcs_path = f"songs/{song_id}/original.wav"
 
-    # Skip if already uploaded
-    if gcs_file_exists(f"gs://{BUCKET_NAME}/{gcs_path}"):
-        print(f"File already exists in GCS: {gcs_path}")
+    # Skip if already uploaded, in any format
+    existing = find_original_url(song_id)
+    if existing:
+        print(f"File already exists in GCS: {existing}")
         return
 
+    deadline = time.monotonic() + DOWNLOAD_TIMEOUT_SECONDS
+    hook = deadline_hook(deadline)
+    # Each job gets its own directory, so two jobs for one song can't clobber each other's files.
+    job_dir = tempfile.mkdtemp(prefix=f"{song_id}-", dir=DOWNLOAD_FOLDER)
     ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(DOWNLOAD_FOLDER, f"{song_id}.%(ext)s"),
+        # Opus is the smallest of YouTube's audio streams at a given quality.
+        'format': 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best',
+        'outtmpl': os.path.join(job_dir, "original.%(ext)s"),
+        'socket_timeout': DOWNLOAD_SOCKET_TIMEOUT,
+        'progress_hooks': [hook],
+        'postprocessor_hooks': [hook],
         'postprocessors': [
             {
+                # "best" keeps the codec and only remuxes (Opus from WebM into .opus); nothing is re-encoded.
                 'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-                'preferredquality': '192',
+                'preferredcodec': 'best',
             }
         ],
     }
 
     try:
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([f"ytsearch:{query}"])
+            # Search first: the chosen stream's size and duration say how much disk to reserve.
+            results = ydl.extract_info(f"ytsearch1:{query}", download=False)
+            entries = list(results.get("entries") or [])
+            if not entries:
+                raise FileNotFoundError(f"No YouTube results for: {query}")
+            entry = entries[0]
+
+            # Waiting for disk counts against the job's time limit, so a stuck job can't hold its delivery.
+            with disk_budget.reserve(expected_disk_bytes(entry), timeout=max(0, deadline - time.monotonic())):
+                if time.monotonic() > deadline:
+                    raise DownloadTimeout(f"Timed out waiting for disk space for {song_id}")
+                ydl.process_ie_result(entry, download=True)
+                fmt, local_path = find_downloaded_original(job_dir)
+                upload_file_to_gcs(get_original_url(song_id, fmt), local_path,
+                                   content_type=ORIGINAL_RENDITIONS[fmt][1])
+                # Free the disk before the reservation is handed back.
+                shutil.rmtree(job_dir, ignore_errors=True)
     except Exception as e:
-        print(f"Error downloading from YouTube: {e}")
+        print(f"Error downloading {song_id}: {e}")
         raise
-
-    upload_file_to_gcs(f"gs://{BUCKET_NAME}/{gcs_path}", local_wav_path)
-    os.remove(local_wav_path)
-    print(f"Download complete for: {song_id}")
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    print(f"Download complete for: {song_id} ({fmt})")
 
 def callback(ch, method, properties, body):
     print("Callback triggered")
@@ -122,19 +171,8 @@ def callback(ch, method, properties, body):
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
 def start_worker():
-    # TODO: Add login and heartbeat params
-    credentials = pika.PlainCredentials(constants.RABBITMQ_USER, constants.RABBITMQ_PASS)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        heartbeat=600,
-        blocked_connection_timeout=300,
-        connection_attempts=3,
-        retry_delay=5,
-        socket_timeout=600,
-        credentials=credentials
-    ))
-
-    channel = connection.channel()
+    runtime = WorkerRuntime(max_in_flight=DOWNLOADER_MAX_IN_FLIGHT, name="Downloader")
+    channel = runtime.connect()
 
     channel.queue_declare(queue=EVENT_TRACKER_QUEUE_NAME)
     channel.queue_declare(queue=MUSIC_SPLITTER_QUEUE_NAME)
@@ -142,11 +180,7 @@ def start_worker():
     # TODO: Remove durability
     channel.queue_declare(queue=DOWNLOAD_QUEUE_NAME, durable=True)
 
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(DOWNLOAD_QUEUE_NAME, callback)
-
-    print(f"Downloader Service is listening on queue: {DOWNLOAD_QUEUE_NAME}")
-    channel.start_consuming()
+    runtime.consume(DOWNLOAD_QUEUE_NAME, callback)
 
 if __name__ == "__main__":
     start_worker()
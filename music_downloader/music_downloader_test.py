@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import music_downloader
+from download_limits import DiskBudget, DownloadTimeout, expected_disk_bytes
+
+
+class FakeYoutubeDL:
+    """Stands in for yt_dlp.YoutubeDL: one search result, and a download that leaves an .opus file."""
+
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+    download_seconds = 0.1
+    last_opts = None
+
+    def __init__(self, opts):
+        self.opts = opts
+        FakeYoutubeDL.last_opts = opts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def extract_info(self, query, download=False):
+        return {"entries": [{"duration": 1, "filesize": 1000, "webpage_url": "https://youtube.example/x"}]}
+
+    def process_ie_result(self, entry, download=True):
+        with FakeYoutubeDL.lock:
+            FakeYoutubeDL.active += 1
+            FakeYoutubeDL.peak = max(FakeYoutubeDL.peak, FakeYoutubeDL.active)
+        try:
+            time.sleep(FakeYoutubeDL.download_seconds)
+            for hook in self.opts["progress_hooks"]:
+                hook({"status": "downloading"})
+            with open(self.opts["outtmpl"] % {"ext": "opus"}, "wb") as f:
+                f.write(b"OggS")
+        finally:
+            with FakeYoutubeDL.lock:
+                FakeYoutubeDL.active -= 1
+
+
+class TestDownloadSongToGcs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.uploaded = []
+        FakeYoutubeDL.active = FakeYoutubeDL.peak = 0
+        FakeYoutubeDL.download_seconds = 0.1
+        patches = [
+            patch("music_downloader.DOWNLOAD_FOLDER", self.tmp),
+            patch("music_downloader.yt_dlp.YoutubeDL", FakeYoutubeDL),
+            patch("music_downloader.find_original_url", return_value=None),
+            patch("music_downloader.upload_file_to_gcs",
+                  side_effect=lambda url, path, content_type: self.uploaded.append(
+                      (url, os.path.getsize(path), content_type))),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_uploads_the_native_stream_and_cleans_up(self):
+        music_downloader.download_song_to_gcs("42", "Song", "Artist")
+
+        self.assertEqual(self.uploaded, [(f"gs://{music_downloader.BUCKET_NAME}/songs/42/original.opus", 4,
+                                          "audio/ogg; codecs=opus")])
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_songs_already_stored_in_any_format_are_skipped(self):
+        with patch("music_downloader.find_original_url", return_value="gs://bucket/songs/42/original.wav"), \
+                patch("music_downloader.yt_dlp.YoutubeDL") as ydl:
+            music_downloader.download_song_to_gcs("42", "Song", "Artist")
+
+        ydl.assert_not_called()
+        self.assertEqual(self.uploaded, [])
+
+    def test_keeps_the_codec_instead_of_converting_to_wav(self):
+        music_downloader.download_song_to_gcs("42", "Song", "Artist")
+
+        postprocessors = FakeYoutubeDL.last_opts["postprocessors"]
+        self.assertEqual([(p["key"], p["preferredcodec"]) for p in postprocessors], [("FFmpegExtractAudio", "best")])
+
+    def test_disk_cap_limits_concurrent_downloads(self):
+        # Each fake song needs room for its stream and one remuxed copy; the cap fits two songs.
+        needed = expected_disk_bytes({"duration": 1, "filesize": 1000})
+
+        with patch("music_downloader.disk_budget", DiskBudget(needed * 2)), ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda i: music_downloader.download_song_to_gcs(str(i), "Song", "Artist"), range(4)))
+
+        self.assertEqual(len(self.uploaded), 4)
+        self.assertEqual(FakeYoutubeDL.peak, 2)
+
+    def test_waiting_for_disk_space_stops_at_the_time_limit(self):
+        budget = DiskBudget(expected_disk_bytes({"duration": 1, "filesize": 1000}))
+
+        with patch("music_downloader.disk_budget", budget), \
+                patch("music_downloader.DOWNLOAD_TIMEOUT_SECONDS", 0.2), budget.reserve(1):
+            started = time.monotonic()
+            with self.assertRaises(DownloadTimeout):
+                music_downloader.download_song_to_gcs("42", "Song", "Artist")
+
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(FakeYoutubeDL.peak, 0)
+        self.assertEqual(os.listdir(self.tmp), [])
+
+    def test_downloads_past_the_time_limit_fail_and_clean_up(self):
+        FakeYoutubeDL.download_seconds = 0.2
+
+        with patch("music_downloader.DOWNLOAD_TIMEOUT_SECONDS", 0.05):
+            with self.assertRaises(DownloadTimeout):
+                music_downloader.download_song_to_gcs("42", "Song", "Artist")
+
+        self.assertEqual(self.uploaded, [])
+        self.assertEqual(os.listdir(self.tmp), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
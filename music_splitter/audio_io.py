@@ -0,0 +1,279 @@
+import io
+import os
+import struct
+import tempfile
+import wave
+from collections import namedtuple
+
+import ffmpeg
+import numpy as np
+
+# ffmpeg output options for each compressed stem rendition. Output goes to a pipe,
+# so the AAC rendition is written as fragmented MP4.
+FFMPEG_ENCODERS = {
+    "flac": {"format": "flac", "acodec": "flac"},
+    "opus": {"format": "ogg", "acodec": "libopus", "audio_bitrate": "128k", "ar": 48000},
+    "aac": {"format": "mp4", "acodec": "aac", "audio_bitrate": "192k", "movflags": "frag_keyframe+empty_moov"},
+}
+
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Layout of a WAV file's sample data, as found by read_wav_info.
+WavInfo = namedtuple("WavInfo", "sample_rate channels sample_width is_float data_offset frames")
+
+
+def to_pcm16(waveform):
+    """Converts a float waveform in [-1, 1] to interleaved little-endian 16-bit PCM."""
+    return np.rint(np.clip(waveform, -1.0, 1.0) * 32767.0).astype("<i2")
+
+
+def _pcm_to_float(frames: bytes, sample_width: int, channels: int):
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        ints = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        ints = np.where(ints >= 1 << 23, ints - (1 << 24), ints)
+        samples = ints.astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported PCM sample width: {sample_width}")
+    return samples.reshape(-1, channels)
+
+
+def read_wav_info(f, total_size: int) -> WavInfo:
+    """
+    Walks the RIFF chunks of a WAV file object up to its sample data.
+
+    Handles plain and WAVE_FORMAT_EXTENSIBLE headers with integer PCM or 32-bit
+    float samples, and the unknown/oversized data lengths ffmpeg writes when
+    streaming. Raises ValueError for anything else.
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise ValueError("Not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError("WAV file has no data chunk")
+        chunk_id, size = header[:4], struct.unpack("<I", header[4:])[0]
+
+        if chunk_id == b"fmt ":
+            body = f.read(size + (size & 1))
+            if len(body) < 16:
+                raise ValueError("Truncated WAV fmt chunk")
+            tag, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", body[:16])
+            if tag == WAVE_FORMAT_EXTENSIBLE and size >= 26:
+                tag = struct.unpack("<H", body[24:26])[0]
+            fmt = (tag, channels, sample_rate, block_align, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV data chunk comes before its fmt chunk")
+            tag, channels, sample_rate, block_align, bits = fmt
+            if channels == 0 or block_align != channels * bits // 8:
+                raise ValueError(f"Inconsistent WAV header ({channels} channels, block align {block_align})")
+            if tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+                is_float = False
+            elif tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+                is_float = True
+            else:
+                raise ValueError(f"Unsupported WAV encoding (format tag {tag:#x}, {bits} bits)")
+
+            data_offset = f.tell()
+            size = min(size, total_size - data_offset)
+            return WavInfo(sample_rate, channels, block_align // channels, is_float, data_offset, size // block_align)
+        else:
+            f.seek(size + (size & 1), 1)
+
+
+def _samples_to_float(samples, info: WavInfo):
+    """Converts raw (frames, ...) sample data laid out as described by info to float32."""
+    if info.is_float:
+        return np.array(samples, dtype=np.float32).reshape(-1, info.channels)
+    if info.sample_width == 2:
+        return samples.astype(np.float32).reshape(-1, info.channels) / 32768.0
+    return _pcm_to_float(samples.tobytes(), info.sample_width, info.channels)
+
+
+def _sample_dtype(info: WavInfo):
+    if info.is_float:
+        return np.dtype("<f4"), info.channels
+    if info.sample_width == 2:
+        return np.dtype("<i2"), info.channels
+    return np.dtype(np.uint8), info.channels * info.sample_width
+
+
+def read_wav_frames(path: str, start_frame: int = 0, num_frames: int = None):
+    """
+    Reads frames [start_frame, start_frame + num_frames) of a WAV file through a
+    memory map, so only the requested window is paged in and no ffmpeg is spawned.
+
+    Returns (waveform, info) with waveform shaped (frames, channels) as float32.
+    """
+    with open(path, "rb") as f:
+        info = read_wav_info(f, os.fstat(f.fileno()).st_size)
+
+    end = info.frames if num_frames is None else min(info.frames, start_frame + num_frames)
+    if start_frame >= end:
+        return np.zeros((0, info.channels), dtype=np.float32), info
+
+    dtype, row = _sample_dtype(info)
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=info.data_offset, shape=(info.frames, row))
+    try:
+        return _samples_to_float(samples[start_frame:end], info), info
+    finally:
+        del samples
+
+
+def decode_wav_bytes(data: bytes):
+    """
+    Decodes an in-memory PCM WAV file without spawning ffmpeg.
+
+    Returns (waveform, sample_rate) with waveform shaped (samples, channels) as float32.
+    """
+    info = read_wav_info(io.BytesIO(data), len(data))
+    dtype, row = _sample_dtype(info)
+    samples = np.frombuffer(data, dtype=dtype, count=info.frames * row, offset=info.data_offset)
+    return _samples_to_float(samples, info), info.sample_rate
+
+
+def is_mp4(data: bytes) -> bool:
+    return data[4:8] == b"ftyp"
+
+
+def decode_with_ffmpeg(data: bytes, sample_rate: int = 44100, channels: int = 2):
+    """Decodes any container/codec ffmpeg understands, piping bytes in and float PCM out."""
+    if is_mp4(data):
+        # A downloaded M4A usually keeps its moov index after the audio, which ffmpeg
+        # can't seek back to on a pipe, so MP4 input goes through a temporary file.
+        with tempfile.NamedTemporaryFile(suffix=".m4a") as f:
+            f.write(data)
+            f.flush()
+            out, _ = (
+                ffmpeg.input(f.name)
+                .output("pipe:", format="f32le", ac=channels, ar=sample_rate)
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+    else:
+        out, _ = (
+            ffmpeg.input("pipe:")
+            .output("pipe:", format="f32le", ac=channels, ar=sample_rate)
+            .run(input=data, capture_stdout=True, capture_stderr=True)
+        )
+    return np.frombuffer(out, dtype="<f4").reshape(-1, channels), sample_rate
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = 44100):
+    """
+    Decodes PCM WAV at sample_rate in-process and falls back to ffmpeg for anything
+    else, resampling to sample_rate like WavAudioLoader.load does for files.
+    """
+    try:
+        info = read_wav_info(io.BytesIO(data), len(data))
+    except ValueError as e:
+        print(f"[AudioIO] Not a PCM WAV buffer ({e}), decoding with ffmpeg")
+        return decode_with_ffmpeg(data, sample_rate)
+    if info.sample_rate != sample_rate:
+        print(f"[AudioIO] WAV buffer is {info.sample_rate} Hz, resampling to {sample_rate} Hz with ffmpeg")
+        return decode_with_ffmpeg(data, sample_rate)
+    return decode_wav_bytes(data)
+
+
+def encode_wav_bytes(waveform, sample_rate: int) -> bytes:
+    """Encodes a float waveform as an in-memory 16-bit PCM WAV file."""
+    waveform = np.asarray(waveform)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(waveform.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(to_pcm16(waveform).tobytes())
+    return buffer.getvalue()
+
+
+def write_wav(path: str, waveform, sample_rate: int, block_frames: int = 1 << 20):
+    """Writes a float waveform to a 16-bit PCM WAV file, converting one block at a time."""
+    waveform = np.asarray(waveform)
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(waveform.shape[1])
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        for start in range(0, len(waveform), block_frames):
+            wav.writeframes(to_pcm16(waveform[start:start + block_frames]).tobytes())
+
+
+class WavAudioLoader:
+    """
+    Drop-in for Spleeter's AudioAdapter that handles WAV without ffmpeg.
+
+    load() memory-maps PCM/float WAV files and reads just the requested window;
+    save() writes .wav stems directly. Other formats, and files that would need
+    resampling to sample_rate (44.1 kHz by default, as in Spleeter), go to the
+    fallback adapter (ffmpeg). Pass sample_rate=None to keep the native rate.
+    """
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+
+    def _fallback(self, reason):
+        if self.fallback is None:
+            raise ValueError(f"Cannot handle this audio in-process ({reason}) and no fallback adapter is set")
+        print(f"[AudioIO] {reason}, using ffmpeg")
+        return self.fallback
+
+    def load(self, path, offset=None, duration=None, sample_rate=44100, dtype=np.float32):
+        try:
+            with open(path, "rb") as f:
+                info = read_wav_info(f, os.fstat(f.fileno()).st_size)
+        except ValueError as e:
+            return self._fallback(f"{path} is not a PCM WAV file: {e}").load(path, offset, duration, sample_rate, dtype)
+        if sample_rate is not None and sample_rate != info.sample_rate:
+            return self._fallback(f"{path} needs resampling to {sample_rate} Hz").load(
+                path, offset, duration, sample_rate, dtype)
+
+        start = int(round((offset or 0.0) * info.sample_rate))
+        count = None if duration is None else int(round(duration * info.sample_rate))
+        waveform, _ = read_wav_frames(path, start, count)
+        return waveform.astype(dtype, copy=False), info.sample_rate
+
+    def save(self, path, data, sample_rate, codec=None, bitrate=None):
+        if path.lower().endswith(".wav") and codec in (None, "wav"):
+            write_wav(path, data, sample_rate)
+            return
+        self._fallback(f"{path} is not a WAV target").save(path, data, sample_rate, codec, bitrate)
+
+
+def encode_stem(waveform, sample_rate: int, fmt: str) -> bytes:
+    """Encodes a float waveform into the given stem rendition entirely in memory."""
+    if fmt == "wav":
+        return encode_wav_bytes(waveform, sample_rate)
+
+    pcm = np.ascontiguousarray(waveform, dtype="<f4")
+    out, _ = (
+        ffmpeg.input("pipe:", format="f32le", ar=sample_rate, ac=pcm.shape[1])
+        .output("pipe:", **FFMPEG_ENCODERS[fmt])
+        .run(input=pcm.tobytes(), capture_stdout=True, capture_stderr=True)
+    )
+    return out
+
+
+def encode_stem_file(path: str, fmt: str) -> bytes:
+    """Encodes a stem already written to disk into the given rendition."""
+    if fmt == "wav":
+        with open(path, "rb") as f:
+            return f.read()
+
+    out, _ = (
+        ffmpeg.input(path)
+        .output("pipe:", **FFMPEG_ENCODERS[fmt])
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return out
@@ -0,0 +1,197 @@
+import unittest
+import io
+import os
+import shutil
+import struct
+import tempfile
+import wave
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from audio_io import (
+    WavAudioLoader, decode_audio_bytes, decode_wav_bytes, encode_stem, encode_wav_bytes, read_wav_frames
+)
+
+
+def make_wav(frames: bytes, channels: int, sample_width: int, sample_rate: int = 44100) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(frames)
+    return buffer.getvalue()
+
+
+def make_float_wav(waveform, sample_rate: int = 44100, extensible: bool = False, extra_chunk: bool = False) -> bytes:
+    waveform = np.asarray(waveform, dtype="<f4")
+    channels = waveform.shape[1]
+    data = waveform.tobytes()
+    if extensible:
+        fmt = struct.pack("<HHIIHHHHI", 0xFFFE, channels, sample_rate, sample_rate * 4 * channels, 4 * channels,
+                          32, 22, 32, 0) + struct.pack("<H", 3) + b"\x00" * 14
+    else:
+        fmt = struct.pack("<HHIIHH", 3, channels, sample_rate, sample_rate * 4 * channels, 4 * channels, 32)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    if extra_chunk:
+        chunks += b"LIST" + struct.pack("<I", 3) + b"abc\x00"
+    chunks += b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", 4 + len(chunks)) + b"WAVE" + chunks
+
+
+class TestAudioIO(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def write(self, name, data: bytes):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_wav_round_trip_in_memory(self):
+        t = np.arange(44100, dtype=np.float32) / 44100
+        waveform = np.stack([0.5 * np.sin(2 * np.pi * 440 * t), -0.25 * np.ones_like(t)], axis=1)
+
+        decoded, sample_rate = decode_wav_bytes(encode_wav_bytes(waveform, 44100))
+
+        self.assertEqual(sample_rate, 44100)
+        self.assertEqual(decoded.shape, waveform.shape)
+        self.assertEqual(decoded.dtype, np.float32)
+        np.testing.assert_allclose(decoded, waveform, atol=1e-4)
+
+    def test_decode_24_bit_pcm(self):
+        ints = np.array([0, 1 << 22, -(1 << 22), (1 << 23) - 1], dtype=np.int32)
+        frames = b"".join(int(v).to_bytes(3, "little", signed=True) for v in ints)
+
+        decoded, _ = decode_wav_bytes(make_wav(frames, channels=1, sample_width=3))
+
+        np.testing.assert_allclose(decoded[:, 0], [0.0, 0.5, -0.5, 1.0], atol=1e-6)
+
+    def test_encoder_clips_out_of_range_samples(self):
+        decoded, _ = decode_wav_bytes(encode_wav_bytes(np.array([[2.0, -2.0]], dtype=np.float32), 8000))
+        np.testing.assert_allclose(decoded, [[32767 / 32768, -32767 / 32768]])
+
+    def test_loader_reads_requested_window_from_pcm_wav(self):
+        waveform = (np.arange(8000 * 2, dtype=np.float32).reshape(-1, 2) % 100 - 50) / 100
+        path = self.write("song.wav", encode_wav_bytes(waveform, 8000))
+        loader = WavAudioLoader(fallback=MagicMock())
+
+        full, sample_rate = loader.load(path, sample_rate=None)
+        window, _ = loader.load(path, offset=0.25, duration=0.5, sample_rate=8000)
+
+        self.assertEqual(sample_rate, 8000)
+        np.testing.assert_allclose(full, waveform, atol=1e-4)
+        np.testing.assert_allclose(window, waveform[2000:6000], atol=1e-4)
+        loader.fallback.load.assert_not_called()
+
+    def test_loader_reads_float_and_extensible_wav_with_extra_chunks(self):
+        waveform = np.array([[0.1, -0.2], [0.3, -0.4], [0.5, -0.6]], dtype=np.float32)
+        for extensible in (False, True):
+            path = self.write("float.wav", make_float_wav(waveform, extensible=extensible, extra_chunk=True))
+            decoded, sample_rate = WavAudioLoader().load(path)
+            self.assertEqual(sample_rate, 44100)
+            np.testing.assert_array_equal(decoded, waveform)
+
+    def test_read_wav_frames_handles_24_bit_and_windows_past_the_end(self):
+        ints = np.array([0, 1 << 22, -(1 << 22), (1 << 23) - 1], dtype=np.int32)
+        frames = b"".join(int(v).to_bytes(3, "little", signed=True) for v in ints)
+        path = self.write("deep.wav", make_wav(frames, channels=1, sample_width=3))
+
+        decoded, info = read_wav_frames(path, start_frame=1)
+        empty, _ = read_wav_frames(path, start_frame=10)
+
+        self.assertEqual(info.frames, 4)
+        np.testing.assert_allclose(decoded[:, 0], [0.5, -0.5, 1.0], atol=1e-6)
+        self.assertEqual(empty.shape, (0, 1))
+
+    def test_loader_uses_fallback_for_other_formats_and_resampling(self):
+        mp3 = self.write("song.mp3", b"ID3 not a wav")
+        wav = self.write("song.wav", encode_wav_bytes(np.zeros((10, 2), dtype=np.float32), 22050))
+        fallback = MagicMock()
+        fallback.load.return_value = ("waveform", 44100)
+        loader = WavAudioLoader(fallback=fallback)
+
+        self.assertEqual(loader.load(mp3), ("waveform", 44100))
+        loader.load(wav)
+
+        self.assertEqual([c.args[0] for c in fallback.load.call_args_list], [mp3, wav])
+        with self.assertRaises(ValueError):
+            WavAudioLoader().load(mp3)
+
+    def test_loader_saves_wav_directly_and_delegates_other_codecs(self):
+        waveform = np.stack([np.linspace(-1, 1, 100, dtype=np.float32)] * 2, axis=1)
+        fallback = MagicMock()
+        loader = WavAudioLoader(fallback=fallback)
+        path = os.path.join(self.tmp, "stem.wav")
+
+        loader.save(path, waveform, 44100)
+        loader.save(os.path.join(self.tmp, "stem.mp3"), waveform, 44100, "mp3", "128k")
+
+        with open(path, "rb") as f:
+            decoded, _ = decode_wav_bytes(f.read())
+        np.testing.assert_allclose(decoded, waveform, atol=1e-4)
+        fallback.save.assert_called_once()
+        fallback.save.assert_called_with(os.path.join(self.tmp, "stem.mp3"), waveform, 44100, "mp3", "128k")
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_decode_audio_bytes_falls_back_to_ffmpeg(self):
+        with self.assertRaises(Exception):
+            decode_audio_bytes(b"definitely not audio")
+
+    def test_wav_at_another_rate_is_resampled_with_ffmpeg(self):
+        wav_48k = encode_wav_bytes(np.zeros((480, 2), dtype=np.float32), 48000)
+        resampled = (np.zeros((441, 2), dtype=np.float32), 44100)
+
+        with patch("audio_io.decode_with_ffmpeg", return_value=resampled) as decode_with_ffmpeg:
+            self.assertIs(decode_audio_bytes(wav_48k), resampled)
+            decode_with_ffmpeg.assert_called_once_with(wav_48k, 44100)
+
+            waveform, sample_rate = decode_audio_bytes(encode_wav_bytes(np.zeros((441, 2), dtype=np.float32), 44100))
+            self.assertEqual(decode_with_ffmpeg.call_count, 1)
+        self.assertEqual((waveform.shape, sample_rate), ((441, 2), 44100))
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_48k_wav_is_decoded_at_44k(self):
+        t = np.arange(48000, dtype=np.float32) / 48000
+        waveform = np.stack([0.5 * np.sin(2 * np.pi * 440 * t)] * 2, axis=1)
+
+        decoded, sample_rate = decode_audio_bytes(encode_wav_bytes(waveform, 48000))
+
+        self.assertEqual(sample_rate, 44100)
+        self.assertLess(abs(len(decoded) - 44100), 64)
+
+    def test_mp4_input_is_decoded_from_a_file(self):
+        fake_ffmpeg = MagicMock()
+        fake_ffmpeg.input.return_value.output.return_value.run.return_value = (np.zeros(4, "<f4").tobytes(), b"")
+
+        with patch("audio_io.ffmpeg", fake_ffmpeg):
+            waveform, _ = decode_audio_bytes(b"\x00\x00\x00\x20ftypM4A " + b"\x00" * 32)
+
+        path = fake_ffmpeg.input.call_args[0][0]
+        self.assertTrue(path.endswith(".m4a"))
+        self.assertNotIn("input", fake_ffmpeg.input.return_value.output.return_value.run.call_args[1])
+        self.assertEqual(waveform.shape, (2, 2))
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg is not installed")
+    def test_compressed_renditions_are_smaller_than_wav(self):
+        t = np.arange(44100 * 5, dtype=np.float32) / 44100
+        waveform = np.stack([0.5 * np.sin(2 * np.pi * 440 * t)] * 2, axis=1)
+        wav = encode_stem(waveform, 44100, "wav")
+
+        for fmt in ("flac", "opus", "aac"):
+            encoded = encode_stem(waveform, 44100, fmt)
+            self.assertGreater(len(encoded), 0)
+            self.assertLess(len(encoded), len(wav), fmt)
+
+        decoded, _ = decode_audio_bytes(encode_stem(waveform, 44100, "flac"))
+        np.testing.assert_allclose(decoded, waveform, atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
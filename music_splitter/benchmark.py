@@ -0,0 +1,326 @@
+"""
+Splitter benchmark suite.
+
+Generates synthetic stereo songs, runs split_and_upload_instrumental on them
+against LocalGCSUtils (no network), and reports per-stage wall time, peak RSS
+and real-time factor as JSON, plus micro-benchmarks of the numpy hot paths.
+Stem renditions are encoded and uploaded on parallel threads, so the "encode"
+and "upload" stages are summed over those threads.
+
+    python benchmark.py --output report.json
+    python benchmark.py --write-baseline          # record benchmark_baseline.json on the reference node
+    python benchmark.py --durations 30 --repeat 3 # exits 1 if anything regressed past the baseline,
+                                                  # 2 if there is no baseline to compare against
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from audio_io import decode_wav_bytes, encode_wav_bytes, to_pcm16
+from chunked_separation import WavStemWriter, crossfade
+from stem_cache import audio_fingerprint
+from shared.local_gcs_utils import LocalGCSUtils
+
+SAMPLE_RATE = 44100
+DEFAULT_DURATIONS = [30, 180, 600]
+STAGES = ["download", "load", "separate", "save", "encode", "upload"]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+# A metric regresses when it exceeds the baseline by more than this fraction...
+DEFAULT_TOLERANCE = 0.2
+# ...and by more than this many seconds, so jitter on near-zero stages is ignored.
+MIN_REGRESSION_SECONDS = 0.05
+
+
+# Synthetic audio
+def synthetic_block(start, length, sample_rate=SAMPLE_RATE):
+    """
+    Samples [start, start + length) of a deterministic stereo "song": a vibrato
+    lead line standing in for vocals, a chord pad panned apart and a click track.
+    """
+    t = (np.arange(start, start + length, dtype=np.float64) / sample_rate)
+    lead = 0.25 * np.sin(2 * np.pi * (440.0 * t + 3.0 * np.sin(2 * np.pi * 5.0 * t)))
+    lead *= 0.5 + 0.5 * np.sin(2 * np.pi * 0.25 * t) ** 2
+    pad_left = 0.15 * (np.sin(2 * np.pi * 130.81 * t) + np.sin(2 * np.pi * 196.0 * t))
+    pad_right = 0.15 * (np.sin(2 * np.pi * 164.81 * t) + np.sin(2 * np.pi * 261.63 * t))
+    beat_phase = (t * 2.0) % 1.0
+    clicks = 0.3 * np.exp(-beat_phase * 60.0) * np.sin(2 * np.pi * 2000.0 * t)
+    return np.stack([lead + pad_left + clicks, lead + pad_right + clicks], axis=1).astype(np.float32)
+
+
+def write_synthetic_song(path, seconds, sample_rate=SAMPLE_RATE, block_seconds=10):
+    """Streams a synthetic song to a 16-bit WAV file without holding it all in memory."""
+    total = int(seconds * sample_rate)
+    block = int(block_seconds * sample_rate)
+    writer = WavStemWriter(path, sample_rate, 2)
+    try:
+        for start in range(0, total, block):
+            writer.write(synthetic_block(start, min(block, total - start), sample_rate))
+    finally:
+        writer.close()
+
+
+# Measurement
+def reset_peak_rss():
+    """Resets the kernel's peak-RSS watermark for this process (Linux only, best effort)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and bytes on macOS, and cannot be reset.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024.0 * 1024.0) if sys.platform == "darwin" else maxrss / 1024.0
+
+
+class StageTimer:
+    """Accumulates wall time per stage; safe to use from the parallel upload threads."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[stage] += time.perf_counter() - started
+        return timed
+
+
+class TimedAudioLoader:
+    def __init__(self, audio_loader, timer):
+        self.load = timer.wrap("load", audio_loader.load)
+        self.save = timer.wrap("save", audio_loader.save)
+
+
+class TimedSeparator:
+    def __init__(self, separator, timer):
+        self.separate = timer.wrap("separate", separator.separate)
+
+
+# Macro benchmark
+def run_case(splitter, seconds, storage_root, repeat_index):
+    """Splits one synthetic song end to end and returns its metrics."""
+    timer = StageTimer()
+    storage = LocalGCSUtils(storage_root)
+    storage.download_file_from_gcs = timer.wrap("download", storage.download_file_from_gcs)
+    storage.download_bytes_from_gcs = timer.wrap("download", storage.download_bytes_from_gcs)
+    storage.upload_file_to_gcs = timer.wrap("upload", storage.upload_file_to_gcs)
+    storage.upload_bytes_to_gcs = timer.wrap("upload", storage.upload_bytes_to_gcs)
+
+    song_id = f"bench-{seconds}s-{repeat_index}"
+    original_path = storage.local_path(storage.get_artifact_url(song_id, "original.wav"))
+    os.makedirs(os.path.dirname(original_path), exist_ok=True)
+    write_synthetic_song(original_path, seconds)
+
+    # The in-memory path decodes with decode_audio_bytes instead of audio_loader.load,
+    # and renditions are encoded just before their upload; time both as their own stages.
+    originals = {name: getattr(splitter, name) for name in ("decode_audio_bytes", "encode_stem", "encode_stem_file")}
+    splitter.decode_audio_bytes = timer.wrap("load", originals["decode_audio_bytes"])
+    splitter.encode_stem = timer.wrap("encode", originals["encode_stem"])
+    splitter.encode_stem_file = timer.wrap("encode", originals["encode_stem_file"])
+    reset_peak_rss()
+    started = time.perf_counter()
+    try:
+        splitter.split_and_upload_instrumental(
+            f"bench-job-{repeat_index}", song_id,
+            TimedAudioLoader(splitter.audio_loader, timer),
+            TimedSeparator(splitter.separator, timer),
+            storage
+        )
+    finally:
+        total = time.perf_counter() - started
+        for name, fn in originals.items():
+            setattr(splitter, name, fn)
+        shutil.rmtree(os.path.dirname(original_path), ignore_errors=True)
+
+    return {
+        "stages": {stage: timer.seconds.get(stage, 0.0) for stage in STAGES},
+        "total_seconds": total,
+        "peak_rss_mb": peak_rss_mb(),
+        "real_time_factor": total / seconds,
+    }
+
+
+def run_macro_benchmarks(durations, repeat=1, warmup=True):
+    # Imported here so the helpers above stay usable without TensorFlow installed.
+    import music_splitter as splitter
+
+    if splitter.separator is None:
+        splitter.load_models()
+    # Benchmark the separation path itself, not the stem cache.
+    splitter.STEM_CACHE_ENABLED = False
+    storage_root = tempfile.mkdtemp(prefix="splitter-bench-")
+    cases = {}
+    try:
+        if warmup:
+            # The first separation pays TF graph construction; keep it out of the numbers.
+            run_case(splitter, 5, storage_root, "warmup")
+
+        for seconds in durations:
+            runs = [run_case(splitter, seconds, storage_root, i) for i in range(repeat)]
+            # Best-of-N timings are the least noisy; memory takes the worst run.
+            case = {
+                "audio_seconds": seconds,
+                "repeat": repeat,
+                "stages": {stage: min(r["stages"][stage] for r in runs) for stage in STAGES},
+                "total_seconds": min(r["total_seconds"] for r in runs),
+                "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+            }
+            case["real_time_factor"] = case["total_seconds"] / seconds
+            cases[f"{seconds}s"] = case
+            print(f"[Benchmark] {seconds}s song: {case['total_seconds']:.2f}s total, "
+                  f"RTF {case['real_time_factor']:.3f}, peak RSS {case['peak_rss_mb']:.0f} MB")
+    finally:
+        shutil.rmtree(storage_root, ignore_errors=True)
+
+    return cases, {
+        "split_mode": splitter.SPLIT_MODE,
+        "stem_formats": splitter.STEM_OUTPUT_FORMATS,
+        "backend": type(splitter.separator).__name__,
+    }
+
+
+# Micro benchmarks
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_micro_benchmarks(seconds=180, repeat=3):
+    """Times the pure-numpy helpers on the splitter hot path for one song of the given length."""
+    waveform = synthetic_block(0, int(seconds * SAMPLE_RATE))
+    wav_bytes = encode_wav_bytes(waveform, SAMPLE_RATE)
+    overlap = min(2 * SAMPLE_RATE, len(waveform) // 2)
+
+    return {
+        "to_pcm16": best_of(lambda: to_pcm16(waveform), repeat),
+        "encode_wav_bytes": best_of(lambda: encode_wav_bytes(waveform, SAMPLE_RATE), repeat),
+        "decode_wav_bytes": best_of(lambda: decode_wav_bytes(wav_bytes), repeat),
+        "audio_fingerprint": best_of(lambda: audio_fingerprint(waveform, SAMPLE_RATE), repeat),
+        "crossfade": best_of(lambda: crossfade(waveform[:overlap], waveform[overlap:2 * overlap]), repeat),
+    }
+
+
+# Baseline
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Returns one message per metric that grew more than tolerance past the baseline."""
+    regressions = []
+
+    def check(name, current, expected, min_delta):
+        if current is None or expected is None:
+            return
+        if current > expected * (1 + tolerance) and current - expected > min_delta:
+            regressions.append(f"{name}: {current:.3f} vs baseline {expected:.3f} "
+                               f"(+{(current / expected - 1) * 100 if expected else float('inf'):.0f}%)")
+
+    for case_name, expected in baseline.get("cases", {}).items():
+        current = report.get("cases", {}).get(case_name)
+        if current is None:
+            continue
+        check(f"{case_name} real_time_factor", current["real_time_factor"], expected["real_time_factor"],
+              MIN_REGRESSION_SECONDS / expected["audio_seconds"])
+        check(f"{case_name} peak_rss_mb", current["peak_rss_mb"], expected["peak_rss_mb"], 0)
+        for stage in STAGES:
+            check(f"{case_name} {stage}", current["stages"].get(stage), expected["stages"].get(stage),
+                  MIN_REGRESSION_SECONDS)
+
+    for name, expected in baseline.get("micro", {}).items():
+        check(f"micro {name}", report.get("micro", {}).get(name), expected, MIN_REGRESSION_SECONDS / 10)
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the music splitter hot path.")
+    parser.add_argument("--durations", default=",".join(str(d) for d in DEFAULT_DURATIONS),
+                        help="comma-separated song lengths in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per song length (best is reported)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare against")
+    parser.add_argument("--write-baseline", action="store_true", help="save this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help=f"allowed slowdown fraction (default: baseline's own, else {DEFAULT_TOLERANCE})")
+    parser.add_argument("--micro-only", action="store_true", help="skip the end-to-end splits")
+    parser.add_argument("--no-warmup", action="store_true", help="include the first (graph-building) split")
+    args = parser.parse_args(argv)
+
+    # Without a baseline there is nothing to gate on; fail before spending time on the run.
+    if not args.write_baseline and not os.path.exists(args.baseline):
+        print(f"[Benchmark] No baseline at {args.baseline}; run with --write-baseline on the "
+              f"reference node to record one.")
+        return 2
+
+    report = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "micro": run_micro_benchmarks(),
+        "cases": {},
+    }
+    if not args.micro_only:
+        durations = [int(d) for d in args.durations.split(",") if d.strip()]
+        report["cases"], config = run_macro_benchmarks(durations, args.repeat, warmup=not args.no_warmup)
+        report.update(config)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.write_baseline:
+        report["tolerance"] = args.tolerance if args.tolerance is not None else DEFAULT_TOLERANCE
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"[Benchmark] Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    tolerance = args.tolerance if args.tolerance is not None else baseline.get("tolerance", DEFAULT_TOLERANCE)
+    regressions = compare_to_baseline(report, baseline, tolerance)
+    for regression in regressions:
+        print(f"[Benchmark] REGRESSION {regression}")
+    if regressions:
+        return 1
+    print(f"[Benchmark] No regressions against {args.baseline} (tolerance {tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
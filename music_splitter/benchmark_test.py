@@ -0,0 +1,82 @@
+import unittest
+import os
+import shutil
+import tempfile
+import wave
+from unittest.mock import patch
+
+from benchmark import compare_to_baseline, main, run_micro_benchmarks, write_synthetic_song, StageTimer
+
+
+def case(rtf, rss=500.0, separate=10.0):
+    return {
+        "audio_seconds": 30,
+        "stages": {"download": 0.01, "load": 1.0, "separate": separate, "save": 0.5, "encode": 1.5, "upload": 0.5},
+        "total_seconds": rtf * 30,
+        "peak_rss_mb": rss,
+        "real_time_factor": rtf,
+    }
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_write_synthetic_song_has_requested_length(self):
+        path = os.path.join(self.test_dir, "song.wav")
+        write_synthetic_song(path, 12.5, block_seconds=5)
+
+        with wave.open(path, "rb") as f:
+            self.assertEqual(f.getnchannels(), 2)
+            self.assertEqual(f.getnframes(), int(12.5 * 44100))
+
+    def test_stage_timer_accumulates_per_stage(self):
+        timer = StageTimer()
+        load = timer.wrap("load", lambda x: x * 2)
+
+        self.assertEqual(load(3), 6)
+        self.assertEqual(load(4), 8)
+        self.assertIn("load", timer.seconds)
+
+    def test_compare_to_baseline_flags_only_real_regressions(self):
+        baseline = {"cases": {"30s": case(0.5)}, "micro": {"to_pcm16": 0.2}}
+
+        within = {"cases": {"30s": case(0.55, separate=10.5)}, "micro": {"to_pcm16": 0.21}}
+        self.assertEqual(compare_to_baseline(within, baseline, tolerance=0.2), [])
+
+        slower = {"cases": {"30s": case(0.8, rss=900.0, separate=16.0)}, "micro": {"to_pcm16": 0.5}}
+        regressions = compare_to_baseline(slower, baseline, tolerance=0.2)
+        self.assertTrue(any("real_time_factor" in r for r in regressions))
+        self.assertTrue(any("peak_rss_mb" in r for r in regressions))
+        self.assertTrue(any("separate" in r for r in regressions))
+        self.assertTrue(any("micro to_pcm16" in r for r in regressions))
+
+    def test_compare_to_baseline_ignores_jitter_on_tiny_stages(self):
+        baseline = {"cases": {"30s": case(0.5)}}
+        current = case(0.5)
+        current["stages"]["download"] = 0.03  # 3x slower, but only 20 ms
+
+        self.assertEqual(compare_to_baseline({"cases": {"30s": current}}, baseline), [])
+
+    def test_missing_baseline_fails_unless_one_is_being_written(self):
+        baseline = os.path.join(self.test_dir, "baseline.json")
+
+        with patch("benchmark.run_micro_benchmarks", return_value={"to_pcm16": 0.1}):
+            self.assertEqual(main(["--micro-only", "--baseline", baseline]), 2)
+            self.assertEqual(main(["--micro-only", "--baseline", baseline, "--write-baseline"]), 0)
+            self.assertEqual(main(["--micro-only", "--baseline", baseline]), 0)
+
+    def test_micro_benchmarks_report_every_helper(self):
+        results = run_micro_benchmarks(seconds=2, repeat=1)
+
+        self.assertEqual(set(results), {"to_pcm16", "encode_wav_bytes", "decode_wav_bytes",
+                                        "audio_fingerprint", "crossfade"})
+        self.assertTrue(all(seconds >= 0 for seconds in results.values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
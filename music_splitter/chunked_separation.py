@@ -0,0 +1,154 @@
+import wave
+
+import numpy as np
+
+from audio_io import to_pcm16
+
+# Rough number of window-sized float32 buffers Spleeter keeps alive while
+# separating one window (input, STFT, masks, per-stem spectrograms, outputs).
+SEPARATION_MEMORY_FACTOR = 24
+
+DEFAULT_SAMPLE_RATE = 44100
+DEFAULT_CHANNELS = 2
+
+
+def window_seconds_for_memory(max_memory_mb: float, overlap_seconds: float,
+                              sample_rate: int = DEFAULT_SAMPLE_RATE, channels: int = DEFAULT_CHANNELS) -> float:
+    """
+    Returns the longest window (in seconds) whose separation fits in max_memory_mb.
+    """
+    bytes_per_second = sample_rate * channels * np.dtype(np.float32).itemsize * SEPARATION_MEMORY_FACTOR
+    window_seconds = (max_memory_mb * 1024 * 1024) / bytes_per_second
+
+    if window_seconds < 2 * overlap_seconds:
+        raise ValueError(
+            f"Memory ceiling of {max_memory_mb} MB is too small for a {overlap_seconds}s overlap "
+            f"(window would be {window_seconds:.2f}s)"
+        )
+    return window_seconds
+
+
+def crossfade(tail, head):
+    """Linearly fades out the previous window's tail while fading in the next window's head."""
+    fade_in = np.linspace(0.0, 1.0, len(head), dtype=np.float32)[:, None]
+    return tail * (1.0 - fade_in) + head * fade_in
+
+
+class WavStemWriter:
+    """Appends float waveform blocks to a 16-bit PCM WAV file as they are produced."""
+
+    def __init__(self, path: str, sample_rate: int, channels: int):
+        self.path = path
+        self._wav = wave.open(path, "wb")
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, block):
+        self._wav.writeframes(to_pcm16(block).tobytes())
+
+    def close(self):
+        self._wav.close()
+
+
+def separate_in_chunks(input_path: str, stem_paths: dict, audio_loader, separator,
+                       max_memory_mb: float, overlap_seconds: float = 2.0, on_first_window=None):
+    """
+    Separates input_path window by window and streams each stem to its WAV file.
+
+    Consecutive windows overlap by overlap_seconds and are crossfaded over that
+    region, so only one window (plus one overlap tail per stem) is held in memory.
+    on_first_window({stem: samples}, sample_rate), if given, receives the final
+    audio of the first window as soon as it has been written.
+    """
+    window_seconds = window_seconds_for_memory(max_memory_mb, overlap_seconds)
+    print(f"[Chunked] Separating {input_path} in {window_seconds:.1f}s windows "
+          f"with {overlap_seconds}s overlap (ceiling: {max_memory_mb} MB)")
+
+    writers = {}
+    pending_tails = {}
+    sample_rate = None
+    window_len = overlap_len = hop = None
+    start = 0
+    windows = 0
+
+    try:
+        while True:
+            if sample_rate is None:
+                waveform, sample_rate = audio_loader.load(input_path, offset=0.0, duration=window_seconds)
+                window_len = int(round(window_seconds * sample_rate))
+                overlap_len = int(round(overlap_seconds * sample_rate))
+                hop = window_len - overlap_len
+            else:
+                waveform, _ = audio_loader.load(input_path, offset=start / sample_rate,
+                                                duration=window_len / sample_rate)
+
+            n = len(waveform)
+            if n == 0:
+                # The previous window ended exactly at the end of the file.
+                for stem, tail in pending_tails.items():
+                    writers[stem].write(tail)
+                break
+
+            separated = separator.separate(waveform)
+            del waveform
+            is_last = n < window_len
+
+            written = {}
+            for stem, path in stem_paths.items():
+                block = np.asarray(separated[stem][:n], dtype=np.float32)
+                if stem not in writers:
+                    writers[stem] = WavStemWriter(path, sample_rate, block.shape[1])
+
+                tail = pending_tails.pop(stem, None)
+                if tail is not None:
+                    seam = min(len(tail), n)
+                    block[:seam] = crossfade(tail[:seam], block[:seam])
+
+                if is_last:
+                    written[stem] = block
+                else:
+                    written[stem] = block[:n - overlap_len]
+                    pending_tails[stem] = block[n - overlap_len:].copy()
+                writers[stem].write(written[stem])
+
+            if windows == 0 and on_first_window is not None:
+                on_first_window(written, sample_rate)
+            del separated, written
+            windows += 1
+            if is_last:
+                break
+            start += hop
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    print(f"[Chunked] Done: {windows} windows written to {', '.join(stem_paths.values())}")
+    return sample_rate
+
+
+def separate_progressively(waveform, sample_rate: int, separator, preview_seconds: float,
+                           overlap_seconds: float, on_preview):
+    """
+    Separates the first preview_seconds on their own so they can be published early.
+
+    on_preview({stem: samples}) is called with the opening preview_seconds of every
+    stem before the rest of the song is separated. The two parts overlap by
+    overlap_seconds and are crossfaded, so the preview matches the final output.
+    """
+    preview_len = int(round(preview_seconds * sample_rate))
+    overlap_len = int(round(overlap_seconds * sample_rate))
+    if len(waveform) <= preview_len + overlap_len:
+        return separator.separate(waveform)
+
+    head = separator.separate(waveform[:preview_len + overlap_len])
+    on_preview({stem: np.asarray(data[:preview_len]) for stem, data in head.items()})
+
+    rest = separator.separate(waveform[preview_len:])
+    separated = {}
+    for stem, head_data in head.items():
+        rest_data = np.asarray(rest[stem][:len(waveform) - preview_len], dtype=np.float32)
+        rest_data[:overlap_len] = crossfade(np.asarray(head_data[preview_len:], dtype=np.float32),
+                                            rest_data[:overlap_len])
+        separated[stem] = np.concatenate([np.asarray(head_data[:preview_len], dtype=np.float32), rest_data])
+    return separated
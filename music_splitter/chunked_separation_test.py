@@ -0,0 +1,163 @@
+import unittest
+import os
+import shutil
+import tempfile
+import tracemalloc
+import wave
+
+import numpy as np
+
+from chunked_separation import (
+    separate_in_chunks,
+    separate_progressively,
+    window_seconds_for_memory,
+    SEPARATION_MEMORY_FACTOR
+)
+
+SAMPLE_RATE = 44100
+
+
+def synthetic_song(start, length):
+    """Deterministic stereo signal, so any window can be generated on demand."""
+    t = (np.arange(start, start + length, dtype=np.float64) / SAMPLE_RATE)[:, None]
+    left = 0.4 * np.sin(2 * np.pi * 220.0 * t) + 0.2 * np.sin(2 * np.pi * 3.7 * t) * np.sin(2 * np.pi * 1320.0 * t)
+    right = 0.3 * np.sin(2 * np.pi * 330.0 * t + 0.5)
+    return np.hstack([left, right]).astype(np.float32)
+
+
+class GeneratedAudioLoader:
+    """Serves windows of a long synthetic song without ever materializing all of it."""
+
+    def __init__(self, total_samples):
+        self.total_samples = total_samples
+        self.max_window = 0
+
+    def load(self, path, offset=None, duration=None, sample_rate=None):
+        start = int(round((offset or 0.0) * SAMPLE_RATE))
+        length = self.total_samples - start
+        if duration is not None:
+            length = min(length, int(round(duration * SAMPLE_RATE)))
+        length = max(0, length)
+        self.max_window = max(self.max_window, length)
+        return synthetic_song(start, length), SAMPLE_RATE
+
+
+class SmoothingSeparator:
+    """Context-dependent stand-in for Spleeter: output near a window edge differs from the full-file result."""
+
+    def __init__(self, width=64):
+        self.kernel = np.ones(width, dtype=np.float32) / width
+
+    def separate(self, waveform):
+        accompaniment = np.stack(
+            [np.convolve(waveform[:, c], self.kernel, mode="same") for c in range(waveform.shape[1])],
+            axis=1
+        ).astype(np.float32)
+        return {"accompaniment": accompaniment, "vocals": waveform - accompaniment}
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as f:
+        frames = f.readframes(f.getnframes())
+        channels = f.getnchannels()
+    return np.frombuffer(frames, dtype="<i2").reshape(-1, channels).astype(np.float32) / 32767.0
+
+
+class TestChunkedSeparation(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.stem_paths = {
+            "accompaniment": os.path.join(self.test_dir, "instrumental.wav"),
+            "vocals": os.path.join(self.test_dir, "vocal.wav")
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_window_seconds_for_memory_rejects_tiny_ceiling(self):
+        with self.assertRaises(ValueError):
+            window_seconds_for_memory(1, overlap_seconds=2.0)
+
+    def test_chunked_output_matches_full_file_separation(self):
+        total_samples = SAMPLE_RATE * 40 + 1234
+        loader = GeneratedAudioLoader(total_samples)
+        separator = SmoothingSeparator()
+
+        separate_in_chunks("song.wav", self.stem_paths, loader, separator,
+                           max_memory_mb=40, overlap_seconds=1.0)
+
+        full = separator.separate(synthetic_song(0, total_samples))
+        for stem, path in self.stem_paths.items():
+            chunked = read_wav(path)
+            expected = np.clip(full[stem], -1.0, 1.0)
+            self.assertEqual(chunked.shape, expected.shape)
+
+            error = chunked - expected
+            snr_db = 10 * np.log10(np.sum(expected ** 2) / np.sum(error ** 2))
+            self.assertGreater(snr_db, 60.0, f"{stem} SNR too low: {snr_db:.1f} dB")
+            # Seams must not click: no sample may be off by more than quantization plus edge smearing.
+            self.assertLess(np.max(np.abs(error)), 5e-3)
+
+    def test_chunked_output_when_song_ends_on_window_boundary(self):
+        window_seconds = window_seconds_for_memory(40, 1.0)
+        window_len = int(round(window_seconds * SAMPLE_RATE))
+        hop = window_len - SAMPLE_RATE
+        total_samples = window_len + 2 * hop
+        loader = GeneratedAudioLoader(total_samples)
+
+        separate_in_chunks("song.wav", self.stem_paths, loader, SmoothingSeparator(),
+                           max_memory_mb=40, overlap_seconds=1.0)
+
+        for path in self.stem_paths.values():
+            self.assertEqual(len(read_wav(path)), total_samples)
+
+    def test_peak_memory_stays_under_ceiling_for_long_song(self):
+        max_memory_mb = 32
+        total_samples = SAMPLE_RATE * 600  # 10 minutes, ~200 MB as a float32 stereo array
+        loader = GeneratedAudioLoader(total_samples)
+
+        tracemalloc.start()
+        try:
+            separate_in_chunks("song.wav", self.stem_paths, loader, SmoothingSeparator(),
+                               max_memory_mb=max_memory_mb, overlap_seconds=1.0)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak, max_memory_mb * 1024 * 1024)
+        window_bytes = loader.max_window * 2 * 4
+        self.assertLessEqual(window_bytes * SEPARATION_MEMORY_FACTOR, max_memory_mb * 1024 * 1024 * 1.001)
+        self.assertEqual(len(read_wav(self.stem_paths["accompaniment"])), total_samples)
+
+    def test_progressive_preview_matches_start_of_final_stems(self):
+        waveform = synthetic_song(0, SAMPLE_RATE * 20)
+        separator = SmoothingSeparator()
+        previews = []
+
+        separated = separate_progressively(waveform, SAMPLE_RATE, separator, preview_seconds=5,
+                                           overlap_seconds=1.0, on_preview=previews.append)
+
+        self.assertEqual(len(previews), 1)
+        full = separator.separate(waveform)
+        for stem, data in separated.items():
+            self.assertEqual(data.shape, waveform.shape)
+            np.testing.assert_array_equal(previews[0][stem], data[:SAMPLE_RATE * 5])
+
+            error = data - full[stem]
+            snr_db = 10 * np.log10(np.sum(full[stem] ** 2) / np.sum(error ** 2))
+            self.assertGreater(snr_db, 60.0, f"{stem} SNR too low: {snr_db:.1f} dB")
+
+    def test_progressive_skips_preview_for_short_song(self):
+        previews = []
+        waveform = synthetic_song(0, SAMPLE_RATE * 3)
+
+        separated = separate_progressively(waveform, SAMPLE_RATE, SmoothingSeparator(), preview_seconds=5,
+                                           overlap_seconds=1.0, on_preview=previews.append)
+
+        self.assertEqual(previews, [])
+        self.assertEqual(separated["vocals"].shape, waveform.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
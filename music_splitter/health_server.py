@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HEALTH_PORT = int(os.getenv("SPLITTER_HEALTH_PORT", "8080"))
+
+
+class WorkerHealth:
+    """
+    Startup timings and per-worker readiness, shared by the health endpoints.
+
+    Readiness and warm-up timings live in shared memory, so forked worker
+    processes (see worker_pool.py) can report to the parent that serves HTTP.
+    Create this before forking.
+    """
+
+    def __init__(self, num_workers: int = 1):
+        self.num_workers = num_workers
+        self.started_at = time.monotonic()
+        self.timings = {}
+        self._ready = multiprocessing.Array("b", num_workers)
+        self._warmup_seconds = multiprocessing.Array("d", num_workers)
+        self._ready_at = multiprocessing.Value("d", 0.0)
+
+    def record(self, phase: str, seconds: float):
+        self.timings[phase] = seconds
+        print(f"[Health] {phase} took {seconds:.2f}s")
+
+    @contextmanager
+    def timed(self, phase: str):
+        started = time.monotonic()
+        yield
+        self.record(phase, time.monotonic() - started)
+
+    def record_warmup(self, worker_index: int, seconds: float):
+        self._warmup_seconds[worker_index] = seconds
+        print(f"[Health] Worker {worker_index} warm-up took {seconds:.2f}s")
+
+    def set_ready(self, worker_index: int = 0, ready: bool = True):
+        self._ready[worker_index] = 1 if ready else 0
+        if ready:
+            with self._ready_at.get_lock():
+                if self._ready_at.value == 0.0:
+                    self._ready_at.value = time.monotonic()
+                    print(f"[Health] Ready {self._ready_at.value - self.started_at:.2f}s after start")
+
+    def ready_workers(self) -> int:
+        return sum(self._ready[:])
+
+    def is_ready(self) -> bool:
+        return self.ready_workers() > 0
+
+    def metrics_text(self) -> str:
+        """Prometheus text exposition of the startup metrics."""
+        lines = [
+            "# TYPE splitter_startup_seconds gauge",
+            *(f'splitter_startup_seconds{{phase="{phase}"}} {seconds:.6f}' for phase, seconds in self.timings.items()),
+            "# TYPE splitter_warmup_seconds gauge",
+            *(f'splitter_warmup_seconds{{worker="{i}"}} {self._warmup_seconds[i]:.6f}' for i in range(self.num_workers)),
+            "# TYPE splitter_ready_workers gauge",
+            f"splitter_ready_workers {self.ready_workers()}",
+            "# TYPE splitter_workers gauge",
+            f"splitter_workers {self.num_workers}",
+            "# TYPE splitter_uptime_seconds gauge",
+            f"splitter_uptime_seconds {time.monotonic() - self.started_at:.3f}",
+        ]
+        if self._ready_at.value:
+            lines += [
+                "# TYPE splitter_time_to_ready_seconds gauge",
+                f"splitter_time_to_ready_seconds {self._ready_at.value - self.started_at:.6f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def start_health_server(health: WorkerHealth, port: int = HEALTH_PORT):
+    """
+    Serves /healthz (liveness), /readyz (200 once a worker has warmed up, else 503)
+    and /metrics on a daemon thread. Returns the server; server.server_port is the bound port.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body, content_type="application/json"):
+            data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/readyz":
+                ready = health.is_ready()
+                self._send(200 if ready else 503, {
+                    "status": "ready" if ready else "starting",
+                    "ready_workers": health.ready_workers(),
+                    "workers": health.num_workers,
+                })
+            elif self.path == "/metrics":
+                self._send(200, health.metrics_text(), "text/plain; version=0.0.4")
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            # Probes hit these endpoints every few seconds; keep them out of the job logs.
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="health-server", daemon=True).start()
+    print(f"[Health] Serving /healthz, /readyz and /metrics on port {server.server_port}")
+    return server
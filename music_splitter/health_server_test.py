@@ -0,0 +1,70 @@
+import unittest
+import json
+import os
+import urllib.error
+import urllib.request
+
+from health_server import WorkerHealth, start_health_server
+
+
+class TestHealthServer(unittest.TestCase):
+
+    def setUp(self):
+        self.health = WorkerHealth(num_workers=2)
+        self.server = start_health_server(self.health, port=0)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.base_url + path, timeout=5) as resp:
+                return resp.status, resp.read().decode()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode()
+
+    def test_liveness_is_ok_while_loading(self):
+        status, _ = self.get("/healthz")
+        self.assertEqual(status, 200)
+
+    def test_readiness_waits_for_a_warmed_up_worker(self):
+        status, body = self.get("/readyz")
+        self.assertEqual(status, 503)
+        self.assertEqual(json.loads(body)["status"], "starting")
+
+        self.health.set_ready(1)
+        status, body = self.get("/readyz")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["ready_workers"], 1)
+
+        self.health.set_ready(1, False)
+        status, _ = self.get("/readyz")
+        self.assertEqual(status, 503)
+
+    def test_readiness_is_shared_with_forked_workers(self):
+        pid = os.fork()
+        if pid == 0:
+            self.health.set_ready(0)
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        self.assertTrue(self.health.is_ready())
+
+    def test_metrics_expose_startup_timings(self):
+        self.health.record("model_load", 1.5)
+        self.health.record_warmup(0, 0.25)
+        self.health.set_ready(0)
+
+        status, body = self.get("/metrics")
+
+        self.assertEqual(status, 200)
+        self.assertIn('splitter_startup_seconds{phase="model_load"} 1.500000', body)
+        self.assertIn('splitter_warmup_seconds{worker="0"} 0.250000', body)
+        self.assertIn("splitter_ready_workers 1", body)
+        self.assertIn("splitter_time_to_ready_seconds", body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+INFERENCE_SOCKET = os.getenv("SPLITTER_INFERENCE_SOCKET", "/tmp/music_splitter.sock")
+INFERENCE_MAX_BATCH = int(os.getenv("SPLITTER_INFERENCE_MAX_BATCH", "8"))
+INFERENCE_MAX_LATENCY_MS = float(os.getenv("SPLITTER_INFERENCE_MAX_LATENCY_MS", "50"))
+
+# Spleeter runs its U-Net on 512-frame segments with a 1024-sample hop. Padding every
+# window to a whole number of segments keeps windows from different songs out of
+# each other's segments when they share a batch.
+SEGMENT_SAMPLES = 512 * 1024
+# Spleeter's STFT frame, and the zeros it prepends to the waveform: segment k's first
+# frame starts one frame length before sample k * SEGMENT_SAMPLES, and every frame
+# reaches 3/4 of a frame past its segment's last hop.
+SPLEETER_FRAME_LENGTH = 4096
+
+
+class BatchingSeparator:
+    """
+    Collects concurrent separate() requests and runs them through the model as one call.
+
+    A batch is flushed when it holds max_batch windows or when the oldest request
+    has waited max_latency_ms, whichever comes first.
+    """
+
+    def __init__(self, separator, max_batch: int = INFERENCE_MAX_BATCH,
+                 max_latency_ms: float = INFERENCE_MAX_LATENCY_MS, segment_samples: int = SEGMENT_SAMPLES,
+                 frame_length: int = SPLEETER_FRAME_LENGTH):
+        self.separator = separator
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000.0
+        self.segment_samples = segment_samples
+        self.frame_length = frame_length
+        self.batches_run = 0
+        self.windows_run = 0
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, waveform) -> Future:
+        future = Future()
+        self._requests.put((np.asarray(waveform, dtype=np.float32), future))
+        return future
+
+    def separate(self, waveform):
+        return self.submit(waveform).result()
+
+    def _collect_batch(self):
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            try:
+                results = self._separate_batch([waveform for waveform, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                traceback.print_exc()
+                for _, future in batch:
+                    future.set_exception(e)
+
+    def _separate_batch(self, waveforms):
+        if len(waveforms) == 1:
+            self.batches_run += 1
+            self.windows_run += 1
+            return [self.separator.separate(waveforms[0])]
+
+        # Lay the windows end to end and split afterwards. Each window starts on a segment
+        # boundary, so the segment's first frame begins a frame length earlier, just as it
+        # does over Spleeter's own leading pad for a lone window. At least a frame length
+        # of zeros follows every window: that is the next window's leading pad, and it
+        # keeps the frames overlapping this window's end from reaching into the next song.
+        offsets = []
+        padded = []
+        position = 0
+        for waveform in waveforms:
+            length = len(waveform)
+            padded_length = -(-(length + self.frame_length) // self.segment_samples) * self.segment_samples
+            padding = np.zeros((padded_length - length, waveform.shape[1]), dtype=np.float32)
+            padded.extend([waveform, padding])
+            offsets.append((position, length))
+            position += padded_length
+
+        separated = self.separator.separate(np.concatenate(padded))
+        self.batches_run += 1
+        self.windows_run += len(waveforms)
+        print(f"[Inference] Separated {len(waveforms)} windows in one call")
+
+        return [
+            {stem: np.array(data[start:start + length]) for stem, data in separated.items()}
+            for start, length in offsets
+        ]
+
+
+class InferenceServer:
+    """Owns the separation model and serves separate() calls to worker processes over a Unix socket."""
+
+    def __init__(self, socket_path: str, separator, max_batch: int = INFERENCE_MAX_BATCH,
+                 max_latency_ms: float = INFERENCE_MAX_LATENCY_MS):
+        self.socket_path = socket_path
+        self.batcher = BatchingSeparator(separator, max_batch, max_latency_ms)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self._listener = Listener(socket_path, family="AF_UNIX")
+
+    def serve_forever(self):
+        print(f"[Inference] Listening on {self.socket_path} (max batch: {self.batcher.max_batch}, "
+              f"max latency: {self.batcher.max_latency * 1000:.0f} ms)")
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                break  # listener closed
+            threading.Thread(target=self._handle_client, args=(conn,), daemon=True).start()
+
+    def _handle_client(self, conn):
+        with conn:
+            while True:
+                try:
+                    waveform = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    conn.send(("ok", self.batcher.separate(waveform)))
+                except Exception as e:
+                    print(f"[Inference] Separation failed: {e}")
+                    conn.send(("error", str(e)))
+
+    def close(self):
+        self._listener.close()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class RemoteSeparator:
+    """Drop-in replacement for a local separation backend that delegates to an InferenceServer."""
+
+    def __init__(self, socket_path: str = INFERENCE_SOCKET, connect_timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return Client(self.socket_path, family="AF_UNIX")
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.5)
+
+    def separate(self, waveform):
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                self._conn.send(np.asarray(waveform, dtype=np.float32))
+                status, payload = self._conn.recv()
+            except (EOFError, OSError):
+                self._conn = None
+                raise
+        if status != "ok":
+            raise RuntimeError(f"Inference server failed to separate: {payload}")
+        return payload
+
+
+if __name__ == "__main__":
+    from separation_backends import create_separator
+
+    server = InferenceServer(INFERENCE_SOCKET, create_separator())
+    server.serve_forever()
@@ -0,0 +1,141 @@
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from inference_server import BatchingSeparator, InferenceServer, RemoteSeparator
+
+
+class RecordingSeparator:
+    """Pointwise stand-in for Spleeter that records every model call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def separate(self, waveform):
+        self.calls.append(len(waveform))
+        return {"accompaniment": waveform * 0.25, "vocals": waveform * 0.75}
+
+
+class SegmentGridSeparator:
+    """
+    Stand-in that follows Spleeter's framing: frame_length zeros are prepended, the
+    signal is cut into frames of frame_length every hop, and frames are grouped into
+    segments of segment_frames. Each sample is scaled by the energy of the segment
+    its frame belongs to, so audio leaking into a segment changes the output.
+    """
+
+    def __init__(self, frame_length=64, hop=16, segment_frames=8):
+        self.frame_length = frame_length
+        self.hop = hop
+        self.segment_frames = segment_frames
+        self.segment_samples = hop * segment_frames
+
+    def separate(self, waveform):
+        length = len(waveform)
+        padded = np.concatenate([np.zeros((self.frame_length, waveform.shape[1]), np.float32), waveform])
+        segments = -(-len(padded) // self.segment_samples)
+        padded = np.concatenate([padded, np.zeros((segments * self.segment_samples + self.frame_length
+                                                   - len(padded), waveform.shape[1]), np.float32)])
+        out = np.zeros_like(padded)
+        for k in range(segments):
+            start = k * self.segment_samples
+            energy = np.abs(padded[start:start + self.segment_samples - self.hop + self.frame_length]).sum()
+            out[start:start + self.segment_samples] = padded[start:start + self.segment_samples] * (1 + energy)
+        out = out[self.frame_length:self.frame_length + length]
+        return {"accompaniment": out, "vocals": out * 0.5}
+
+
+class TestBatchingSeparator(unittest.TestCase):
+
+    def test_batched_windows_match_separate_runs_at_their_boundaries(self):
+        model = SegmentGridSeparator()
+        batcher = BatchingSeparator(model, max_batch=3, max_latency_ms=500,
+                                    segment_samples=model.segment_samples, frame_length=model.frame_length)
+        rng = np.random.default_rng(0)
+        # The first window is an exact number of segments long, the case that used to get no padding.
+        windows = [rng.standard_normal((n, 2)).astype(np.float32) for n in (2 * model.segment_samples, 100, 200)]
+
+        futures = [batcher.submit(w) for w in windows]
+        results = [f.result(timeout=5) for f in futures]
+
+        self.assertEqual(batcher.batches_run, 1)
+        for window, result in zip(windows, results):
+            expected = model.separate(window)
+            for stem in ("accompaniment", "vocals"):
+                np.testing.assert_allclose(result[stem], expected[stem], rtol=1e-5)
+
+    def test_concurrent_windows_share_one_model_call(self):
+        model = RecordingSeparator()
+        batcher = BatchingSeparator(model, max_batch=4, max_latency_ms=500, segment_samples=1024)
+
+        windows = [np.full((1000 + i * 700, 2), i + 1, dtype=np.float32) for i in range(4)]
+        futures = [batcher.submit(w) for w in windows]
+        results = [f.result(timeout=5) for f in futures]
+
+        self.assertEqual(len(model.calls), 1)
+        self.assertEqual(model.calls[0] % 1024, 0)
+        for window, result in zip(windows, results):
+            np.testing.assert_allclose(result["accompaniment"], window * 0.25)
+            np.testing.assert_allclose(result["vocals"], window * 0.75)
+
+    def test_single_request_flushes_after_max_latency(self):
+        model = RecordingSeparator()
+        batcher = BatchingSeparator(model, max_batch=8, max_latency_ms=20)
+
+        result = batcher.separate(np.ones((10, 2), dtype=np.float32))
+
+        self.assertEqual(model.calls, [10])
+        np.testing.assert_allclose(result["vocals"], 0.75)
+
+    def test_model_error_is_returned_to_every_caller(self):
+        model = MagicMock()
+        model.separate.side_effect = RuntimeError("model crashed")
+        batcher = BatchingSeparator(model, max_batch=2, max_latency_ms=200, segment_samples=16)
+
+        futures = [batcher.submit(np.ones((8, 2), dtype=np.float32)) for _ in range(2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result(timeout=5)
+
+
+class TestInferenceServer(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.test_dir, "splitter.sock")
+        self.model = RecordingSeparator()
+        self.server = InferenceServer(self.socket_path, self.model, max_batch=4, max_latency_ms=300)
+        self.server.batcher.segment_samples = 512
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_remote_clients_are_batched(self):
+        results = {}
+
+        def worker(i):
+            client = RemoteSeparator(self.socket_path, connect_timeout=5)
+            results[i] = client.separate(np.full((300 + i, 2), i, dtype=np.float32))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(timeout=10)
+
+        self.assertEqual(len(results), 4)
+        self.assertLess(len(self.model.calls), 4)
+        for i, result in results.items():
+            self.assertEqual(result["accompaniment"].shape, (300 + i, 2))
+            np.testing.assert_allclose(result["accompaniment"], i * 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
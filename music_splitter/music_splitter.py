@@ -1,24 +1,102 @@
+import time
+
+_import_started = time.monotonic()
+
 import datetime
+import functools
 import json
 import os
 import shutil
+import tempfile
 import threading
 import traceback
 
+import numpy as np
 import pika
-from spleeter.audio.adapter import AudioAdapter
-from spleeter.separator import Separator
 
+from audio_io import WavAudioLoader, decode_audio_bytes, encode_stem, encode_stem_file
+from chunked_separation import separate_in_chunks, separate_progressively
+from health_server import WorkerHealth, start_health_server
+from inference_server import RemoteSeparator
+from pipeline import StagedPipeline
+from separation_backends import create_separator
+from stem_cache import audio_fingerprint, fingerprint_file_in_chunks, restore_stems_from_cache, store_stems_in_cache
+from worker_pool import configure_worker_process, run_forked_workers
 from shared import gcs_utils as default_gcs_utils
+from shared.gcs_utils import STEM_RENDITIONS
 from shared import constants
+from shared.worker_runtime import WorkerRuntime
 
 RABBITMQ_HOST = constants.RABBITMQ_HOST
 LYRICS_QUEUE_NAME = constants.LYRICS_QUEUE_NAME
 SPLIT_QUEUE_NAME = constants.SPLIT_QUEUE_NAME
 EVENT_TRACKER_QUEUE_NAME = constants.EVENT_TRACKER_QUEUE_NAME
 
-separator = Separator('spleeter:2stems')  # heavy TF model loaded once
-audio_loader = AudioAdapter.default()
+# "full" separates the whole song at once, "chunked" streams it in overlapping windows,
+# "memory" keeps download, decoding, separation and encoding entirely in memory.
+SPLIT_MODE = os.getenv("SPLIT_MODE", "full")
+SPLIT_MAX_MEMORY_MB = float(os.getenv("SPLIT_MAX_MEMORY_MB", "2048"))
+SPLIT_OVERLAP_SECONDS = float(os.getenv("SPLIT_OVERLAP_SECONDS", "2"))
+
+# Renditions uploaded for each stem; WAV only when archival copies are requested.
+STEM_OUTPUT_FORMATS = constants.STEM_OUTPUT_FORMATS
+
+# Seconds of instrumental published as a playable preview before the full split finishes (0 disables).
+SPLIT_PREVIEW_SECONDS = float(os.getenv("SPLIT_PREVIEW_SECONDS", "30"))
+PREVIEW_FORMATS = constants.PREVIEW_FORMATS
+
+# Reuse stems of byte-identical decoded audio uploaded under another song ID.
+STEM_CACHE_ENABLED = os.getenv("STEM_CACHE_ENABLED", "true").lower() == "true"
+
+# Overlap download, separation and upload of consecutive songs (see pipeline.py).
+# SPLIT_PIPELINE_PREFETCH is how many unacked songs one worker holds: one per stage.
+SPLIT_PIPELINE = os.getenv("SPLIT_PIPELINE", "true").lower() == "true"
+SPLIT_PIPELINE_PREFETCH = int(os.getenv("SPLIT_PIPELINE_PREFETCH", "3"))
+
+# Number of consumer processes forked from one parent (see worker_pool.py). Each one
+# loads its own model unless SPLITTER_USE_INFERENCE_SERVER is set.
+SPLITTER_WORKERS = int(os.getenv("SPLITTER_WORKERS", "1"))
+
+# Thread topology of each worker process (see worker_pool.configure_worker_process).
+# 0 derives the thread counts from the CPUs a worker may use. SPLIT_CPU_AFFINITY is
+# "off", "auto" or an explicit CPU list such as "0-7" shared out between the workers.
+SPLIT_INTRA_OP_THREADS = int(os.getenv("SPLIT_INTRA_OP_THREADS", "0"))
+SPLIT_INTER_OP_THREADS = int(os.getenv("SPLIT_INTER_OP_THREADS", "0"))
+SPLIT_CPU_AFFINITY = os.getenv("SPLIT_CPU_AFFINITY", "off")
+
+# With SPLITTER_USE_INFERENCE_SERVER=true the model lives in inference_server.py and is shared
+# by every worker process on the node; otherwise each process loads its own copy of the
+# SPLIT_BACKEND model (see separation_backends.py).
+USE_INFERENCE_SERVER = os.getenv("SPLITTER_USE_INFERENCE_SERVER", "false").lower() == "true"
+
+# Seconds of silence separated before a worker starts consuming (0 disables the warm-up).
+SPLIT_WARMUP_SECONDS = float(os.getenv("SPLIT_WARMUP_SECONDS", "1"))
+
+# Built by load_models() once the health endpoint is up, not at import time.
+separator = None
+audio_loader = None
+health = WorkerHealth(SPLITTER_WORKERS)
+
+def load_models():
+    global separator, audio_loader
+    with health.timed("model_load"):
+        from spleeter.audio.adapter import AudioAdapter
+
+        # Downloads are WAV; ffmpeg is only spawned for anything else.
+        audio_loader = WavAudioLoader(fallback=AudioAdapter.default())
+        if USE_INFERENCE_SERVER:
+            separator = RemoteSeparator()
+        else:
+            separator = create_separator()  # Spleeter restores its weights on the first separate(), in warm_up()
+
+def warm_up(worker_index=0):
+    # The first separation builds the TF graph and restores the checkpoint. Pay for it on a
+    # short silent buffer so the first real job runs at full speed, then report ready.
+    if SPLIT_WARMUP_SECONDS > 0:
+        started = time.monotonic()
+        separator.separate(np.zeros((int(SPLIT_WARMUP_SECONDS * 44100), 2), dtype=np.float32))
+        health.record_warmup(worker_index, time.monotonic() - started)
+    health.set_ready(worker_index)
 
 # Queue functions
 def notify_event_tracker(ch, status, job_id="", song_id="", error_message=None):
@@ -64,33 +142,184 @@ def upload_file_safe(url, local_path, label, errors, gcs_utils):
         print(f"Failed to upload {label}: {e}")
         errors[label] = str(e)
 
-def split_and_upload_instrumental(job_id: str, song_id: str, audio_loader, separator, gcs_utils):
-    print(f"Processing song ID: {song_id}")
+def upload_rendition_safe(url, rendition, label, errors, gcs_utils):
+    # rendition is (fmt, encode); encoding runs here so renditions are encoded in parallel.
+    fmt, encode = rendition
+    try:
+        data = encode()
+        print(f"Uploading {label} to: {url}")
+        _, content_type = STEM_RENDITIONS[fmt]
+        gcs_utils.upload_bytes_to_gcs(url, data, content_type=content_type)
+    except Exception as e:
+        print(f"Failed to upload {label}: {e}")
+        errors[label] = str(e)
+
+def upload_in_parallel(uploads, gcs_utils):
+    """Runs upload_fn(url, source, label, errors, gcs_utils) for every (upload_fn, url, source, label) concurrently."""
+    errors = {}
+    threads = [
+        threading.Thread(target=upload_fn, args=(url, source, label, errors, gcs_utils))
+        for upload_fn, url, source, label in uploads
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise RuntimeError(f"Failed to upload: {', '.join(errors.keys())} — {errors}")
+
+def stem_uploads_from_files(song_id, stem_paths, gcs_utils):
+    """Upload jobs for every rendition of stems written to disk ({"instrumental": path, "vocals": path})."""
+    uploads = []
+    for stem, path in stem_paths.items():
+        for fmt in STEM_OUTPUT_FORMATS:
+            url = gcs_utils.get_stem_url(song_id, stem, fmt)
+            if fmt == "wav":
+                uploads.append((upload_file_safe, url, path, stem))
+            else:
+                encode = functools.partial(encode_stem_file, path, fmt)
+                uploads.append((upload_rendition_safe, url, (fmt, encode), f"{stem}.{fmt}"))
+    return uploads
+
+def stem_uploads_from_waveforms(song_id, stems, sample_rate, gcs_utils):
+    """Upload jobs for every rendition of in-memory stems ({"instrumental": waveform, "vocals": waveform})."""
+    uploads = []
+    for stem, waveform in stems.items():
+        for fmt in STEM_OUTPUT_FORMATS:
+            url = gcs_utils.get_stem_url(song_id, stem, fmt)
+            encode = functools.partial(encode_stem, waveform, sample_rate, fmt)
+            uploads.append((upload_rendition_safe, url, (fmt, encode), f"{stem}.{fmt}"))
+    return uploads
 
-    instrumental_url = gcs_utils.get_instrumental_url(song_id)
-    vocals_url = gcs_utils.get_vocals_url(song_id)
+def stems_exist(song_id, gcs_utils):
+    return all(
+        gcs_utils.gcs_file_exists(gcs_utils.get_stem_url(song_id, stem, fmt))
+        for stem in ("instrumental", "vocals")
+        for fmt in STEM_OUTPUT_FORMATS
+    )
 
-    if gcs_utils.gcs_file_exists(instrumental_url) and gcs_utils.gcs_file_exists(vocals_url):
+def upload_preview(song_id, instrumental, sample_rate, gcs_utils, on_preview_ready):
+    # The preview is best effort: a failure here must not fail the job.
+    try:
+        uploads = [
+            (upload_rendition_safe, gcs_utils.get_stem_url(song_id, "instrumental_preview", fmt),
+             (fmt, functools.partial(encode_stem, instrumental, sample_rate, fmt)), f"instrumental_preview.{fmt}")
+            for fmt in PREVIEW_FORMATS
+        ]
+        upload_in_parallel(uploads, gcs_utils)
+        on_preview_ready()
+        print(f"Published {len(instrumental) / sample_rate:.0f}s instrumental preview for {song_id}")
+    except Exception as e:
+        print(f"Failed to publish preview for {song_id}: {e}")
+        traceback.print_exc()
+
+def separate_stems(song_id, waveform, sample_rate, separator, gcs_utils, on_preview_ready=None):
+    """Separates a whole waveform, publishing a preview of the opening seconds first when requested."""
+    if on_preview_ready is None or SPLIT_PREVIEW_SECONDS <= 0:
+        return separator.separate(waveform)
+
+    # The preview is uploaded on this thread, so on_preview_ready may safely use the AMQP channel.
+    return separate_progressively(
+        waveform, sample_rate, separator, SPLIT_PREVIEW_SECONDS, SPLIT_OVERLAP_SECONDS,
+        lambda preview: upload_preview(song_id, preview['accompaniment'], sample_rate, gcs_utils, on_preview_ready)
+    )
+
+# Split stages. Each stage takes and returns the job dict built by download_original, so
+# consecutive songs can be in different stages at once (see pipeline.py).
+def download_original(job_id: str, song_id: str, gcs_utils):
+    job = {"job_id": job_id, "song_id": song_id, "done": False, "fingerprint": None, "working_dir": None}
+
+    if stems_exist(song_id, gcs_utils):
         print(f"Instrumental and vocals files already exist, skipping processing for job_id: {job_id}, song_id: {song_id}")
-        return
+        job["done"] = True
+        return job
 
-    working_dir = os.path.join("downloads", song_id)
-    os.makedirs(working_dir, exist_ok=True)
+    # The downloader stores the compressed stream it got (original.opus, original.m4a, ...);
+    # it is decoded on read, by decode_audio_bytes or the audio loader's ffmpeg fallback.
+    original_url = gcs_utils.find_original_url(song_id)
+    if not original_url:
+        raise FileNotFoundError(f"No original audio found in GCS for {song_id}")
+    original_artifact = original_url.rsplit("/", 1)[-1]
+    print(f"Downloading {original_artifact} from: {original_url}")
 
-    original_path = os.path.join(working_dir, "original.wav")
-    instrumental_wav_path = os.path.join(working_dir, "instrumental.wav")
-    vocal_wav_path = os.path.join(working_dir, "vocal.wav")
+    if SPLIT_MODE == "memory":
+        job["original_bytes"] = gcs_utils.download_bytes_from_gcs(original_url)
+        return job
 
+    # One directory per job: the pipeline can hold two jobs for the same song, and
+    # cleanup_job must not remove files the other one is still using.
+    os.makedirs("downloads", exist_ok=True)
+    working_dir = tempfile.mkdtemp(prefix=f"{song_id}-", dir="downloads")
+    job["working_dir"] = working_dir
+    job["original_path"] = os.path.join(working_dir, original_artifact)
     try:
-        # Download original.wav
-        original_url = gcs_utils.get_artifact_url(song_id, "original.wav")
-        print(f"Downloading original.wav from: {original_url}")
-        gcs_utils.download_file_from_gcs(original_url, original_path)
+        gcs_utils.download_file_from_gcs(original_url, job["original_path"])
+    except Exception:
+        cleanup_job(job)
+        raise
+    return job
+
+def separate_original(job, audio_loader, separator, gcs_utils, on_preview_ready=None):
+    if job["done"]:
+        return job
+    song_id = job["song_id"]
+
+    if SPLIT_MODE == "memory":
+        # Decode and check the stem cache
+        waveform, sample_rate = decode_audio_bytes(job.pop("original_bytes"))
+        fingerprint = audio_fingerprint(waveform, sample_rate) if STEM_CACHE_ENABLED else None
+        if fingerprint and restore_stems_from_cache(song_id, fingerprint, STEM_OUTPUT_FORMATS, gcs_utils):
+            job["done"] = True
+            return job
 
         # Separate stems
         print("Running Spleeter...")
+        separated = separate_stems(song_id, waveform, sample_rate, separator, gcs_utils, on_preview_ready)
+        del waveform
+        job["stems"] = {"instrumental": separated['accompaniment'], "vocals": separated['vocals']}
+        job["sample_rate"] = sample_rate
+        job["fingerprint"] = fingerprint
+        return job
+
+    original_path = job["original_path"]
+    instrumental_wav_path = os.path.join(job["working_dir"], "instrumental.wav")
+    vocal_wav_path = os.path.join(job["working_dir"], "vocal.wav")
+
+    if SPLIT_MODE == "chunked":
+        fingerprint = fingerprint_file_in_chunks(original_path, audio_loader) if STEM_CACHE_ENABLED else None
+        if fingerprint and restore_stems_from_cache(song_id, fingerprint, STEM_OUTPUT_FORMATS, gcs_utils):
+            job["done"] = True
+            return job
+
+        # Separate and write stems window by window to bound peak memory
+        print("Running Spleeter in chunked mode...")
+        on_first_window = None
+        if on_preview_ready is not None and SPLIT_PREVIEW_SECONDS > 0:
+            def on_first_window(stems, sample_rate):
+                preview_len = int(round(SPLIT_PREVIEW_SECONDS * sample_rate))
+                upload_preview(song_id, stems['accompaniment'][:preview_len], sample_rate,
+                               gcs_utils, on_preview_ready)
+
+        separate_in_chunks(
+            original_path,
+            {"accompaniment": instrumental_wav_path, "vocals": vocal_wav_path},
+            audio_loader,
+            separator,
+            max_memory_mb=SPLIT_MAX_MEMORY_MB,
+            overlap_seconds=SPLIT_OVERLAP_SECONDS,
+            on_first_window=on_first_window
+        )
+    else:
         waveform, sample_rate = audio_loader.load(original_path)
-        separated = separator.separate(waveform)
+        fingerprint = audio_fingerprint(waveform, sample_rate) if STEM_CACHE_ENABLED else None
+        if fingerprint and restore_stems_from_cache(song_id, fingerprint, STEM_OUTPUT_FORMATS, gcs_utils):
+            job["done"] = True
+            return job
+
+        # Separate stems
+        print("Running Spleeter...")
+        separated = separate_stems(song_id, waveform, sample_rate, separator, gcs_utils, on_preview_ready)
 
         # Save files
         print("Saving instrumental.wav locally...")
@@ -98,54 +327,139 @@ def split_and_upload_instrumental(job_id: str, song_id: str, audio_loader, separ
         print("Saving vocals.wav locally...")
         audio_loader.save(vocal_wav_path, separated['vocals'], sample_rate=sample_rate)
 
-        # Upload in parallel
-        errors = {}
-        threads = [
-            threading.Thread(
-                target=upload_file_safe,
-                args=(instrumental_url, instrumental_wav_path, "instrumental", errors, gcs_utils)
-            ),
-            threading.Thread(
-                target=upload_file_safe,
-                args=(vocals_url, vocal_wav_path, "vocals", errors, gcs_utils)
-            )
-        ]
-        for t in threads:
-            t.start()
-        for t in threads:
-            t.join()
+    job["stem_paths"] = {"instrumental": instrumental_wav_path, "vocals": vocal_wav_path}
+    job["fingerprint"] = fingerprint
+    return job
+
+def upload_stems(job, gcs_utils):
+    if job["done"]:
+        return job
+    song_id = job["song_id"]
+
+    # Encode and upload every rendition in parallel
+    if "stems" in job:
+        uploads = stem_uploads_from_waveforms(song_id, job.pop("stems"), job["sample_rate"], gcs_utils)
+    else:
+        uploads = stem_uploads_from_files(song_id, job["stem_paths"], gcs_utils)
+    upload_in_parallel(uploads, gcs_utils)
+
+    if job["fingerprint"]:
+        store_stems_in_cache(song_id, job["fingerprint"], STEM_OUTPUT_FORMATS, gcs_utils)
 
-        if errors:
-            raise RuntimeError(f"Failed to upload: {', '.join(errors.keys())} — {errors}")
+    print(f"Done processing {song_id}")
+    job["done"] = True
+    return job
 
-        print(f"Done processing {song_id}")
+def cleanup_job(job):
+    if job and job.get("working_dir"):
+        shutil.rmtree(job["working_dir"], ignore_errors=True)
 
+def split_and_upload_instrumental(job_id: str, song_id: str, audio_loader, separator, gcs_utils,
+                                  on_preview_ready=None):
+    print(f"Processing song ID: {song_id}")
+    job = None
+    try:
+        job = download_original(job_id, song_id, gcs_utils)
+        job = separate_original(job, audio_loader, separator, gcs_utils, on_preview_ready)
+        upload_stems(job, gcs_utils)
     finally:
-        shutil.rmtree(working_dir, ignore_errors=True)
+        cleanup_job(job)
+
+def finish_job(ch, message):
+    # Notify event tracker
+    notify_event_tracker(ch, "Completed", message["job_id"], message["song_id"])
+    # Publish a job to lyrics syncer
+    publish_to_lyrics_syncer_queue(ch, message["job_id"], message["song_id"], message["song_name"], message["artist_name"])
+    # Send ack to rabbitmq broker.
+    ch.basic_ack(delivery_tag=message['delivery_tag'])
+
+def fail_job(ch, message):
+    job_id = message["job_id"]
+    song_id = message["song_id"]
+    notify_event_tracker(ch, "Failed", job_id, song_id,
+                         f"Internal error while splitting music for job: {job_id}, song ID: {song_id}")
+    ch.basic_nack(delivery_tag=message['delivery_tag'], requeue=False)
 
 # Message handler logic (split out of callback for testability)
 def handle_message(message, ch, audio_loader, separator, gcs_utils):
     job_id = message["job_id"]
     song_id = message["song_id"]
-    song_name = message["song_name"]
-    artist_name = message["artist_name"]
     print(f"Received message for songId: {song_id}")
 
     try:
-        split_and_upload_instrumental(job_id, song_id, audio_loader, separator, gcs_utils)
-        # Notify event tracker
-        notify_event_tracker(ch, "Completed", job_id, song_id)
-        # Publish a job to lyrics syncer
-        publish_to_lyrics_syncer_queue(ch, job_id, song_id, song_name, artist_name)
-        # Send ack to rabbitmq broker.
-        ch.basic_ack(delivery_tag=message['delivery_tag'])
+        split_and_upload_instrumental(
+            job_id, song_id, audio_loader, separator, gcs_utils,
+            on_preview_ready=lambda: notify_event_tracker(ch, "PreviewReady", job_id, song_id)
+        )
+        finish_job(ch, message)
     except Exception as processing_error:
         print(f"Error while processing songId {song_id}: {processing_error}")
         # TODO: Notify event tracker about failure
         traceback.print_exc()
-        notify_event_tracker(ch, "Failed", job_id, song_id,
-                             f"Internal error while splitting music for job: {job_id}, song ID: {song_id}")
-        ch.basic_nack(delivery_tag=message['delivery_tag'], requeue=False)
+        fail_job(ch, message)
+
+def build_split_pipeline(ch, audio_loader, separator, gcs_utils):
+    """
+    Overlaps download, separation and upload of consecutive songs on one worker.
+
+    Stages run on their own threads, so ch must be a ThreadsafeChannel: events,
+    publishes and acks are handed back to the connection thread. A job is acked
+    only after its uploads have finished.
+    """
+    def download(message):
+        print(f"Received message for songId: {message['song_id']}")
+        message["job"] = download_original(message["job_id"], message["song_id"], gcs_utils)
+        return message
+
+    def separate(message):
+        on_preview_ready = functools.partial(notify_event_tracker, ch, "PreviewReady",
+                                             message["job_id"], message["song_id"])
+        separate_original(message["job"], audio_loader, separator, gcs_utils, on_preview_ready)
+        return message
+
+    def upload(message):
+        try:
+            upload_stems(message["job"], gcs_utils)
+        finally:
+            cleanup_job(message["job"])
+        return message
+
+    def on_done(message):
+        finish_job(ch, message)
+        print(f"[Pipeline] {pipeline.metrics.summary()}")
+
+    def on_error(message, error):
+        print(f"Error while processing songId {message['song_id']}: {error}")
+        traceback.print_exception(type(error), error, error.__traceback__)
+        cleanup_job(message.get("job"))
+        fail_job(ch, message)
+        print(f"[Pipeline] {pipeline.metrics.summary()}")
+
+    pipeline = StagedPipeline(
+        [("download", download), ("separate", separate), ("upload", upload)],
+        on_done=on_done,
+        on_error=on_error
+    )
+    return pipeline
+
+def pipeline_callback(pipeline):
+    # Validate the message and hand it to the pipeline without waiting for earlier songs.
+    def on_message(ch, method, properties, body):
+        try:
+            message = json.loads(body)
+            message['delivery_tag'] = method.delivery_tag
+            missing = [key for key in ("job_id", "song_id", "song_name", "artist_name") if key not in message]
+            if missing:
+                raise KeyError(f"missing fields: {', '.join(missing)}")
+        except Exception as e:
+            # TODO: Notify event tracker about failure
+            print("Unexpected error:", e)
+            traceback.print_exc()
+            notify_event_tracker(ch, "Failed", error_message=f"Malformed message received: {body}, error: {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+        pipeline.submit(message)
+    return on_message
 
 def callback(ch, method, properties, body):
     try:
@@ -159,31 +473,60 @@ def callback(ch, method, properties, body):
         notify_event_tracker(ch, "Failed", error_message=f"Malformed message received: {body}, error: {e}")
         ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
 
-def start_worker():
-    # TODO: Add a health check endpoint implementation.
-    print("Starting music splitter worker...")
-    credentials = pika.PlainCredentials(constants.RABBITMQ_USER, constants.RABBITMQ_PASS)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        heartbeat=600,
-        blocked_connection_timeout=300,
-        connection_attempts=3,
-        retry_delay=5,
-        socket_timeout=600,
-        credentials=credentials
-    ))
-
-    channel = connection.channel()
+def consume_split_queue(worker_index=0):
+    # Only take messages once this worker is actually fast.
+    warm_up(worker_index)
+
+    runtime = WorkerRuntime(
+        max_in_flight=SPLIT_PIPELINE_PREFETCH if SPLIT_PIPELINE else 1,
+        name=f"Splitter {worker_index}"
+    )
+    channel = runtime.connect()
 
     channel.queue_declare(queue=EVENT_TRACKER_QUEUE_NAME)
     channel.queue_declare(queue=LYRICS_QUEUE_NAME)
     channel.queue_declare(queue=SPLIT_QUEUE_NAME)
 
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(SPLIT_QUEUE_NAME, callback)
+    if SPLIT_PIPELINE:
+        # One delivery per stage, so the next song downloads while this one separates.
+        pipeline = build_split_pipeline(channel, audio_loader, separator, default_gcs_utils)
+        runtime.consume(SPLIT_QUEUE_NAME, pipeline_callback(pipeline))
+    else:
+        runtime.consume(SPLIT_QUEUE_NAME, callback)
+
+def configure_worker(worker_index=0, num_workers=1):
+    configure_worker_process(worker_index, num_workers, SPLIT_INTRA_OP_THREADS,
+                             SPLIT_INTER_OP_THREADS, SPLIT_CPU_AFFINITY)
+
+def start_worker_pool(num_workers):
+    # Each child builds its own separator after the fork, once its thread limits are set:
+    # neither TF sessions nor ONNX Runtime thread pools survive fork(), and both size their
+    # thread pools when created. To keep one copy of the weights per node, set
+    # SPLITTER_USE_INFERENCE_SERVER=true and the children call the inference server instead.
+    print(f"Starting music splitter worker pool with {num_workers} processes...")
+
+    def run_consumer(worker_index):
+        configure_worker(worker_index, num_workers)
+        load_models()
+        consume_split_queue(worker_index)
+
+    run_forked_workers(num_workers, run_consumer,
+                       on_exit=lambda worker_index: health.set_ready(worker_index, False))
+
+def start_worker():
+    # Serve health first so probes can tell "loading" from "dead" while the model loads.
+    start_health_server(health)
+    if SPLITTER_WORKERS > 1:
+        start_worker_pool(SPLITTER_WORKERS)
+        return
+
+    # Limits must be in place before TensorFlow builds its thread pools.
+    configure_worker()
+    load_models()
+    print("Starting music splitter worker...")
+    consume_split_queue()
 
-    print("Worker listening on queue: " + SPLIT_QUEUE_NAME)
-    channel.start_consuming()
+health.record("import", time.monotonic() - _import_started)
 
 if __name__ == "__main__":
     start_worker()
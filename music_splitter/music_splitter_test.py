@@ -3,11 +3,26 @@ from unittest.mock import MagicMock, patch, call
 import tempfile
 import os
 import shutil
+import sys
+import types
 
+import numpy as np
+
+import music_splitter
+from audio_io import encode_wav_bytes
+from health_server import WorkerHealth
+from separation_backends import OnnxBackend
+from separation_backends_test import FixedRatioSession
+from shared.worker_runtime import ThreadsafeChannel
+from worker_pool import run_forked_workers
 from music_splitter import (
     upload_file_safe,
     split_and_upload_instrumental,
-    handle_message
+    handle_message,
+    build_split_pipeline,
+    download_original,
+    cleanup_job,
+    warm_up
 )
 
 class TestSplitterService(unittest.TestCase):
@@ -22,14 +37,15 @@ class TestSplitterService(unittest.TestCase):
 
         self.gcs_utils.get_instrumental_url.return_value = os.path.join(self.test_dir, "instrumental.wav")
         self.gcs_utils.get_vocals_url.return_value = os.path.join(self.test_dir, "vocal.wav")
-        self.gcs_utils.get_artifact_url.return_value = os.path.join(self.test_dir, "original.wav")
+        self.gcs_utils.find_original_url.return_value = os.path.join(self.test_dir, "original.wav")
+        self.gcs_utils.get_stem_url.side_effect = lambda song_id, stem, fmt: os.path.join(self.test_dir, f"{stem}.{fmt}")
         self.gcs_utils.gcs_file_exists.return_value = False
 
         # create dummy original.wav
-        with open(self.gcs_utils.get_artifact_url.return_value, 'w') as f:
+        with open(self.gcs_utils.find_original_url.return_value, 'w') as f:
             f.write("")
 
-        self.audio_loader.load.return_value = ("dummy_waveform", 44100)
+        self.audio_loader.load.return_value = (np.zeros((10, 2), dtype=np.float32), 44100)
         self.separator.separate.return_value = {
             "accompaniment": "accomp_data",
             "vocals": "vocal_data"
@@ -66,8 +82,119 @@ class TestSplitterService(unittest.TestCase):
         )
 
         self.audio_loader.load.assert_called_once()
-        self.audio_loader.save.assert_any_call(os.path.join(self.test_dir, "instrumental.wav"), "accomp_data", sample_rate=44100)
-        self.audio_loader.save.assert_any_call(os.path.join(self.test_dir, "vocal.wav"), "vocal_data", sample_rate=44100)
+        working_dir = os.path.dirname(self.audio_loader.save.call_args_list[0][0][0])
+        self.assertTrue(os.path.basename(working_dir).startswith(f"{self.song_id}-"))
+        self.assertFalse(os.path.exists(working_dir))
+        self.audio_loader.save.assert_any_call(os.path.join(working_dir, "instrumental.wav"), "accomp_data", sample_rate=44100)
+        self.audio_loader.save.assert_any_call(os.path.join(working_dir, "vocal.wav"), "vocal_data", sample_rate=44100)
+
+    def test_split_and_upload_instrumental_in_memory(self):
+        waveform = np.zeros((44100, 2), dtype=np.float32)
+        self.gcs_utils.download_bytes_from_gcs.return_value = encode_wav_bytes(waveform, 44100)
+        self.separator.separate.return_value = {
+            "accompaniment": waveform,
+            "vocals": waveform
+        }
+
+        with patch("music_splitter.SPLIT_MODE", "memory"), \
+             patch("music_splitter.STEM_OUTPUT_FORMATS", ["wav"]):
+            split_and_upload_instrumental(
+                self.job_id,
+                self.song_id,
+                self.audio_loader,
+                self.separator,
+                self.gcs_utils
+            )
+
+        self.audio_loader.load.assert_not_called()
+        self.gcs_utils.download_file_from_gcs.assert_not_called()
+        self.assertEqual(self.gcs_utils.upload_bytes_to_gcs.call_count, 2)
+        uploaded_urls = {c.args[0] for c in self.gcs_utils.upload_bytes_to_gcs.call_args_list}
+        self.assertEqual(uploaded_urls, {
+            os.path.join(self.test_dir, "instrumental.wav"),
+            os.path.join(self.test_dir, "vocals.wav")
+        })
+
+    @patch("threading.Thread")
+    def test_split_uploads_every_configured_rendition(self, mock_thread):
+        mock_thread.return_value = MagicMock(start=lambda: None, join=lambda: None)
+
+        with patch("music_splitter.STEM_OUTPUT_FORMATS", ["opus", "flac", "wav"]):
+            split_and_upload_instrumental(
+                self.job_id,
+                self.song_id,
+                self.audio_loader,
+                self.separator,
+                self.gcs_utils
+            )
+
+        uploaded_urls = {c.kwargs["args"][0] for c in mock_thread.call_args_list}
+        self.assertEqual(uploaded_urls, {
+            os.path.join(self.test_dir, f"{stem}.{fmt}")
+            for stem in ("instrumental", "vocals")
+            for fmt in ("opus", "flac", "wav")
+        })
+
+    def test_jobs_for_the_same_song_get_their_own_working_dirs(self):
+        first = download_original("job-1", self.song_id, self.gcs_utils)
+        second = download_original("job-2", self.song_id, self.gcs_utils)
+        try:
+            self.assertNotEqual(first["working_dir"], second["working_dir"])
+            cleanup_job(first)
+            self.assertTrue(os.path.isdir(second["working_dir"]))
+        finally:
+            cleanup_job(first)
+            cleanup_job(second)
+
+    def test_split_restores_cached_stems_without_separating(self):
+        self.gcs_utils.gcs_file_exists.side_effect = lambda url: "stem-cache" in url
+        self.gcs_utils.get_stem_cache_url.side_effect = lambda fp, stem, fmt: f"stem-cache/{fp}/{stem}.{fmt}"
+
+        split_and_upload_instrumental(
+            self.job_id,
+            self.song_id,
+            self.audio_loader,
+            self.separator,
+            self.gcs_utils
+        )
+
+        self.separator.separate.assert_not_called()
+        self.assertTrue(self.gcs_utils.copy_gcs_file.called)
+
+    @patch("music_splitter.upload_in_parallel")
+    def test_pipeline_acks_from_connection_thread_after_upload(self, mock_upload):
+        self.audio_loader.save = MagicMock()
+        connection, raw_channel = MagicMock(), MagicMock()
+        connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+        ch = ThreadsafeChannel(connection, raw_channel)
+
+        with patch("music_splitter.notify_event_tracker") as mock_notify, \
+             patch("music_splitter.publish_to_lyrics_syncer_queue") as mock_publish:
+            pipeline = build_split_pipeline(ch, self.audio_loader, self.separator, self.gcs_utils)
+            pipeline.submit({
+                "job_id": self.job_id,
+                "song_id": self.song_id,
+                "song_name": "Test Song",
+                "artist_name": "Test Artist",
+                "delivery_tag": "xyz"
+            })
+            pipeline.close()
+
+        raw_channel.basic_ack.assert_called_once_with(delivery_tag="xyz")
+        self.assertTrue(connection.add_callback_threadsafe.called)
+        mock_upload.assert_called_once()
+        mock_publish.assert_called_once()
+        self.assertEqual(pipeline.metrics.snapshot()["jobs_completed"], 1)
+
+    def test_warm_up_separates_silence_before_reporting_ready(self):
+        with patch("music_splitter.separator", self.separator), \
+             patch("music_splitter.health") as mock_health:
+            warm_up(worker_index=0)
+
+        waveform = self.separator.separate.call_args.args[0]
+        self.assertFalse(np.any(waveform))
+        self.assertEqual(waveform.shape[1], 2)
+        mock_health.set_ready.assert_called_once_with(0)
 
     def test_handle_message_success(self):
         ch = MagicMock()
@@ -79,9 +206,9 @@ class TestSplitterService(unittest.TestCase):
             "delivery_tag": "xyz"
         }
 
-        with patch("splitter.split_and_upload_instrumental") as mock_split, \
-             patch("splitter.notify_event_tracker") as mock_notify, \
-             patch("splitter.publish_to_lyrics_syncer_queue") as mock_publish:
+        with patch("music_splitter.split_and_upload_instrumental") as mock_split, \
+             patch("music_splitter.notify_event_tracker") as mock_notify, \
+             patch("music_splitter.publish_to_lyrics_syncer_queue") as mock_publish:
             handle_message(message, ch, self.audio_loader, self.separator, self.gcs_utils)
 
         ch.basic_ack.assert_called_once_with(delivery_tag="xyz")
@@ -96,11 +223,54 @@ class TestSplitterService(unittest.TestCase):
             "delivery_tag": "abc"
         }
 
-        with patch("splitter.split_and_upload_instrumental", side_effect=Exception("Something went wrong")), \
-             patch("splitter.notify_event_tracker") as mock_notify:
+        with patch("music_splitter.split_and_upload_instrumental", side_effect=Exception("Something went wrong")), \
+             patch("music_splitter.notify_event_tracker") as mock_notify:
             handle_message(message, ch, self.audio_loader, self.separator, self.gcs_utils)
 
         ch.basic_nack.assert_called_once_with(delivery_tag="abc", requeue=False)
 
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_onnx_sessions_are_built_in_each_worker_with_its_thread_limits(self):
+        sessions_log = os.path.join(self.test_dir, "sessions.log")
+
+        def inference_session(model_path, options, providers):
+            with open(sessions_log, "a") as f:
+                f.write(f"{os.getpid()} {options.intra_op_num_threads} {options.inter_op_num_threads}\n")
+            return FixedRatioSession()
+
+        onnxruntime = types.SimpleNamespace(
+            SessionOptions=types.SimpleNamespace,
+            GraphOptimizationLevel=types.SimpleNamespace(ORT_ENABLE_ALL=99),
+            InferenceSession=inference_session,
+        )
+        adapter = types.SimpleNamespace(AudioAdapter=MagicMock())
+        modules = {"onnxruntime": onnxruntime, "spleeter": types.ModuleType("spleeter"),
+                   "spleeter.audio": types.ModuleType("spleeter.audio"), "spleeter.audio.adapter": adapter}
+
+        with patch.dict(sys.modules, modules), \
+                patch("music_splitter.create_separator", lambda: OnnxBackend("model.onnx")), \
+                patch("music_splitter.consume_split_queue"), \
+                patch("music_splitter.health", WorkerHealth(2)), \
+                patch("music_splitter.SPLIT_INTRA_OP_THREADS", 3), \
+                patch("music_splitter.SPLIT_INTER_OP_THREADS", 1), \
+                patch("music_splitter.run_forked_workers",
+                      lambda n, target, on_exit: run_forked_workers(n, target, restart=False, on_exit=on_exit)):
+            music_splitter.start_worker_pool(2)
+
+        with open(sessions_log) as f:
+            sessions = [line.split() for line in f]
+        self.assertEqual(len(sessions), 2)
+        self.assertNotIn(str(os.getpid()), [pid for pid, _, _ in sessions])
+        self.assertEqual(len({pid for pid, _, _ in sessions}), 2)
+        self.assertEqual({(intra, inter) for _, intra, inter in sessions}, {("3", "1")})
+
+
 if __name__ == "__main__":
     unittest.main()
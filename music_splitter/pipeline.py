@@ -0,0 +1,146 @@
+import queue
+import threading
+import time
+import traceback
+
+_STOP = object()
+
+
+class PipelineMetrics:
+    """
+    Tracks how busy each stage is and how much the stages overlap.
+
+    overlap is the summed stage busy time divided by the wall time during which
+    at least one job was in flight: 1.0 means the stages ran strictly one after
+    another, and N (the number of stages) means every stage was busy all the time.
+    """
+
+    def __init__(self, stage_names):
+        self.stage_names = list(stage_names)
+        self.busy_seconds = {name: 0.0 for name in self.stage_names}
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.active_seconds = 0.0
+        self._in_flight = 0
+        self._active_since = None
+        self._lock = threading.Lock()
+
+    def job_started(self):
+        with self._lock:
+            if self._in_flight == 0:
+                self._active_since = time.monotonic()
+            self._in_flight += 1
+
+    def job_finished(self, failed=False):
+        with self._lock:
+            if failed:
+                self.jobs_failed += 1
+            else:
+                self.jobs_completed += 1
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self.active_seconds += time.monotonic() - self._active_since
+                self._active_since = None
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.busy_seconds[stage] += seconds
+
+    def snapshot(self):
+        with self._lock:
+            active = self.active_seconds
+            if self._active_since is not None:
+                active += time.monotonic() - self._active_since
+            busy = dict(self.busy_seconds)
+            completed = self.jobs_completed
+            failed = self.jobs_failed
+
+        return {
+            "jobs_completed": completed,
+            "jobs_failed": failed,
+            "active_seconds": active,
+            "busy_seconds": busy,
+            "utilization": {name: (seconds / active if active else 0.0) for name, seconds in busy.items()},
+            "overlap": (sum(busy.values()) / active) if active else 0.0,
+            "songs_per_hour": (completed * 3600.0 / active) if active else 0.0,
+        }
+
+    def summary(self):
+        s = self.snapshot()
+        utilization = ", ".join(f"{name} {value:.0%}" for name, value in s["utilization"].items())
+        return (f"{s['jobs_completed']} done, {s['jobs_failed']} failed, overlap {s['overlap']:.2f}x, "
+                f"{s['songs_per_hour']:.1f} songs/hour ({utilization})")
+
+
+class StagedPipeline:
+    """
+    Runs jobs through a fixed sequence of stages, one thread per stage.
+
+    stages is a list of (name, fn) where fn(job) returns the job for the next
+    stage. While one job is in stage N, the next job can be in stage N - 1, so
+    downloading, separating and uploading of consecutive songs overlap.
+    on_done(job) runs on the last stage's thread once a job has passed every
+    stage; on_error(job, exc) runs on the failing stage's thread and the job
+    skips the remaining stages. Both are always called exactly once per job.
+    """
+
+    def __init__(self, stages, on_done, on_error, metrics: PipelineMetrics = None):
+        self.stages = list(stages)
+        self.on_done = on_done
+        self.on_error = on_error
+        self.metrics = metrics or PipelineMetrics([name for name, _ in self.stages])
+        # The first queue is unbounded so submit() never blocks the caller (the AMQP
+        # connection thread); the broker's prefetch count bounds how many jobs arrive.
+        # Later queues hold one job each so a fast stage cannot run far ahead.
+        self._queues = [queue.Queue()] + [queue.Queue(maxsize=1) for _ in self.stages[1:]]
+        self._threads = [
+            threading.Thread(target=self._run_stage, args=(i,), name=f"pipeline-{name}", daemon=True)
+            for i, (name, _) in enumerate(self.stages)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, job):
+        self.metrics.job_started()
+        self._queues[0].put(job)
+
+    def close(self):
+        """Lets queued jobs drain through every stage, then stops the stage threads."""
+        self._queues[0].put(_STOP)
+        for t in self._threads:
+            t.join()
+
+    def _run_stage(self, index):
+        name, fn = self.stages[index]
+        is_last = index == len(self.stages) - 1
+        inbox = self._queues[index]
+
+        while True:
+            job = inbox.get()
+            if job is _STOP:
+                if not is_last:
+                    self._queues[index + 1].put(_STOP)
+                return
+
+            started = time.monotonic()
+            try:
+                job = fn(job)
+            except Exception as e:
+                self.metrics.record(name, time.monotonic() - started)
+                print(f"[Pipeline] Stage '{name}' failed: {e}")
+                self._finish(self.on_error, job, e, failed=True)
+                continue
+            self.metrics.record(name, time.monotonic() - started)
+
+            if is_last:
+                self._finish(self.on_done, job, failed=False)
+            else:
+                self._queues[index + 1].put(job)
+
+    def _finish(self, handler, *args, failed):
+        try:
+            handler(*args)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.metrics.job_finished(failed=failed)
@@ -0,0 +1,95 @@
+import unittest
+import threading
+import time
+
+from pipeline import PipelineMetrics, StagedPipeline
+
+
+def sleeping_stage(name, seconds, log):
+    def run(job):
+        time.sleep(seconds)
+        log.append((name, job))
+        return job
+    return run
+
+
+class TestStagedPipeline(unittest.TestCase):
+
+    def run_jobs(self, pipeline, jobs):
+        for job in jobs:
+            pipeline.submit(job)
+        pipeline.close()
+
+    def test_stages_of_consecutive_jobs_overlap(self):
+        log, done = [], []
+        stages = [(name, sleeping_stage(name, 0.1, log)) for name in ("download", "separate", "upload")]
+        pipeline = StagedPipeline(stages, on_done=done.append, on_error=lambda job, e: None)
+
+        started = time.monotonic()
+        self.run_jobs(pipeline, range(4))
+        elapsed = time.monotonic() - started
+
+        # Strictly sequential would take 4 jobs x 3 stages x 0.1s = 1.2s.
+        self.assertLess(elapsed, 0.9)
+        self.assertEqual(done, [0, 1, 2, 3])
+
+        metrics = pipeline.metrics.snapshot()
+        self.assertEqual(metrics["jobs_completed"], 4)
+        self.assertGreater(metrics["overlap"], 1.5)
+        self.assertLessEqual(metrics["overlap"], 3.05)
+        for stage in ("download", "separate", "upload"):
+            self.assertAlmostEqual(metrics["busy_seconds"][stage], 0.4, delta=0.1)
+
+    def test_failed_job_skips_remaining_stages_and_others_continue(self):
+        log, done, failed = [], [], []
+
+        def separate(job):
+            if job == "bad":
+                raise RuntimeError("model crashed")
+            return job
+
+        stages = [
+            ("download", sleeping_stage("download", 0, log)),
+            ("separate", separate),
+            ("upload", sleeping_stage("upload", 0, log)),
+        ]
+        pipeline = StagedPipeline(stages, on_done=done.append, on_error=lambda job, e: failed.append((job, str(e))))
+        self.run_jobs(pipeline, ["a", "bad", "b"])
+
+        self.assertEqual(done, ["a", "b"])
+        self.assertEqual(failed, [("bad", "model crashed")])
+        self.assertNotIn(("upload", "bad"), log)
+        self.assertEqual(pipeline.metrics.snapshot()["jobs_failed"], 1)
+
+    def test_submit_does_not_block_while_stages_are_busy(self):
+        release = threading.Event()
+        stages = [("separate", lambda job: release.wait(5) and job)]
+        pipeline = StagedPipeline(stages, on_done=lambda job: None, on_error=lambda job, e: None)
+
+        started = time.monotonic()
+        for job in range(5):
+            pipeline.submit(job)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        release.set()
+        pipeline.close()
+        self.assertEqual(pipeline.metrics.snapshot()["jobs_completed"], 5)
+
+
+class TestPipelineMetrics(unittest.TestCase):
+
+    def test_sequential_work_reports_no_overlap(self):
+        metrics = PipelineMetrics(["download", "upload"])
+        metrics.job_started()
+        metrics.record("download", 0.05)
+        metrics.record("upload", 0.05)
+        time.sleep(0.1)
+        metrics.job_finished()
+
+        snapshot = metrics.snapshot()
+        self.assertAlmostEqual(snapshot["overlap"], 1.0, delta=0.2)
+        self.assertIn("1 done", metrics.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
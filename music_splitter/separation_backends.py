@@ -0,0 +1,163 @@
+import os
+
+import numpy as np
+
+# Spleeter 2stems model configuration (spleeter/resources/2stems.json).
+FRAME_LENGTH = 4096
+FRAME_STEP = 1024
+T = 512  # frames per model segment
+F = 1024  # frequency bins fed to the model
+SEPARATION_EXPONENT = 2
+EPSILON = 1e-10
+
+# "spleeter" (TensorFlow, default) or "onnx" (the same model under ONNX Runtime, see export_onnx.py).
+SPLIT_BACKEND = os.getenv("SPLIT_BACKEND", "spleeter")
+DEFAULT_ONNX_MODEL = os.getenv(
+    "SPLIT_ONNX_MODEL",
+    os.path.join(os.getenv("SPLEETER_PRETRAINED_MODEL_PATH", "pretrained_models"), "2stems.onnx")
+)
+
+
+def hann_window(length: int):
+    """Periodic Hann window, as tf.signal.hann_window(periodic=True)."""
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length) / length)).astype(np.float32)
+
+
+def inverse_window(frame_length: int = FRAME_LENGTH, frame_step: int = FRAME_STEP):
+    """Synthesis window that makes overlap-add invert stft(), as tf.signal.inverse_stft_window_fn."""
+    window = hann_window(frame_length)
+    overlaps = -(-frame_length // frame_step)
+    denom = np.zeros(overlaps * frame_step, dtype=np.float32)
+    denom[:frame_length] = window ** 2
+    denom = np.tile(denom.reshape(overlaps, frame_step).sum(axis=0), overlaps)
+    return window / denom[:frame_length]
+
+
+def stft(waveform, frame_length: int = FRAME_LENGTH, frame_step: int = FRAME_STEP, block_frames: int = T):
+    """
+    Short-time Fourier transform of a (samples, channels) waveform.
+
+    Matches tf.signal.stft(pad_end=True) with a periodic Hann window and returns
+    (frames, frame_length // 2 + 1, channels) complex64. Frames are transformed
+    block_frames at a time to keep the float64 FFT temporaries small.
+    """
+    samples, channels = waveform.shape
+    num_frames = max(1, -(-samples // frame_step))
+    padded = np.zeros(((num_frames - 1) * frame_step + frame_length, channels), dtype=np.float32)
+    padded[:samples] = waveform
+    window = hann_window(frame_length)[None, :, None]
+    offsets = np.arange(frame_length)[None, :]
+
+    spec = np.empty((num_frames, frame_length // 2 + 1, channels), dtype=np.complex64)
+    for start in range(0, num_frames, block_frames):
+        frames = np.arange(start, min(start + block_frames, num_frames))[:, None] * frame_step + offsets
+        spec[start:start + len(frames)] = np.fft.rfft(padded[frames] * window, axis=1)
+    return spec
+
+
+def istft(spec, frame_length: int = FRAME_LENGTH, frame_step: int = FRAME_STEP):
+    """Inverse of stft(): overlap-adds (frames, bins, channels) back to (samples, channels)."""
+    num_frames, _, channels = spec.shape
+    frames = np.fft.irfft(spec, n=frame_length, axis=1).astype(np.float32)
+    frames *= inverse_window(frame_length, frame_step)[None, :, None]
+
+    output = np.zeros(((num_frames - 1) * frame_step + frame_length, channels), dtype=np.float32)
+    for k in range(frame_length // frame_step):
+        part = frames[:, k * frame_step:(k + 1) * frame_step].reshape(-1, channels)
+        output[k * frame_step:k * frame_step + len(part)] += part
+    return output
+
+
+class SpleeterBackend:
+    """The stock Spleeter/TensorFlow separator."""
+
+    name = "spleeter"
+
+    def __init__(self, model: str = "spleeter:2stems"):
+        from spleeter.separator import Separator
+        self._separator = Separator(model)
+
+    def separate(self, waveform):
+        return self._separator.separate(waveform)
+
+
+class OnnxBackend:
+    """
+    Runs the Spleeter 2stems U-Net exported by export_onnx.py under ONNX Runtime.
+
+    Only the network runs in ONNX Runtime. STFT, ratio masking and inverse STFT
+    happen here in numpy and mirror Spleeter's own graph, so the output matches
+    SpleeterBackend up to float rounding (or quantization error for an int8 model).
+    session may be any object with ONNX Runtime's run/get_inputs/get_outputs API.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_path: str = DEFAULT_ONNX_MODEL, session=None, batch_segments: int = 4):
+        if session is None:
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            # Honour the per-worker thread split from worker_pool.limit_tf_threads, which
+            # runs in each worker process before its separator is built.
+            options.intra_op_num_threads = int(os.getenv("TF_NUM_INTRAOP_THREADS", "0"))
+            options.inter_op_num_threads = int(os.getenv("TF_NUM_INTEROP_THREADS", "0"))
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            print(f"[ONNX] Loaded {model_path}")
+
+        self.session = session
+        self.batch_segments = batch_segments
+        self.input_name = session.get_inputs()[0].name
+        # tf2onnx keeps TF tensor names, e.g. "vocals_spectrogram:0".
+        self.output_names = [o.name for o in session.get_outputs()]
+        self.output_instruments = [name.split(":")[0].replace("_spectrogram", "") for name in self.output_names]
+
+    def _run_model(self, segments):
+        estimates = {instrument: [] for instrument in self.output_instruments}
+        for start in range(0, len(segments), self.batch_segments):
+            outputs = self.session.run(self.output_names, {self.input_name: segments[start:start + self.batch_segments]})
+            for instrument, output in zip(self.output_instruments, outputs):
+                estimates[instrument].append(output)
+        return {instrument: np.concatenate(parts) for instrument, parts in estimates.items()}
+
+    def separate(self, waveform):
+        waveform = np.asarray(waveform, dtype=np.float32)
+        if waveform.shape[1] == 1:
+            waveform = np.tile(waveform, (1, 2))
+        samples = len(waveform)
+
+        # Spleeter prepends one frame of silence before the STFT and drops it afterwards.
+        spec = stft(np.concatenate([np.zeros((FRAME_LENGTH, 2), dtype=np.float32), waveform]))
+        num_frames = len(spec)
+
+        segments = -(-num_frames // T)
+        magnitude = np.zeros((segments * T, F, 2), dtype=np.float32)
+        magnitude[:num_frames] = np.abs(spec[:, :F, :])
+        estimates = self._run_model(magnitude.reshape(segments, T, F, 2))
+        del magnitude
+
+        powers = {i: e.reshape(segments * T, F, 2)[:num_frames] ** SEPARATION_EXPONENT for i, e in estimates.items()}
+        del estimates
+        total = sum(powers.values()) + EPSILON
+
+        separated = {}
+        for instrument, power in powers.items():
+            mask = np.zeros(spec.shape, dtype=np.float32)  # bins above F are zeroed ("zeros" mask extension)
+            mask[:, :F, :] = (power + EPSILON / len(powers)) / total
+            separated[instrument] = istft(spec * mask)[FRAME_LENGTH:FRAME_LENGTH + samples]
+        return separated
+
+
+BACKENDS = {
+    SpleeterBackend.name: SpleeterBackend,
+    OnnxBackend.name: OnnxBackend,
+}
+
+
+def create_separator(backend: str = SPLIT_BACKEND, **kwargs):
+    """Builds the separation backend selected by name (SPLIT_BACKEND)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown separation backend '{backend}', expected one of: {', '.join(BACKENDS)}")
+    print(f"[Backend] Using {backend} separation backend")
+    return BACKENDS[backend](**kwargs)
@@ -0,0 +1,105 @@
+import unittest
+import importlib.util
+import os
+
+import numpy as np
+
+from separation_backends import (
+    DEFAULT_ONNX_MODEL,
+    F,
+    FRAME_LENGTH,
+    OnnxBackend,
+    create_separator,
+    istft,
+    stft
+)
+
+SAMPLE_RATE = 44100
+HAS_PARITY_DEPS = (importlib.util.find_spec("spleeter") is not None
+                   and importlib.util.find_spec("onnxruntime") is not None
+                   and os.path.exists(DEFAULT_ONNX_MODEL))
+
+
+def synthetic_song(seconds):
+    t = (np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE)[:, None]
+    voice = 0.3 * np.sin(2 * np.pi * (440.0 * t + 3.0 * np.sin(2 * np.pi * 5.0 * t)))
+    pad = 0.2 * np.sin(2 * np.pi * np.array([[130.81, 164.81]]) * t)
+    return (voice + pad).astype(np.float32)
+
+
+def snr_db(reference, estimate):
+    return 10 * np.log10(np.sum(reference ** 2) / np.sum((reference - estimate) ** 2))
+
+
+class Output:
+    def __init__(self, name):
+        self.name = name
+
+
+class FixedRatioSession:
+    """ONNX Runtime stand-in whose "network" splits every bin's magnitude 30/70."""
+
+    def __init__(self):
+        self.batches = []
+
+    def get_inputs(self):
+        return [Output("mix_spectrogram:0")]
+
+    def get_outputs(self):
+        return [Output("vocals_spectrogram:0"), Output("accompaniment_spectrogram:0")]
+
+    def run(self, output_names, feeds):
+        mix = feeds["mix_spectrogram:0"]
+        self.batches.append(mix.shape)
+        return [mix * 0.3, mix * 0.7]
+
+
+class TestSeparationBackends(unittest.TestCase):
+
+    def test_istft_inverts_stft(self):
+        waveform = synthetic_song(3)
+        padded = np.concatenate([np.zeros((FRAME_LENGTH, 2), dtype=np.float32), waveform])
+
+        restored = istft(stft(padded))[FRAME_LENGTH:FRAME_LENGTH + len(waveform)]
+
+        self.assertGreater(snr_db(waveform, restored), 80.0)
+
+    def test_onnx_backend_applies_ratio_masks(self):
+        session = FixedRatioSession()
+        backend = OnnxBackend(session=session, batch_segments=1)
+        waveform = synthetic_song(8)
+
+        separated = backend.separate(waveform)
+
+        self.assertEqual(set(separated), {"vocals", "accompaniment"})
+        self.assertEqual(separated["vocals"].shape, waveform.shape)
+        self.assertTrue(all(shape[1:] == (512, F, 2) for shape in session.batches))
+        # Power masks: 0.3^2 / (0.3^2 + 0.7^2) of the mixture below F bins.
+        vocals_ratio = 0.09 / 0.58
+        self.assertGreater(snr_db(waveform * vocals_ratio, separated["vocals"]), 40.0)
+        self.assertGreater(snr_db(waveform, separated["vocals"] + separated["accompaniment"]), 40.0)
+
+    def test_onnx_backend_accepts_mono(self):
+        backend = OnnxBackend(session=FixedRatioSession())
+
+        separated = backend.separate(synthetic_song(1)[:, :1])
+
+        self.assertEqual(separated["accompaniment"].shape, (SAMPLE_RATE, 2))
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            create_separator("torch")
+
+    @unittest.skipUnless(HAS_PARITY_DEPS, "needs spleeter, onnxruntime and an exported model (export_onnx.py)")
+    def test_onnx_output_matches_spleeter(self):
+        waveform = synthetic_song(20)
+
+        expected = create_separator("spleeter").separate(waveform)
+        actual = create_separator("onnx").separate(waveform)
+
+        for stem in ("vocals", "accompaniment"):
+            self.assertGreater(snr_db(expected[stem], actual[stem]), 40.0, f"{stem} diverges from Spleeter")
+
+
+if __name__ == "__main__":
+    unittest.main()
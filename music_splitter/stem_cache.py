@@ -0,0 +1,90 @@
+import hashlib
+import traceback
+
+import numpy as np
+
+from audio_io import to_pcm16
+
+STEMS = ("instrumental", "vocals")
+
+
+class AudioFingerprinter:
+    """
+    Hashes decoded audio as 16-bit PCM, block by block.
+
+    Bit-identical decoded PCM maps to the same key, whatever container it came
+    in. A different lossy encoding or sample rate of the same song does not.
+    """
+
+    def __init__(self, sample_rate: int, channels: int):
+        self._hash = hashlib.sha256(f"{sample_rate}:{channels}:".encode())
+
+    def update(self, block):
+        self._hash.update(to_pcm16(np.asarray(block, dtype=np.float32)).tobytes())
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+def audio_fingerprint(waveform, sample_rate: int) -> str:
+    waveform = np.asarray(waveform, dtype=np.float32)
+    fingerprinter = AudioFingerprinter(sample_rate, waveform.shape[1])
+    fingerprinter.update(waveform)
+    return fingerprinter.hexdigest()
+
+
+def fingerprint_file_in_chunks(input_path: str, audio_loader, window_seconds: float = 60.0) -> str:
+    """Fingerprints a file without holding it in memory, reading consecutive windows."""
+    fingerprinter = None
+    offset = 0.0
+    while True:
+        block, sample_rate = audio_loader.load(input_path, offset=offset, duration=window_seconds)
+        if len(block) == 0:
+            break
+        if fingerprinter is None:
+            fingerprinter = AudioFingerprinter(sample_rate, block.shape[1])
+        fingerprinter.update(block)
+        if len(block) < int(round(window_seconds * sample_rate)):
+            break
+        offset += window_seconds
+    return fingerprinter.hexdigest() if fingerprinter else None
+
+
+def restore_stems_from_cache(song_id: str, fingerprint: str, formats, gcs_utils) -> bool:
+    """
+    Copies cached stems for fingerprint into the song's folder.
+
+    Returns True only if every rendition was found and copied. Cache problems
+    are logged and reported as a miss so the caller just separates as usual.
+    """
+    try:
+        cached = [
+            (gcs_utils.get_stem_cache_url(fingerprint, stem, fmt), gcs_utils.get_stem_url(song_id, stem, fmt))
+            for stem in STEMS
+            for fmt in formats
+        ]
+        if not all(gcs_utils.gcs_file_exists(cache_url) for cache_url, _ in cached):
+            print(f"[StemCache] Miss for {song_id} (fingerprint {fingerprint[:12]})")
+            return False
+
+        for cache_url, song_url in cached:
+            gcs_utils.copy_gcs_file(cache_url, song_url)
+        print(f"[StemCache] Hit for {song_id} (fingerprint {fingerprint[:12]}), skipped separation")
+        return True
+    except Exception as e:
+        print(f"[StemCache] Lookup failed for {song_id}, separating instead: {e}")
+        traceback.print_exc()
+        return False
+
+
+def store_stems_in_cache(song_id: str, fingerprint: str, formats, gcs_utils):
+    """Copies a song's freshly uploaded stems into the content-addressed cache."""
+    try:
+        for stem in STEMS:
+            for fmt in formats:
+                gcs_utils.copy_gcs_file(gcs_utils.get_stem_url(song_id, stem, fmt),
+                                        gcs_utils.get_stem_cache_url(fingerprint, stem, fmt))
+        print(f"[StemCache] Stored stems of {song_id} under fingerprint {fingerprint[:12]}")
+    except Exception as e:
+        print(f"[StemCache] Failed to store stems of {song_id}: {e}")
+        traceback.print_exc()
@@ -0,0 +1,96 @@
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from stem_cache import (
+    audio_fingerprint,
+    fingerprint_file_in_chunks,
+    restore_stems_from_cache,
+    store_stems_in_cache
+)
+
+
+class FakeGCS:
+    """Dictionary-backed stand-in for shared.gcs_utils."""
+
+    def __init__(self):
+        self.blobs = {}
+
+    def get_stem_url(self, song_id, stem, fmt="wav"):
+        return f"gs://bucket/songs/{song_id}/{stem}.{fmt}"
+
+    def get_stem_cache_url(self, fingerprint, stem, fmt="wav"):
+        return f"gs://bucket/stem-cache/{fingerprint}/{stem}.{fmt}"
+
+    def gcs_file_exists(self, url):
+        return url in self.blobs
+
+    def copy_gcs_file(self, source_url, destination_url):
+        self.blobs[destination_url] = self.blobs[source_url]
+
+
+class ArrayAudioLoader:
+    def __init__(self, waveform, sample_rate=100):
+        self.waveform = waveform
+        self.sample_rate = sample_rate
+
+    def load(self, path, offset=None, duration=None):
+        start = int(round(offset * self.sample_rate))
+        end = start + int(round(duration * self.sample_rate))
+        return self.waveform[start:end], self.sample_rate
+
+
+class TestStemCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.waveform = rng.uniform(-0.5, 0.5, size=(1050, 2)).astype(np.float32)
+        self.formats = ["opus", "flac"]
+
+    def test_fingerprint_ignores_sub_quantization_noise(self):
+        reference = audio_fingerprint(self.waveform, 44100)
+        # Snap to the 16-bit grid, then add noise far below one quantization step.
+        snapped = np.round(self.waveform * 32767.0) / 32767.0
+        noisy = snapped + np.float32(1e-7)
+
+        self.assertEqual(audio_fingerprint(snapped, 44100), audio_fingerprint(noisy, 44100))
+        self.assertNotEqual(reference, audio_fingerprint(self.waveform * 0.5, 44100))
+        self.assertNotEqual(reference, audio_fingerprint(self.waveform, 48000))
+
+    def test_chunked_fingerprint_matches_whole_file_fingerprint(self):
+        loader = ArrayAudioLoader(self.waveform)
+        self.assertEqual(
+            fingerprint_file_in_chunks("original.wav", loader, window_seconds=2.0),
+            audio_fingerprint(self.waveform, 100)
+        )
+
+    def test_store_then_restore_under_another_song_id(self):
+        gcs = FakeGCS()
+        fingerprint = audio_fingerprint(self.waveform, 44100)
+        for stem in ("instrumental", "vocals"):
+            for fmt in self.formats:
+                gcs.blobs[gcs.get_stem_url("song-a", stem, fmt)] = f"{stem}-{fmt}-data"
+
+        self.assertFalse(restore_stems_from_cache("song-b", fingerprint, self.formats, gcs))
+        store_stems_in_cache("song-a", fingerprint, self.formats, gcs)
+        self.assertTrue(restore_stems_from_cache("song-b", fingerprint, self.formats, gcs))
+
+        self.assertEqual(gcs.blobs[gcs.get_stem_url("song-b", "vocals", "flac")], "vocals-flac-data")
+
+    def test_partial_cache_entry_is_a_miss(self):
+        gcs = FakeGCS()
+        gcs.blobs[gcs.get_stem_cache_url("abc", "instrumental", "opus")] = "data"
+
+        self.assertFalse(restore_stems_from_cache("song-b", "abc", ["opus"], gcs))
+        self.assertNotIn(gcs.get_stem_url("song-b", "instrumental", "opus"), gcs.blobs)
+
+    def test_cache_errors_are_treated_as_a_miss(self):
+        gcs = MagicMock()
+        gcs.gcs_file_exists.side_effect = RuntimeError("GCS unavailable")
+
+        self.assertFalse(restore_stems_from_cache("song-b", "abc", self.formats, gcs))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+"""
+Sweeps splitter replica count, TF thread counts and CPU pinning on this machine.
+
+Each configuration starts N replica processes side by side (as N co-located pods
+would run). Each replica loads and warms up the model, then all of them split
+the same synthetic songs at once. The sweep reports aggregate songs/hour, so the
+replica-to-thread ratio can be chosen from data.
+
+    python thread_sweep.py --replicas 1,2,4 --song-seconds 180 --songs 2 --output sweep.json
+"""
+import argparse
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from worker_pool import available_cpus, cpu_blocks, tf_thread_limits
+
+RESULT_PREFIX = "SWEEP_RESULT "
+
+
+def sweep_configs(replica_counts, cpu_count, intra_options=None, inter_options=None, pin_options=(False, True)):
+    """
+    Yields every configuration to try. Thread options of None use the defaults
+    worker_pool derives for that replica count.
+    """
+    for replicas, pin in itertools.product(replica_counts, pin_options):
+        default_intra, default_inter = tf_thread_limits(replicas, cpu_count)
+        for intra, inter in itertools.product(intra_options or [default_intra], inter_options or [default_inter]):
+            yield {"replicas": replicas, "intra_op_threads": intra, "inter_op_threads": inter, "pin": pin}
+
+
+def songs_per_hour(replica_results):
+    """Aggregate throughput: every song split, over the slowest replica's processing time."""
+    songs = sum(r["songs"] for r in replica_results)
+    slowest = max(r["processing_seconds"] for r in replica_results)
+    return songs * 3600.0 / slowest if slowest else 0.0
+
+
+def replica_command(index, sync_dir, song_seconds, songs):
+    return [sys.executable, os.path.abspath(__file__), "--child", str(index),
+            "--sync-dir", sync_dir, "--song-seconds", str(song_seconds), "--songs", str(songs)]
+
+
+def read_replica_result(path):
+    with open(path) as f:
+        lines = [line for line in f if line.startswith(RESULT_PREFIX)]
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+
+def run_config(config, song_seconds, songs, cpus):
+    sync_dir = tempfile.mkdtemp(prefix="splitter-sweep-")
+    blocks = cpu_blocks(cpus, config["replicas"])
+    processes = []
+    try:
+        for index in range(config["replicas"]):
+            env = dict(os.environ,
+                       SPLIT_INTRA_OP_THREADS=str(config["intra_op_threads"]),
+                       SPLIT_INTER_OP_THREADS=str(config["inter_op_threads"]),
+                       SPLIT_CPU_AFFINITY=",".join(str(c) for c in blocks[index]) if config["pin"] else "off",
+                       SPLITTER_WORKERS="1")
+            # Output goes to a file, not a pipe: a replica must never block on a full pipe
+            # while the others are being timed.
+            with open(os.path.join(sync_dir, f"output-{index}.log"), "w") as output:
+                processes.append(subprocess.Popen(replica_command(index, sync_dir, song_seconds, songs),
+                                                  env=env, stdout=output, stderr=subprocess.STDOUT))
+
+        # Start splitting only once every replica has warmed up, so load time doesn't skew contention.
+        while len([f for f in os.listdir(sync_dir) if f.startswith("ready-")]) < len(processes):
+            if any(p.poll() not in (None, 0) for p in processes):
+                raise RuntimeError(f"A replica exited during startup for {config}")
+            time.sleep(0.2)
+        open(os.path.join(sync_dir, "go"), "w").close()
+
+        for p in processes:
+            p.wait()
+        for index, p in enumerate(processes):
+            if p.returncode != 0:
+                raise RuntimeError(f"A replica failed for {config} with exit code {p.returncode}")
+        results = [read_replica_result(os.path.join(sync_dir, f"output-{index}.log"))
+                   for index in range(len(processes))]
+    finally:
+        for p in processes:
+            if p.poll() is None:
+                p.kill()
+        shutil.rmtree(sync_dir, ignore_errors=True)
+
+    return dict(config, songs_per_hour=songs_per_hour(results), replica_results=results)
+
+
+def child_main(index, sync_dir, song_seconds, songs):
+    import music_splitter as splitter
+    from benchmark import run_case
+
+    splitter.configure_worker()
+    splitter.load_models()
+    splitter.warm_up()
+    splitter.STEM_CACHE_ENABLED = False
+
+    storage_root = tempfile.mkdtemp(prefix=f"splitter-sweep-{index}-")
+    try:
+        open(os.path.join(sync_dir, f"ready-{index}"), "w").close()
+        while not os.path.exists(os.path.join(sync_dir, "go")):
+            time.sleep(0.05)
+
+        started = time.perf_counter()
+        for song in range(songs):
+            run_case(splitter, song_seconds, storage_root, f"{index}-{song}")
+        processing_seconds = time.perf_counter() - started
+    finally:
+        shutil.rmtree(storage_root, ignore_errors=True)
+
+    print(RESULT_PREFIX + json.dumps({"replica": index, "songs": songs, "processing_seconds": processing_seconds}),
+          flush=True)
+
+
+def parse_ints(value):
+    return [int(v) for v in value.split(",") if v.strip()] if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep splitter thread topology and report songs/hour.")
+    parser.add_argument("--replicas", default="1,2,4", help="comma-separated replica counts")
+    parser.add_argument("--intra", help="comma-separated intra-op thread counts (default: derived)")
+    parser.add_argument("--inter", help="comma-separated inter-op thread counts (default: derived)")
+    parser.add_argument("--pin", choices=["both", "on", "off"], default="both", help="CPU pinning settings to try")
+    parser.add_argument("--song-seconds", type=int, default=180)
+    parser.add_argument("--songs", type=int, default=2, help="songs each replica splits")
+    parser.add_argument("--output", help="write the JSON results here as well as printing a summary")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--sync-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child is not None:
+        child_main(args.child, args.sync_dir, args.song_seconds, args.songs)
+        return 0
+
+    cpus = available_cpus()
+    pin_options = {"both": (False, True), "on": (True,), "off": (False,)}[args.pin]
+    results = []
+    for config in sweep_configs(parse_ints(args.replicas), len(cpus), parse_ints(args.intra),
+                                parse_ints(args.inter), pin_options):
+        print(f"[Sweep] Running {config}...")
+        result = run_config(config, args.song_seconds, args.songs, cpus)
+        print(f"[Sweep] {result['songs_per_hour']:.1f} songs/hour")
+        results.append(result)
+
+    results.sort(key=lambda r: r["songs_per_hour"], reverse=True)
+    print(f"[Sweep] {len(cpus)} CPUs, {args.song_seconds}s songs, {args.songs} per replica:")
+    for r in results:
+        print(f"  replicas={r['replicas']} intra={r['intra_op_threads']} inter={r['inter_op_threads']} "
+              f"pin={'on' if r['pin'] else 'off'}: {r['songs_per_hour']:.1f} songs/hour")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": len(cpus), "song_seconds": args.song_seconds, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import unittest
+import sys
+from unittest.mock import patch
+
+from thread_sweep import RESULT_PREFIX, run_config, songs_per_hour, sweep_configs
+
+# A replica that logs far more than a pipe buffer holds before and after the shared start.
+CHATTY_REPLICA = """
+import json, os, sys, time
+index, sync_dir = sys.argv[1], sys.argv[2]
+print("x" * 200000, flush=True)
+open(os.path.join(sync_dir, "ready-" + index), "w").close()
+while not os.path.exists(os.path.join(sync_dir, "go")):
+    time.sleep(0.01)
+print("y" * 200000, flush=True)
+print(%r + json.dumps({"replica": int(index), "songs": 1, "processing_seconds": 0.5}), flush=True)
+""" % RESULT_PREFIX
+
+
+class TestThreadSweep(unittest.TestCase):
+
+    def test_sweep_configs_default_threads_follow_replica_count(self):
+        configs = list(sweep_configs([1, 4], cpu_count=8, pin_options=(False,)))
+
+        self.assertEqual(configs, [
+            {"replicas": 1, "intra_op_threads": 8, "inter_op_threads": 2, "pin": False},
+            {"replicas": 4, "intra_op_threads": 2, "inter_op_threads": 1, "pin": False},
+        ])
+
+    def test_sweep_configs_cross_explicit_thread_options(self):
+        configs = list(sweep_configs([2], cpu_count=8, intra_options=[2, 4], inter_options=[1],
+                                     pin_options=(False, True)))
+
+        self.assertEqual(len(configs), 4)
+        self.assertEqual({(c["intra_op_threads"], c["pin"]) for c in configs},
+                         {(2, False), (4, False), (2, True), (4, True)})
+
+    def test_chatty_replicas_do_not_block_on_their_output(self):
+        config = {"replicas": 2, "intra_op_threads": 1, "inter_op_threads": 1, "pin": False}
+        command = lambda index, sync_dir, song_seconds, songs: [sys.executable, "-c", CHATTY_REPLICA,
+                                                                 str(index), sync_dir]
+
+        with patch("thread_sweep.replica_command", command):
+            result = run_config(config, song_seconds=1, songs=1, cpus=[0])
+
+        self.assertEqual([r["replica"] for r in result["replica_results"]], [0, 1])
+        self.assertAlmostEqual(result["songs_per_hour"], 2 * 3600.0 / 0.5)
+
+    def test_songs_per_hour_is_limited_by_slowest_replica(self):
+        results = [
+            {"songs": 2, "processing_seconds": 60.0},
+            {"songs": 2, "processing_seconds": 120.0},
+        ]
+
+        self.assertAlmostEqual(songs_per_hour(results), 4 * 3600.0 / 120.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import os
+import signal
+import sys
+import time
+import traceback
+
+
+def tf_thread_limits(num_workers: int, cpu_count: int = None):
+    """
+    Splits the node's cores evenly between worker processes.
+
+    Returns (intra_op_threads, inter_op_threads) for a single worker.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    intra_op_threads = max(1, cpu_count // max(1, num_workers))
+    inter_op_threads = 1 if intra_op_threads <= 2 else 2
+    return intra_op_threads, inter_op_threads
+
+
+def limit_tf_threads(intra_op_threads: int, inter_op_threads: int):
+    """
+    Caps TensorFlow/BLAS thread pools for this process.
+
+    Must run before the process creates its first TF session; TensorFlow and MKL
+    read these settings when their thread pools are first built.
+    """
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra_op_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+
+    if "tensorflow" in sys.modules:
+        tf = sys.modules["tensorflow"]
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        except RuntimeError as e:
+            print(f"[WorkerPool] TF runtime already initialized, relying on environment limits: {e}")
+
+    print(f"[WorkerPool] pid {os.getpid()}: intra-op threads={intra_op_threads}, inter-op threads={inter_op_threads}")
+
+
+def parse_cpu_list(spec: str):
+    """Parses a Linux-style CPU list such as "0-3,8,10-11" into sorted CPU ids."""
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cpus.update(range(int(first), int(last) + 1))
+        else:
+            cpus.add(int(part))
+    return sorted(cpus)
+
+
+def available_cpus():
+    """CPUs this process may run on (its cgroup/affinity mask), falling back to all cores."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_blocks(cpus, num_workers: int):
+    """
+    Splits cpus into num_workers contiguous blocks, one per worker.
+
+    Neighbouring CPU ids usually share a core or cache, so contiguous blocks keep
+    a worker's threads close together. With fewer CPUs than workers, blocks wrap.
+    """
+    cpus = list(cpus)
+    if num_workers <= len(cpus):
+        size, extra = divmod(len(cpus), num_workers)
+        blocks, start = [], 0
+        for i in range(num_workers):
+            end = start + size + (1 if i < extra else 0)
+            blocks.append(cpus[start:end])
+            start = end
+        return blocks
+    return [[cpus[i % len(cpus)]] for i in range(num_workers)]
+
+
+def pin_to_cpus(cpus) -> bool:
+    """Restricts this process (and threads it starts later) to cpus. Best effort off Linux."""
+    if not hasattr(os, "sched_setaffinity"):
+        print("[WorkerPool] CPU pinning is not supported on this platform, ignoring")
+        return False
+    os.sched_setaffinity(0, cpus)
+    print(f"[WorkerPool] pid {os.getpid()}: pinned to CPUs {','.join(str(c) for c in cpus)}")
+    return True
+
+
+def configure_worker_process(worker_index: int, num_workers: int, intra_op_threads: int = 0,
+                             inter_op_threads: int = 0, affinity: str = "off"):
+    """
+    Applies the thread topology for one worker process.
+
+    affinity is "off", "auto" (a contiguous block of the CPUs this process may
+    use) or an explicit CPU list such as "0-7" that is split between the workers.
+    Thread counts of 0 are derived from the CPUs the worker ends up with.
+    """
+    cpus = available_cpus()
+    if affinity and affinity != "off":
+        pool = cpus if affinity == "auto" else parse_cpu_list(affinity)
+        block = cpu_blocks(pool, num_workers)[worker_index]
+        if pin_to_cpus(block):
+            cpus, num_workers = block, 1
+
+    default_intra, default_inter = tf_thread_limits(num_workers, cpu_count=len(cpus))
+    limit_tf_threads(intra_op_threads or default_intra, inter_op_threads or default_inter)
+
+
+def _spawn(worker_index: int, target) -> int:
+    pid = os.fork()
+    if pid == 0:
+        # Child: restore default signal handling and run the consumer until it exits.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            target(worker_index)
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+    print(f"[WorkerPool] Started worker {worker_index} (pid {pid})")
+    return pid
+
+
+def run_forked_workers(num_workers: int, target, restart: bool = True, restart_delay: float = 5.0,
+                       on_exit=None):
+    """
+    Forks num_workers children that each run target(worker_index) and supervises them.
+
+    Modules the parent imported before calling this are inherited by the children,
+    but anything holding threads or sessions (a loaded TF model) must be built in
+    each child after the fork. Crashed children are
+    restarted when restart is True; SIGTERM/SIGINT stop the whole pool.
+    on_exit(worker_index), if given, runs in the parent whenever a child exits.
+    """
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        print(f"[WorkerPool] Received signal {signum}, stopping {len(children)} workers...")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    previous_handlers = {
+        signal.SIGTERM: signal.signal(signal.SIGTERM, stop),
+        signal.SIGINT: signal.signal(signal.SIGINT, stop),
+    }
+
+    try:
+        for worker_index in range(num_workers):
+            children[_spawn(worker_index, target)] = worker_index
+
+        while children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+
+            worker_index = children.pop(pid, None)
+            if worker_index is None:
+                continue
+
+            exit_code = os.waitstatus_to_exitcode(status)
+            print(f"[WorkerPool] Worker {worker_index} (pid {pid}) exited with code {exit_code}")
+            if on_exit is not None:
+                on_exit(worker_index)
+            if restart and not stopping:
+                time.sleep(restart_delay)
+                children[_spawn(worker_index, target)] = worker_index
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
@@ -0,0 +1,99 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import signal
+import tempfile
+
+from worker_pool import (
+    available_cpus,
+    configure_worker_process,
+    cpu_blocks,
+    limit_tf_threads,
+    parse_cpu_list,
+    run_forked_workers,
+    tf_thread_limits
+)
+
+
+class TestWorkerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_tf_thread_limits_split_cores_between_workers(self):
+        self.assertEqual(tf_thread_limits(4, cpu_count=16), (4, 2))
+        self.assertEqual(tf_thread_limits(8, cpu_count=16), (2, 1))
+        self.assertEqual(tf_thread_limits(32, cpu_count=16), (1, 1))
+
+    def test_limit_tf_threads_sets_environment(self):
+        with patch.dict(os.environ, {}, clear=False):
+            limit_tf_threads(3, 1)
+            self.assertEqual(os.environ["TF_NUM_INTRAOP_THREADS"], "3")
+            self.assertEqual(os.environ["TF_NUM_INTEROP_THREADS"], "1")
+            self.assertEqual(os.environ["OMP_NUM_THREADS"], "3")
+
+    def test_parse_cpu_list(self):
+        self.assertEqual(parse_cpu_list("0-3,8, 10-11"), [0, 1, 2, 3, 8, 10, 11])
+
+    def test_cpu_blocks_are_contiguous_and_cover_every_cpu(self):
+        self.assertEqual(cpu_blocks(range(8), 3), [[0, 1, 2], [3, 4, 5], [6, 7]])
+        self.assertEqual(cpu_blocks([0, 1], 3), [[0], [1], [0]])
+
+    def test_configure_worker_process_pins_and_sizes_threads_to_its_block(self):
+        marker = os.path.join(self.test_dir, "affinity")
+        first_cpu = available_cpus()[0]
+
+        def target(worker_index):
+            with patch.dict(os.environ, {}, clear=False):
+                configure_worker_process(0, 1, affinity=str(first_cpu))
+                with open(marker, "w") as f:
+                    f.write(f"{sorted(os.sched_getaffinity(0))} {os.environ['TF_NUM_INTRAOP_THREADS']}")
+
+        # Pin inside a child so the test process keeps its own affinity.
+        run_forked_workers(1, target, restart=False)
+
+        with open(marker) as f:
+            self.assertEqual(f.read(), f"[{first_cpu}] 1")
+
+    def test_run_forked_workers_runs_each_worker_in_its_own_process(self):
+        shared_state = {"loaded_in_parent": True}
+
+        def target(worker_index):
+            # Objects built before the fork are visible to every child.
+            assert shared_state["loaded_in_parent"]
+            with open(os.path.join(self.test_dir, f"worker-{worker_index}"), "w") as f:
+                f.write(str(os.getpid()))
+
+        exited = []
+        run_forked_workers(3, target, restart=False, on_exit=exited.append)
+
+        self.assertEqual(sorted(exited), [0, 1, 2])
+        pids = set()
+        for worker_index in range(3):
+            with open(os.path.join(self.test_dir, f"worker-{worker_index}")) as f:
+                pids.add(int(f.read()))
+        self.assertEqual(len(pids), 3)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_run_forked_workers_restarts_crashed_worker(self):
+        marker = os.path.join(self.test_dir, "crashed-once")
+
+        def target(worker_index):
+            if not os.path.exists(marker):
+                open(marker, "w").close()
+                raise RuntimeError("consumer crashed")
+            open(os.path.join(self.test_dir, "recovered"), "w").close()
+            # Stop the pool once the restarted worker has run.
+            os.kill(os.getppid(), signal.SIGTERM)
+
+        run_forked_workers(1, target, restart=True, restart_delay=0)
+
+        self.assertTrue(os.path.exists(os.path.join(self.test_dir, "recovered")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,6 +5,9 @@ RABBITMQ_HOST = os.getenv('RABBITMQ_HOST', 'localhost')
 RABBITMQ_PORT = 5672
 RABBITMQ_USER = os.getenv('RABBITMQ_USER', 'guest')
 RABBITMQ_PASS = os.getenv('RABBITMQ_PASS', 'guest')
+# Workers process messages off the connection thread (see worker_runtime.py), so a short
+# heartbeat is safe and dead connections are noticed quickly.
+RABBITMQ_HEARTBEAT = int(os.getenv('RABBITMQ_HEARTBEAT', '60'))
 
 GCS_BUCKET_NAME = 'bda-media-bucket'
 SPLIT_QUEUE_NAME = "split-jobs"
@@ -12,5 +15,13 @@ LYRICS_QUEUE_NAME = "lyrics-jobs"
 DOWNLOAD_QUEUE_NAME = "download-jobs"
 EVENT_TRACKER_QUEUE_NAME = "event-notifications"
 
+# Compressed stem renditions the splitter produces (see gcs_utils.STEM_RENDITIONS).
+# Uncompressed WAV stems are only written when ARCHIVE_WAV_STEMS is enabled.
+STEM_FORMATS = [f.strip() for f in os.getenv('STEM_FORMATS', 'opus,aac,flac').split(',') if f.strip()]
+ARCHIVE_WAV_STEMS = os.getenv('ARCHIVE_WAV_STEMS', 'false').lower() == 'true'
+# Renditions the splitter uploads for each full stem, and for the instrumental preview.
+STEM_OUTPUT_FORMATS = STEM_FORMATS + (['wav'] if ARCHIVE_WAV_STEMS else [])
+PREVIEW_FORMATS = [f for f in STEM_OUTPUT_FORMATS if f in ('opus', 'aac')] or STEM_OUTPUT_FORMATS[:1]
+
 DATA_READER_URL = os.getenv('DATA_READER_URL', 'http://127.0.0.1:5002')
 AUTH_URL = os.getenv('AUTH_URL', 'http://127.0.0.1:8000')
\ No newline at end of file
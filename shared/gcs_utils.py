@@ -2,9 +2,30 @@ from google.cloud import storage
 from shared.constants import GCS_BUCKET_NAME
 import time
 
+# Stem renditions, smallest first: format -> (file extension, MIME type).
+# The MIME types are what browsers match <source type="..."> against.
+STEM_RENDITIONS = {
+    "opus": ("opus", "audio/ogg; codecs=opus"),
+    "aac": ("m4a", "audio/mp4; codecs=mp4a.40.2"),
+    "flac": ("flac", "audio/flac"),
+    "wav": ("wav", "audio/wav"),
+}
+
+# Source audio as the downloader stores it: the stream YouTube served, remuxed but not
+# re-encoded. Looked up in this order; original.wav is what older downloads left.
+ORIGINAL_RENDITIONS = {
+    "opus": ("opus", "audio/ogg; codecs=opus"),
+    "m4a": ("m4a", "audio/mp4"),
+    "ogg": ("ogg", "audio/ogg"),
+    "mp3": ("mp3", "audio/mpeg"),
+    "webm": ("webm", "audio/webm"),
+    "flac": ("flac", "audio/flac"),
+    "wav": ("wav", "audio/wav"),
+}
+
 
 # def upload_file_to_gcs(gcs_url: str, local_path: str):
-def upload_file_to_gcs(gcs_url: str, local_path: str, timeout: int = 300, retries: int = 3):
+def upload_file_to_gcs(gcs_url: str, local_path: str, timeout: int = 300, retries: int = 3, content_type: str = None):
     """
     Uploads a local file to the GCS location specified by a gs:// URL.
     """
@@ -33,7 +54,7 @@ def upload_file_to_gcs(gcs_url: str, local_path: str, timeout: int = 300, retrie
 
     for attempt in range(1, retries + 1):
         try:
-            blob.upload_from_filename(local_path, timeout=timeout)
+            blob.upload_from_filename(local_path, content_type=content_type, timeout=timeout)
             print(f"[GCS] Uploaded: {local_path} --> {gcs_url}")
             return  # success
         except Exception as e:
@@ -66,6 +87,61 @@ def download_file_from_gcs(gcs_url: str, local_path: str):
     print(f"[GCS] Downloaded: {gcs_url} --> {local_path}")
 
 
+def _get_blob(gcs_url: str):
+    assert gcs_url.startswith("gs://"), "GCS URL must start with 'gs://'"
+    path = gcs_url[5:]  # strip 'gs://'
+    bucket_name, *blob_parts = path.split("/")
+    blob_path = "/".join(blob_parts)
+
+    client = storage.Client()
+    return client.bucket(bucket_name).blob(blob_path)
+
+
+def upload_bytes_to_gcs(gcs_url: str, data: bytes, content_type: str = "application/octet-stream",
+                        timeout: int = 300, retries: int = 3):
+    """
+    Uploads an in-memory buffer to the GCS location specified by a gs:// URL.
+    """
+    blob = _get_blob(gcs_url)
+
+    for attempt in range(1, retries + 1):
+        try:
+            blob.upload_from_string(data, content_type=content_type, timeout=timeout)
+            print(f"[GCS] Uploaded {len(data)} bytes --> {gcs_url}")
+            return  # success
+        except Exception as e:
+            print(f"[GCS][Attempt {attempt}] Upload failed: {e}")
+            if attempt == retries:
+                print("[GCS] Final retry failed. Raising exception.")
+                raise
+            time.sleep(2 ** attempt)
+
+
+def download_bytes_from_gcs(gcs_url: str) -> bytes:
+    """
+    Downloads a GCS file straight into memory.
+    """
+    blob = _get_blob(gcs_url)
+
+    if not blob.exists():
+        raise FileNotFoundError(f"No such file in GCS: {gcs_url}")
+
+    data = blob.download_as_bytes()
+    print(f"[GCS] Downloaded: {gcs_url} --> {len(data)} bytes in memory")
+    return data
+
+
+def copy_gcs_file(source_url: str, destination_url: str):
+    """
+    Copies one GCS object to another server-side, without downloading it.
+    """
+    source_blob = _get_blob(source_url)
+    destination_blob = _get_blob(destination_url)
+
+    source_blob.bucket.copy_blob(source_blob, destination_blob.bucket, destination_blob.name)
+    print(f"[GCS] Copied: {source_url} --> {destination_url}")
+
+
 def gcs_file_exists(gcs_url: str) -> bool:
     """Returns True if the given GCS file exists."""
     assert gcs_url.startswith("gs://"), "GCS URL must start with 'gs://'"
@@ -83,8 +159,65 @@ def get_artifact_url(song_id: str, artifact: str) -> str:
     return f"gs://{GCS_BUCKET_NAME}/songs/{song_id}/{artifact}"
 
 
-def get_instrumental_url(song_id: str) -> str:
-    return get_artifact_url(song_id, "instrumental.wav")
+def get_original_artifact(fmt: str = "opus") -> str:
+    extension, _ = ORIGINAL_RENDITIONS[fmt]
+    return f"original.{extension}"
+
+
+def get_original_url(song_id: str, fmt: str = "opus") -> str:
+    return get_artifact_url(song_id, get_original_artifact(fmt))
+
+
+def get_stem_artifact(stem: str, fmt: str = "wav") -> str:
+    extension, _ = STEM_RENDITIONS[fmt]
+    return f"{stem}.{extension}"
+
+
+def get_stem_url(song_id: str, stem: str, fmt: str = "wav") -> str:
+    return get_artifact_url(song_id, get_stem_artifact(stem, fmt))
+
+
+def get_instrumental_url(song_id: str, fmt: str = "wav") -> str:
+    return get_stem_url(song_id, "instrumental", fmt)
+
+def get_vocals_url(song_id: str, fmt: str = "wav") -> str:
+    return get_stem_url(song_id, "vocals", fmt)
+
+
+def get_stem_cache_url(fingerprint: str, stem: str, fmt: str = "wav") -> str:
+    """Content-addressed location of a stem, keyed by the fingerprint of the decoded source audio."""
+    return f"gs://{GCS_BUCKET_NAME}/stem-cache/{fingerprint}/{get_stem_artifact(stem, fmt)}"
+
+
+def get_alignment_cache_url(vocals_hash: str, lyrics_hash: str = "latest") -> str:
+    """
+    Content-addressed lyric alignment, keyed by hashes of the vocals stem and the lyrics.
+    "latest" holds the most recent alignment of those vocals, whatever the lyrics were.
+    """
+    return f"gs://{GCS_BUCKET_NAME}/alignment-cache/{vocals_hash}/{lyrics_hash}.json"
+
+
+def get_lyrics_index_url(key: str) -> str:
+    """
+    Scraped-lyrics index entry (found or known missing), shared by the frontend and
+    the lyrics worker. key is a lyrics_store key such as "title/artist/song" or "genius/123".
+    """
+    return f"gs://{GCS_BUCKET_NAME}/lyrics-index/{key}.json"
+
+
+def find_original_url(song_id: str, formats=tuple(ORIGINAL_RENDITIONS)) -> str:
+    """Returns the URL of the song's source audio, whichever format it was stored in, or None."""
+    for fmt in formats:
+        url = get_original_url(song_id, fmt)
+        if gcs_file_exists(url):
+            return url
+    return None
+
 
-def get_vocals_url(song_id: str) -> str:
-    return get_artifact_url(song_id, "vocals.wav")
\ No newline at end of file
+def find_stem_url(song_id: str, stem: str, formats) -> str:
+    """Returns the URL of the first rendition in formats that exists in GCS, or None."""
+    for fmt in formats:
+        url = get_stem_url(song_id, stem, fmt)
+        if gcs_file_exists(url):
+            return url
+    return None
@@ -0,0 +1,76 @@
+import os
+import shutil
+
+from shared import gcs_utils
+
+
+class LocalGCSUtils:
+    """
+    Filesystem-backed stand-in for shared.gcs_utils.
+
+    Exposes the same functions, so it can be passed wherever a service takes a
+    gcs_utils argument. gs://bucket/path is stored at <root>/bucket/path. Used by
+    benchmarks and local runs that must not touch the real bucket.
+    """
+
+    get_artifact_url = staticmethod(gcs_utils.get_artifact_url)
+    get_original_url = staticmethod(gcs_utils.get_original_url)
+    get_stem_artifact = staticmethod(gcs_utils.get_stem_artifact)
+    get_stem_url = staticmethod(gcs_utils.get_stem_url)
+    get_instrumental_url = staticmethod(gcs_utils.get_instrumental_url)
+    get_vocals_url = staticmethod(gcs_utils.get_vocals_url)
+    get_stem_cache_url = staticmethod(gcs_utils.get_stem_cache_url)
+    get_alignment_cache_url = staticmethod(gcs_utils.get_alignment_cache_url)
+    get_lyrics_index_url = staticmethod(gcs_utils.get_lyrics_index_url)
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, gcs_url: str) -> str:
+        assert gcs_url.startswith("gs://"), "GCS URL must start with 'gs://'"
+        return os.path.join(self.root, *gcs_url[5:].split("/"))
+
+    def _prepare(self, gcs_url: str) -> str:
+        path = self.local_path(gcs_url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def upload_file_to_gcs(self, gcs_url: str, local_path: str, timeout: int = 300, retries: int = 3,
+                           content_type: str = None):
+        shutil.copyfile(local_path, self._prepare(gcs_url))
+
+    def upload_bytes_to_gcs(self, gcs_url: str, data: bytes, content_type: str = "application/octet-stream",
+                            timeout: int = 300, retries: int = 3):
+        with open(self._prepare(gcs_url), "wb") as f:
+            f.write(data)
+
+    def download_file_from_gcs(self, gcs_url: str, local_path: str):
+        if not self.gcs_file_exists(gcs_url):
+            raise FileNotFoundError(f"No such file in GCS: {gcs_url}")
+        shutil.copyfile(self.local_path(gcs_url), local_path)
+
+    def download_bytes_from_gcs(self, gcs_url: str) -> bytes:
+        if not self.gcs_file_exists(gcs_url):
+            raise FileNotFoundError(f"No such file in GCS: {gcs_url}")
+        with open(self.local_path(gcs_url), "rb") as f:
+            return f.read()
+
+    def copy_gcs_file(self, source_url: str, destination_url: str):
+        shutil.copyfile(self.local_path(source_url), self._prepare(destination_url))
+
+    def gcs_file_exists(self, gcs_url: str) -> bool:
+        return os.path.isfile(self.local_path(gcs_url))
+
+    def find_original_url(self, song_id: str, formats=tuple(gcs_utils.ORIGINAL_RENDITIONS)) -> str:
+        for fmt in formats:
+            url = self.get_original_url(song_id, fmt)
+            if self.gcs_file_exists(url):
+                return url
+        return None
+
+    def find_stem_url(self, song_id: str, stem: str, formats) -> str:
+        for fmt in formats:
+            url = self.get_stem_url(song_id, stem, fmt)
+            if self.gcs_file_exists(url):
+                return url
+        return None
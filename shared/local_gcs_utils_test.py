@@ -0,0 +1,64 @@
+import unittest
+import os
+import shutil
+import tempfile
+
+from shared.local_gcs_utils import LocalGCSUtils
+
+
+class TestLocalGCSUtils(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.storage = LocalGCSUtils(os.path.join(self.test_dir, "bucket-root"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_file_round_trip(self):
+        source = os.path.join(self.test_dir, "original.wav")
+        with open(source, "wb") as f:
+            f.write(b"audio")
+        url = self.storage.get_artifact_url("song1", "original.wav")
+
+        self.assertFalse(self.storage.gcs_file_exists(url))
+        self.storage.upload_file_to_gcs(url, source)
+        self.assertTrue(self.storage.gcs_file_exists(url))
+
+        destination = os.path.join(self.test_dir, "copy.wav")
+        self.storage.download_file_from_gcs(url, destination)
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), b"audio")
+
+    def test_bytes_round_trip_and_copy(self):
+        url = self.storage.get_stem_url("song1", "vocals", "flac")
+        self.storage.upload_bytes_to_gcs(url, b"stem", content_type="audio/flac")
+
+        cache_url = self.storage.get_stem_cache_url("abc", "vocals", "flac")
+        self.storage.copy_gcs_file(url, cache_url)
+
+        self.assertEqual(self.storage.download_bytes_from_gcs(cache_url), b"stem")
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            self.storage.download_bytes_from_gcs(self.storage.get_artifact_url("song1", "missing.wav"))
+
+    def test_find_stem_url_returns_first_existing_rendition(self):
+        self.storage.upload_bytes_to_gcs(self.storage.get_stem_url("song1", "vocals", "wav"), b"wav")
+
+        self.assertEqual(self.storage.find_stem_url("song1", "vocals", ["flac", "wav"]),
+                         self.storage.get_stem_url("song1", "vocals", "wav"))
+        self.assertIsNone(self.storage.find_stem_url("song1", "instrumental", ["flac", "wav"]))
+
+    def test_find_original_url_prefers_compressed_sources(self):
+        self.assertIsNone(self.storage.find_original_url("song1"))
+
+        self.storage.upload_bytes_to_gcs(self.storage.get_artifact_url("song1", "original.wav"), b"wav")
+        self.assertEqual(self.storage.find_original_url("song1"), self.storage.get_original_url("song1", "wav"))
+
+        self.storage.upload_bytes_to_gcs(self.storage.get_original_url("song1", "m4a"), b"m4a")
+        self.assertTrue(self.storage.find_original_url("song1").endswith("/songs/song1/original.m4a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Benchmarks the lyrics extraction engines in lyrics_providers.PARSERS.
+
+Runs every engine over the saved AZLyrics/Genius pages in fixtures/lyrics_pages,
+checks they all extract the same text, and reports pages per second and the
+peak memory tracemalloc sees while one page is parsed.
+
+    python -m shared.lyrics_parse_benchmark
+    python -m shared.lyrics_parse_benchmark --repeat 200 --output parse.json
+
+tracemalloc only sees allocations made through Python's allocator, so lxml's
+figure covers the Python objects it builds, not libxml2's own parse tree.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from shared.lyrics_providers import PARSERS
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lyrics_pages")
+# File name prefix -> index into each PARSERS entry.
+PAGE_KINDS = {"azlyrics": 0, "genius": 1}
+
+
+def load_fixtures(directory: str = FIXTURE_DIR):
+    """(name, kind, html) for every saved page, kind being the PARSERS index for its site."""
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        prefix = name.split("_", 1)[0]
+        if name.endswith(".html") and prefix in PAGE_KINDS:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                pages.append((name, PAGE_KINDS[prefix], f.read()))
+    return pages
+
+
+def parity_mismatches(pages, engines=PARSERS):
+    """Names of pages on which the engines don't all extract the same text."""
+    mismatches = []
+    for name, kind, html in pages:
+        if len({parsers[kind](html) for parsers in engines.values()}) > 1:
+            mismatches.append(name)
+    return mismatches
+
+
+def peak_bytes(parse, html):
+    tracemalloc.start()
+    try:
+        parse(html)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(pages, engines=PARSERS, repeat: int = 20):
+    """Per engine: pages per second over repeat passes of all pages, and mean peak KiB per page."""
+    report = {}
+    for engine, parsers in engines.items():
+        for _, kind, html in pages:
+            parsers[kind](html)  # warm up imports and caches
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for _, kind, html in pages:
+                parsers[kind](html)
+        elapsed = time.perf_counter() - started
+
+        peaks = [peak_bytes(parsers[kind], html) for _, kind, html in pages]
+        report[engine] = {
+            "pages_per_second": repeat * len(pages) / elapsed if elapsed else None,
+            "peak_kib_per_page": sum(peaks) / len(peaks) / 1024 if peaks else 0.0,
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark lyrics HTML extraction engines.")
+    parser.add_argument("--fixtures", default=FIXTURE_DIR, help="directory of saved azlyrics_*/genius_* pages")
+    parser.add_argument("--repeat", type=int, default=20, help="passes over the fixtures per engine")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    pages = load_fixtures(args.fixtures)
+    if not pages:
+        parser.error(f"no azlyrics_*.html or genius_*.html pages in {args.fixtures}")
+
+    mismatches = parity_mismatches(pages)
+    report = {"pages": len(pages), "parity_mismatches": mismatches, "engines": run_benchmark(pages, repeat=args.repeat)}
+    for engine, result in report["engines"].items():
+        print(f"[Benchmark] {engine}: {result['pages_per_second']:.0f} pages/s, "
+              f"{result['peak_kib_per_page']:.0f} KiB peak per page", file=sys.stderr)
+    if mismatches:
+        print(f"[Benchmark] Engines disagree on: {', '.join(mismatches)}", file=sys.stderr)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import unittest
+import json
+import os
+import shutil
+import tempfile
+
+from shared.lyrics_parse_benchmark import load_fixtures, main, parity_mismatches, run_benchmark
+from shared.lyrics_providers import PARSERS
+
+
+class TestLyricsParseBenchmark(unittest.TestCase):
+
+    def test_fixtures_cover_both_sites(self):
+        pages = load_fixtures()
+
+        self.assertEqual(sorted({kind for _, kind, _ in pages}), [0, 1])
+        self.assertEqual(parity_mismatches(pages), [])
+
+    def test_parity_check_catches_a_diverging_engine(self):
+        pages = load_fixtures()
+        engines = dict(PARSERS, broken=(lambda html: "", PARSERS["lxml"][1]))
+
+        mismatches = parity_mismatches(pages, engines)
+
+        self.assertEqual(mismatches, [name for name, kind, _ in pages if kind == 0])
+
+    def test_report_has_throughput_and_memory_per_engine(self):
+        report = run_benchmark(load_fixtures(), repeat=1)
+
+        self.assertEqual(set(report), set(PARSERS))
+        for result in report.values():
+            self.assertGreater(result["pages_per_second"], 0)
+            self.assertGreater(result["peak_kib_per_page"], 0)
+
+    def test_main_writes_the_report(self):
+        working_dir = tempfile.mkdtemp()
+        try:
+            output = os.path.join(working_dir, "parse.json")
+            self.assertEqual(main(["--repeat", "1", "--output", output]), 0)
+            with open(output) as f:
+                report = json.load(f)
+        finally:
+            shutil.rmtree(working_dir)
+
+        self.assertEqual(report["pages"], 4)
+        self.assertEqual(report["parity_mismatches"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
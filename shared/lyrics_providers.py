@@ -0,0 +1,308 @@
+"""
+Lyrics scraping from AZLyrics and Genius.
+
+Both sites are queried at once and the first usable result wins, so a slow or
+hung site no longer holds up the other. All requests go through one keep-alive
+requests.Session with (connect, read) timeouts, and fetched pages are cached
+with their ETag/Last-Modified, so asking again is a conditional GET that is
+usually answered with a body-less 304. Lyrics are picked out of the page with
+lxml and targeted XPath queries, falling back to the original BeautifulSoup
+walk when lxml is missing or comes up empty (see lyrics_parse_benchmark.py).
+"""
+import functools
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0"
+
+LYRICS_CONNECT_TIMEOUT = float(os.getenv("LYRICS_CONNECT_TIMEOUT", "3"))
+LYRICS_READ_TIMEOUT = float(os.getenv("LYRICS_READ_TIMEOUT", "8"))
+# How long fetch_lyrics() waits for any provider; one still running after that is abandoned.
+LYRICS_FETCH_DEADLINE = float(os.getenv("LYRICS_FETCH_DEADLINE", "12"))
+# Provider requests in flight per process, across all concurrent lookups.
+LYRICS_PROVIDER_THREADS = int(os.getenv("LYRICS_PROVIDER_THREADS", "8"))
+LYRICS_HTTP_CACHE_SIZE = int(os.getenv("LYRICS_HTTP_CACHE_SIZE", "256"))
+
+_session = None
+_pool = None
+_lock = threading.Lock()
+
+
+class LyricsNotFound(Exception):
+    """The site answered, and it has no lyrics for the song (as opposed to a timeout or error)."""
+
+
+class PageCache:
+    """Bounded LRU of url -> (validator headers, page text) for conditional GETs."""
+
+    def __init__(self, max_entries: int = LYRICS_HTTP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+            return entry
+
+    def put(self, url, response):
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        if not validators:
+            return  # nothing to revalidate with, so nothing worth keeping
+        with self.lock:
+            self.entries[url] = (validators, response.text)
+            self.entries.move_to_end(url)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+page_cache = PageCache()
+
+
+def get_session():
+    """The process-wide keep-alive session, created on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LYRICS_PROVIDER_THREADS, max_retries=0)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=LYRICS_PROVIDER_THREADS, thread_name_prefix="lyrics-provider")
+        return _pool
+
+
+def fetch_page(url, session=None, cache=None, timeout=None):
+    """GETs a page as text, revalidating a cached copy instead of downloading it again when possible."""
+    session = session or get_session()
+    cache = page_cache if cache is None else cache
+    cached = cache.get(url)
+
+    res = session.get(url, headers=dict(cached[0]) if cached else None,
+                      timeout=timeout or (LYRICS_CONNECT_TIMEOUT, LYRICS_READ_TIMEOUT))
+    if res.status_code == 304 and cached:
+        return cached[1]
+    if res.status_code in (404, 410):
+        raise LyricsNotFound(f"No page at {url}: {res.status_code}")
+    if res.status_code != 200:
+        raise Exception(f"Failed to fetch {url}: {res.status_code}")
+    cache.put(url, res)
+    return res.text
+
+
+def normalize_artist_title(artist, title):
+    """Main artist and title, lowercased with everything but letters and digits removed."""
+    artist = re.split(r'\s*(?:ft\.?|feat\.?|featuring|&|,|/|\+|x)\s*', artist, flags=re.IGNORECASE)[0]
+
+    def clean(string):
+        return re.sub(r'[^a-z0-9]', '', string.lower())
+
+    return clean(artist), clean(title)
+
+
+def build_azlyrics_url(artist, title):
+    """Build a URL to AZLyrics using only the main artist."""
+    artist, title = normalize_artist_title(artist, title)
+    return f"https://www.azlyrics.com/lyrics/{artist}/{title}.html"
+
+
+def get_genius_url(song_id):
+    return f"https://genius.com/songs/{song_id}"
+
+
+def clean_azlyrics_text(raw_lyrics):
+    cleaned_lines = []
+    for line in raw_lyrics.strip().splitlines():
+        stripped = line.strip()
+
+        # Skip lines starting with [Explicit:]
+        if stripped.startswith("[Explicit:]"):
+            continue
+
+        # Remove [Clean and radio:] or similar
+        stripped = re.sub(r"^\[\s*clean[^\]]*\]\s*:? ?", "", stripped, flags=re.IGNORECASE)
+
+        cleaned_lines.append(stripped)
+    return "\n".join(cleaned_lines)
+
+
+def parse_azlyrics_soup(html):
+    """Lyrics text of an AZLyrics page: the first class-less, id-less div with text in it."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    for div in soup.find_all("div", attrs={"class": None, "id": None}):
+        if div.text.strip():
+            return clean_azlyrics_text(div.text)
+
+    raise LyricsNotFound("AZLyrics: No valid lyrics div found.")
+
+
+def parse_azlyrics_lxml(html):
+    """parse_azlyrics_soup() on lxml's C parser, with the div picked by one XPath query."""
+    import lxml.html
+
+    for div in lxml.html.fromstring(html).xpath("//div[not(@class) and not(@id)]"):
+        # Like BeautifulSoup's .text, leaves out script and style contents.
+        text = "".join(div.xpath(".//text()[not(ancestor::script or ancestor::style)]"))
+        if text.strip():
+            return clean_azlyrics_text(text)
+
+    raise LyricsNotFound("AZLyrics: No valid lyrics div found.")
+
+
+def _genius_lines(lyrics):
+    return "\n".join(filter(None, (line.strip() for line in lyrics
+                                    if not (line.startswith("[") and line.endswith("]")))))
+
+
+def parse_genius_soup(html):
+    """Lyrics text of a Genius song page, without the [Verse]/[Chorus] headers."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    lyrics_divs = soup.find_all("div", {"data-lyrics-container": "true"})
+    if not lyrics_divs:
+        raise LyricsNotFound("Genius: No lyrics container found.")
+
+    lyrics = []
+    for div in lyrics_divs:
+        for elem in div.children:
+            if elem.name == "a":
+                lyrics.append(elem.get_text(separator="\n"))
+            elif elem.name is None:
+                lyrics.append(str(elem).strip())
+
+    return _genius_lines(lyrics)
+
+
+def parse_genius_lxml(html):
+    """
+    parse_genius_soup() on lxml. A container's direct text is its .text and the
+    .tail of each child element; links contribute all the text inside them.
+    """
+    import lxml.html
+
+    lyrics_divs = lxml.html.fromstring(html).xpath('//div[@data-lyrics-container="true"]')
+    if not lyrics_divs:
+        raise LyricsNotFound("Genius: No lyrics container found.")
+
+    lyrics = []
+    for div in lyrics_divs:
+        if div.text:
+            lyrics.append(div.text.strip())
+        for child in div:
+            if child.tag == "a":
+                lyrics.append("\n".join(child.itertext()))
+            if child.tail:
+                lyrics.append(child.tail.strip())
+
+    return _genius_lines(lyrics)
+
+
+# Extraction engines, fastest first; the rest are fallbacks.
+PARSERS = {
+    "lxml": (parse_azlyrics_lxml, parse_genius_lxml),
+    "soup": (parse_azlyrics_soup, parse_genius_soup),
+}
+
+
+def _parse(index, html):
+    """Runs the engines in order; if they all fail, the last one's error (the reference parser's) is raised."""
+    error = None
+    for name, parsers in PARSERS.items():
+        try:
+            return parsers[index](html)
+        except ImportError:
+            continue
+        except Exception as e:
+            print(f"[Lyrics Providers] Extraction with {name} failed: {e}")
+            error = e
+    raise error or Exception("No HTML parser available.")
+
+
+def parse_azlyrics(html):
+    return _parse(0, html)
+
+
+def parse_genius(html):
+    return _parse(1, html)
+
+
+def scrape_azlyrics(url):
+    """Scrape and clean lyrics from AZLyrics page."""
+    return parse_azlyrics(fetch_page(url))
+
+
+def scrape_genius(song_id):
+    return parse_genius(fetch_page(get_genius_url(song_id)))
+
+
+def race_providers(artist, title, song_id=None, deadline: float = LYRICS_FETCH_DEADLINE):
+    """
+    Races AZLyrics against Genius (when there is a Genius song_id).
+
+    Returns (found, definitive): found is (source, lyrics_text) from the first
+    provider with non-empty lyrics, or None. When nothing was found, definitive
+    says whether every provider actually answered that it has no lyrics, rather
+    than failing or running out of time, so the miss is worth remembering.
+    """
+    attempts = [("AZLyrics", functools.partial(scrape_azlyrics, build_azlyrics_url(artist, title)))]
+    if song_id:
+        attempts.append(("Genius", functools.partial(scrape_genius, song_id)))
+
+    pool = _get_pool()
+    futures = {pool.submit(scrape): (order, name) for order, (name, scrape) in enumerate(attempts)}
+    pending = set(futures)
+    definitive = True
+    give_up_at = time.monotonic() + deadline
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, give_up_at - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            print(f"[Lyrics Providers] No lyrics for {artist} - {title} within {deadline:.0f}s")
+            return None, False
+        # If both finish together, the earlier attempt (AZLyrics) wins.
+        for future in sorted(done, key=lambda f: futures[f][0]):
+            name = futures[future][1]
+            try:
+                lyrics_text = future.result()
+            except LyricsNotFound as e:
+                print(f"[Lyrics Providers] {name} has no lyrics for {artist} - {title}: {e}")
+                continue
+            except Exception as e:
+                print(f"[Lyrics Providers] {name} failed for {artist} - {title}: {e}")
+                definitive = False
+                continue
+            if lyrics_text and lyrics_text.strip():
+                for other in pending:
+                    other.cancel()
+                print(f"[Lyrics Providers] Using {name} lyrics for {artist} - {title}")
+                return (name, lyrics_text), True
+            print(f"[Lyrics Providers] {name} returned empty lyrics for {artist} - {title}")
+    return None, definitive
+
+
+def fetch_lyrics(artist, title, song_id=None, deadline: float = LYRICS_FETCH_DEADLINE):
+    """(source, lyrics_text) from the first of AZLyrics and Genius to find the song's lyrics, or None."""
+    return race_providers(artist, title, song_id, deadline)[0]
@@ -0,0 +1,201 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import threading
+import time
+
+from shared.lyrics_parse_benchmark import load_fixtures
+from shared.lyrics_providers import (
+    PARSERS, LyricsNotFound, PageCache, build_azlyrics_url, fetch_lyrics, fetch_page, parse_azlyrics, parse_genius,
+    race_providers
+)
+
+AZLYRICS_PAGE = """
+<html><body>
+<div class="header">AZLyrics</div>
+<div id="nav">Songs</div>
+<div>
+<!-- Usage of azlyrics.com content by any third-party lyrics provider is prohibited. -->
+[Explicit:] skip me<br>
+[Clean and radio:] Hello world<br>
+How are you<br>
+</div>
+</body></html>
+"""
+
+GENIUS_PAGE = """
+<html><body>
+<div data-lyrics-container="true">[Verse 1]<br>Hello world<br><a href="/x">How are <i>you</i></a><br></div>
+<div data-lyrics-container="true"><span>ad</span>Good night<br></div>
+</body></html>
+"""
+
+
+def response(status, text="", headers=None):
+    res = MagicMock(status_code=status, text=text)
+    res.headers = headers or {}
+    return res
+
+
+class TestParsing(unittest.TestCase):
+
+    def test_build_azlyrics_url_uses_the_main_artist(self):
+        self.assertEqual(build_azlyrics_url("Drake ft. Travis Scott", "SICKO Mode"),
+                         "https://www.azlyrics.com/lyrics/drake/sickomode.html")
+
+    def test_parse_azlyrics_cleans_markers(self):
+        self.assertEqual(parse_azlyrics(AZLYRICS_PAGE), "Hello world\nHow are you")
+
+    def test_parse_genius_drops_section_headers(self):
+        self.assertEqual(parse_genius(GENIUS_PAGE), "Hello world\nHow are \nyou\nGood night")
+
+    def test_each_failing_engine_is_logged_before_the_next_runs(self):
+        calls = []
+
+        def failing(html):
+            calls.append("lxml")
+            raise ValueError("broken markup")
+
+        def working(html):
+            calls.append("soup")
+            return "Hello"
+
+        with patch.dict(PARSERS, {"lxml": (failing, failing), "soup": (working, working)}), \
+                patch("builtins.print", side_effect=lambda msg: calls.append(msg)):
+            self.assertEqual(parse_azlyrics("<html></html>"), "Hello")
+
+        self.assertEqual(calls, ["lxml", "[Lyrics Providers] Extraction with lxml failed: broken markup", "soup"])
+
+    def test_engines_agree_on_saved_pages(self):
+        for name, kind, html in load_fixtures():
+            with self.subTest(name):
+                texts = [parsers[kind](html) for parsers in PARSERS.values()]
+                self.assertTrue(texts[0])
+                self.assertEqual(texts, [texts[0]] * len(texts))
+
+    def test_saved_pages_extract_only_the_lyrics(self):
+        pages = {name: html for name, _, html in load_fixtures()}
+
+        az = parse_azlyrics(pages["azlyrics_city_lights.html"]).splitlines()
+        self.assertEqual(az[0], "Well, I wake up in the morning and I hear the city sing")
+        self.assertEqual(az[-1], "Like the rain on a summer street & the heat")
+        genius = parse_genius(pages["genius_shine_on.html"]).splitlines()
+        self.assertEqual(genius[0], "I've got a feeling that the summer's coming back")
+        self.assertNotIn("[Chorus]", genius)
+        self.assertNotIn("ad", genius)
+
+    def test_falls_back_when_the_fast_engine_fails(self):
+        def broken(html):
+            raise ValueError("lxml choked")
+
+        with patch.dict(PARSERS, {"lxml": (broken, broken)}):
+            self.assertEqual(parse_genius(GENIUS_PAGE), "Hello world\nHow are \nyou\nGood night")
+
+        def missing(html):
+            raise ImportError("No module named 'lxml'")
+
+        with patch.dict(PARSERS, {"lxml": (missing, missing)}):
+            self.assertEqual(parse_azlyrics(AZLYRICS_PAGE), "Hello world\nHow are you")
+
+    def test_pages_without_lyrics_raise(self):
+        with self.assertRaises(Exception):
+            parse_genius("<html><div>nothing</div></html>")
+        with self.assertRaises(Exception):
+            parse_azlyrics("<html><div class='x'>nothing</div></html>")
+
+
+class TestFetchPage(unittest.TestCase):
+
+    def test_revalidates_cached_pages(self):
+        session = MagicMock()
+        session.get.side_effect = [
+            response(200, "page", {"ETag": '"v1"', "Last-Modified": "Wed, 01 Jan 2025 00:00:00 GMT"}),
+            response(304),
+        ]
+        cache = PageCache()
+
+        self.assertEqual(fetch_page("https://example.com/a", session, cache), "page")
+        self.assertEqual(fetch_page("https://example.com/a", session, cache), "page")
+
+        self.assertIsNone(session.get.call_args_list[0].kwargs["headers"])
+        self.assertEqual(session.get.call_args_list[1].kwargs["headers"],
+                         {"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Jan 2025 00:00:00 GMT"})
+        self.assertIsNotNone(session.get.call_args.kwargs["timeout"])
+
+    def test_errors_raise_and_pages_without_validators_are_not_cached(self):
+        session = MagicMock()
+        session.get.side_effect = [response(200, "page"), response(404)]
+        cache = PageCache()
+
+        fetch_page("https://example.com/a", session, cache)
+        with self.assertRaises(Exception):
+            fetch_page("https://example.com/a", session, cache)
+        self.assertIsNone(cache.get("https://example.com/a"))
+
+    def test_missing_pages_are_reported_as_not_found(self):
+        session = MagicMock()
+        session.get.return_value = response(404)
+
+        with self.assertRaises(LyricsNotFound):
+            fetch_page("https://example.com/a", session, PageCache())
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = PageCache(max_entries=2)
+        for url in ("a", "b"):
+            cache.put(url, response(200, url, {"ETag": url}))
+        cache.get("a")
+        cache.put("c", response(200, "c", {"ETag": "c"}))
+
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+
+
+class TestFetchLyrics(unittest.TestCase):
+
+    def test_a_hung_provider_does_not_hold_up_the_other(self):
+        release = threading.Event()
+
+        def hung(url):
+            release.wait(5)
+            return "too late"
+
+        with patch("shared.lyrics_providers.scrape_azlyrics", side_effect=hung), \
+                patch("shared.lyrics_providers.scrape_genius", return_value="from genius"):
+            started = time.monotonic()
+            found = fetch_lyrics("Artist", "Title", "123")
+            elapsed = time.monotonic() - started
+        release.set()
+
+        self.assertEqual(found, ("Genius", "from genius"))
+        self.assertLess(elapsed, 2)
+
+    def test_failures_and_empty_results_fall_through(self):
+        with patch("shared.lyrics_providers.scrape_azlyrics", return_value="  "), \
+                patch("shared.lyrics_providers.scrape_genius", side_effect=Exception("404")):
+            self.assertIsNone(fetch_lyrics("Artist", "Title", "123"))
+
+        with patch("shared.lyrics_providers.scrape_azlyrics", return_value="from az"), \
+                patch("shared.lyrics_providers.scrape_genius") as genius:
+            self.assertEqual(fetch_lyrics("Artist", "Title"), ("AZLyrics", "from az"))
+            genius.assert_not_called()
+
+    def test_only_answers_from_every_provider_make_a_definitive_miss(self):
+        missing = LyricsNotFound("404")
+        with patch("shared.lyrics_providers.scrape_azlyrics", side_effect=missing), \
+                patch("shared.lyrics_providers.scrape_genius", side_effect=missing):
+            self.assertEqual(race_providers("Artist", "Title", "123"), (None, True))
+
+        with patch("shared.lyrics_providers.scrape_azlyrics", side_effect=missing), \
+                patch("shared.lyrics_providers.scrape_genius", side_effect=Exception("503")):
+            self.assertEqual(race_providers("Artist", "Title", "123"), (None, False))
+
+    def test_gives_up_at_the_deadline(self):
+        release = threading.Event()
+        with patch("shared.lyrics_providers.scrape_azlyrics", side_effect=lambda url: release.wait(5)):
+            started = time.monotonic()
+            self.assertIsNone(fetch_lyrics("Artist", "Title", deadline=0.2))
+            self.assertLess(time.monotonic() - started, 2)
+        release.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""
+Persistent index of scraped lyrics, shared by the frontend and the lyrics worker.
+
+lookup_lyrics() answers from the store while an entry is fresh and only races
+the providers (lyrics_providers.race_providers) otherwise. Songs neither site
+has are remembered too, for a shorter time, so asking again doesn't go back
+out to AZLyrics and Genius. Entries are keyed by the normalized artist/title
+and, when known, the Genius song ID.
+
+A store is anything with get(key) and put(keys, entry):
+SqliteLyricsStore keeps a local file (one per host; point every service at the
+same LYRICS_STORE_PATH to share it), GCSLyricsStore keeps one JSON object per
+key in the bucket. LYRICS_STORE picks one for get_lyrics_store(): sqlite for
+local runs, gcs in the cluster (set in terraform), where each pod's disk is its own.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+from shared.lyrics_providers import normalize_artist_title, race_providers
+
+# "sqlite" (local runs), "gcs" (deployments, so every pod shares one store) or "none".
+LYRICS_STORE = os.getenv("LYRICS_STORE", "sqlite").lower()
+LYRICS_STORE_PATH = os.getenv("LYRICS_STORE_PATH", "lyrics_store.sqlite3")
+LYRICS_STORE_TTL_SECONDS = float(os.getenv("LYRICS_STORE_TTL_SECONDS", str(30 * 24 * 3600)))
+# Known-missing songs are retried after this long, in case a site has added them since.
+LYRICS_STORE_NEGATIVE_TTL_SECONDS = float(os.getenv("LYRICS_STORE_NEGATIVE_TTL_SECONDS", str(24 * 3600)))
+
+# found is False for a song neither provider has; lyrics and source are then None.
+LyricsEntry = namedtuple("LyricsEntry", "found lyrics source fetched_at")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def title_key(artist, title):
+    artist, title = normalize_artist_title(artist, title)
+    return f"title/{artist}/{title}" if artist and title else None
+
+
+def genius_key(song_id):
+    song_id = re.sub(r"[^A-Za-z0-9]", "", str(song_id or ""))
+    return f"genius/{song_id}" if song_id else None
+
+
+def is_fresh(entry, now=None, ttl: float = LYRICS_STORE_TTL_SECONDS,
+             negative_ttl: float = LYRICS_STORE_NEGATIVE_TTL_SECONDS) -> bool:
+    age = (time.time() if now is None else now) - entry.fetched_at
+    return age < (ttl if entry.found else negative_ttl)
+
+
+class SqliteLyricsStore:
+    """Local stand-in store: one SQLite file, safe to share between threads and processes."""
+
+    def __init__(self, path: str = LYRICS_STORE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS lyrics (key TEXT PRIMARY KEY, found INTEGER NOT NULL, "
+                         "lyrics TEXT, source TEXT, fetched_at REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT found, lyrics, source, fetched_at FROM lyrics WHERE key = ?",
+                               (key,)).fetchone()
+        finally:
+            conn.close()
+        return LyricsEntry(bool(row[0]), row[1], row[2], row[3]) if row else None
+
+    def put(self, keys, entry):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?)",
+                                 [(key, int(entry.found), entry.lyrics, entry.source, entry.fetched_at)
+                                  for key in keys])
+        finally:
+            conn.close()
+
+
+class GCSLyricsStore:
+    """Store in the bucket, at gcs_utils.get_lyrics_index_url(key); takes gcs_utils or a stand-in."""
+
+    def __init__(self, gcs_utils):
+        self.gcs_utils = gcs_utils
+
+    def get(self, key):
+        url = self.gcs_utils.get_lyrics_index_url(key)
+        if not self.gcs_utils.gcs_file_exists(url):
+            return None
+        return LyricsEntry(**json.loads(self.gcs_utils.download_bytes_from_gcs(url)))
+
+    def put(self, keys, entry):
+        data = json.dumps(entry._asdict()).encode()
+        for key in keys:
+            self.gcs_utils.upload_bytes_to_gcs(self.gcs_utils.get_lyrics_index_url(key), data,
+                                               content_type="application/json")
+
+
+def get_lyrics_store():
+    """The store LYRICS_STORE selects, created on first use; None when it's "none"."""
+    global _store
+    with _store_lock:
+        if _store is None and LYRICS_STORE != "none":
+            if LYRICS_STORE == "gcs":
+                from shared import gcs_utils
+                _store = GCSLyricsStore(gcs_utils)
+            else:
+                _store = SqliteLyricsStore(LYRICS_STORE_PATH)
+            print(f"[Lyrics Store] Using {type(_store).__name__}")
+        return _store
+
+
+def lookup_lyrics(artist, title, song_id=None, store=None, race=race_providers):
+    """
+    (source, lyrics_text) for a song, or None when neither provider has it.
+
+    A fresh stored entry answers without any outbound request. Found lyrics are
+    stored under every key; a miss only under the most specific one (the Genius
+    ID when given), since a miss without one means Genius was never asked.
+    Store errors are logged and treated as a miss, never as a failed lookup.
+    """
+    store = get_lyrics_store() if store is None else store
+    keys = [key for key in (genius_key(song_id), title_key(artist, title)) if key]
+
+    if store is not None:
+        try:
+            for index, key in enumerate(keys):
+                entry = store.get(key)
+                if entry is None or not is_fresh(entry) or (not entry.found and index > 0):
+                    continue
+                if entry.found:
+                    print(f"[Lyrics Store] Hit for {artist} - {title} ({entry.source})")
+                    return entry.source, entry.lyrics
+                print(f"[Lyrics Store] {artist} - {title} is known to have no lyrics")
+                return None
+        except Exception as e:
+            print(f"[Lyrics Store] Lookup failed for {artist} - {title}: {e}")
+            traceback.print_exc()
+
+    found, definitive = race(artist, title, song_id)
+
+    if store is not None and keys and (found or definitive):
+        if found:
+            entry, entry_keys = LyricsEntry(True, found[1], found[0], time.time()), keys
+        else:
+            entry, entry_keys = LyricsEntry(False, None, None, time.time()), keys[:1]
+        try:
+            store.put(entry_keys, entry)
+        except Exception as e:
+            print(f"[Lyrics Store] Could not store lyrics for {artist} - {title}: {e}")
+            traceback.print_exc()
+    return found
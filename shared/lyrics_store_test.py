@@ -0,0 +1,113 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+
+from shared.local_gcs_utils import LocalGCSUtils
+from shared.lyrics_store import (
+    GCSLyricsStore, LyricsEntry, SqliteLyricsStore, genius_key, is_fresh, lookup_lyrics, title_key
+)
+
+
+class FakeRace:
+    """Stands in for race_providers: returns a fixed answer and counts calls."""
+
+    def __init__(self, found=None, definitive=True):
+        self.result = (found, definitive)
+        self.calls = []
+
+    def __call__(self, artist, title, song_id=None):
+        self.calls.append((artist, title, song_id))
+        return self.result
+
+
+class TestLyricsStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = SqliteLyricsStore(os.path.join(self.tmp, "index", "lyrics.sqlite3"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_keys_are_normalized(self):
+        self.assertEqual(title_key("Drake ft. Travis Scott", "SICKO Mode"), title_key("drake", "Sicko-Mode"))
+        self.assertEqual(genius_key(123), "genius/123")
+        self.assertIsNone(genius_key(None))
+        self.assertIsNone(title_key("", "Song"))
+
+    def test_entries_expire_by_their_own_ttl(self):
+        now = 1000000.0
+        self.assertTrue(is_fresh(LyricsEntry(True, "la", "Genius", now - 50), now, ttl=100, negative_ttl=10))
+        self.assertFalse(is_fresh(LyricsEntry(False, None, None, now - 50), now, ttl=100, negative_ttl=10))
+
+    def test_found_lyrics_are_served_from_the_store(self):
+        race = FakeRace(("AZLyrics", "hello world"))
+
+        first = lookup_lyrics("Artist", "Song", "42", store=self.store, race=race)
+        by_id = lookup_lyrics("Someone Else", "Other Title", "42", store=self.store, race=race)
+        by_title = lookup_lyrics("ARTIST feat. Guest", "song", store=self.store, race=race)
+
+        self.assertEqual(first, ("AZLyrics", "hello world"))
+        self.assertEqual(by_id, first)
+        self.assertEqual(by_title, first)
+        self.assertEqual(len(race.calls), 1)
+
+    def test_known_missing_songs_are_not_fetched_again(self):
+        race = FakeRace(None, definitive=True)
+
+        self.assertIsNone(lookup_lyrics("Artist", "Song", "42", store=self.store, race=race))
+        started = time.perf_counter()
+        self.assertIsNone(lookup_lyrics("Artist", "Song", "42", store=self.store, race=race))
+
+        self.assertEqual(len(race.calls), 1)
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_a_miss_without_genius_does_not_hide_genius(self):
+        lookup_lyrics("Artist", "Song", store=self.store, race=FakeRace(None, definitive=True))
+        race = FakeRace(("Genius", "from genius"))
+
+        self.assertEqual(lookup_lyrics("Artist", "Song", "42", store=self.store, race=race),
+                         ("Genius", "from genius"))
+        self.assertEqual(len(race.calls), 1)
+
+    def test_timeouts_and_errors_are_not_remembered(self):
+        lookup_lyrics("Artist", "Song", "42", store=self.store, race=FakeRace(None, definitive=False))
+        race = FakeRace(("Genius", "from genius"))
+
+        self.assertEqual(lookup_lyrics("Artist", "Song", "42", store=self.store, race=race),
+                         ("Genius", "from genius"))
+
+    def test_stale_entries_are_refreshed(self):
+        self.store.put([genius_key("42")], LyricsEntry(True, "old", "AZLyrics", time.time() - 365 * 24 * 3600))
+        race = FakeRace(("Genius", "new"))
+
+        self.assertEqual(lookup_lyrics("Artist", "Song", "42", store=self.store, race=race), ("Genius", "new"))
+        self.assertEqual(self.store.get(genius_key("42")).lyrics, "new")
+
+    def test_a_broken_store_falls_back_to_the_providers(self):
+        class BrokenStore:
+            def get(self, key):
+                raise OSError("disk gone")
+
+            def put(self, keys, entry):
+                raise OSError("disk gone")
+
+        race = FakeRace(("AZLyrics", "hello"))
+        self.assertEqual(lookup_lyrics("Artist", "Song", store=BrokenStore(), race=race), ("AZLyrics", "hello"))
+
+    def test_gcs_store_round_trips_entries(self):
+        store = GCSLyricsStore(LocalGCSUtils(os.path.join(self.tmp, "gcs")))
+        race = FakeRace(("Genius", "from genius"))
+
+        lookup_lyrics("Artist", "Song", "42", store=store, race=race)
+
+        self.assertEqual(store.get(genius_key("42")).lyrics, "from genius")
+        self.assertEqual(lookup_lyrics("Artist", "Song", store=store, race=race), ("Genius", "from genius"))
+        self.assertEqual(len(race.calls), 1)
+        self.assertIsNone(store.get(genius_key("7")))
+
+
+if __name__ == "__main__":
+    unittest.main()
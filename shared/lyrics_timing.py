@@ -0,0 +1,87 @@
+"""
+Compact encoding of synced lyrics, served next to lyrics.json.
+
+lyrics.json is a list of {"line", "start", "end"} entries, optionally with a
+"words" list of {"word", "start", "end"}. The compact form stores the same
+timings as columns of integer centiseconds, each start delta-encoded against
+the previous one, and gzips the result. That is several times smaller than
+the JSON for word-level timings. The song page decodes it with
+decodeCompactLyrics() in static/js/script_main.js and falls back to
+lyrics.json when it is missing.
+"""
+import gzip
+import json
+
+COMPACT_ARTIFACT = "lyrics.compact.json.gz"
+COMPACT_VERSION = 1
+UNIT = 0.01  # seconds per tick
+
+
+def _ticks(seconds: float) -> int:
+    return int(round(seconds / UNIT))
+
+
+def encode_compact(lyrics) -> bytes:
+    """Gzipped columnar encoding of a lyrics.json list."""
+    line_starts, line_lengths, word_counts, word_starts, word_lengths = [], [], [], [], []
+    previous_line = previous_word = 0
+    for entry in lyrics:
+        start = _ticks(entry["start"])
+        line_starts.append(start - previous_line)
+        line_lengths.append(_ticks(entry["end"]) - start)
+        previous_line = start
+
+        words = entry.get("words")
+        # -1 marks a line without word timings, so old-style entries survive a round trip.
+        word_counts.append(-1 if words is None else len(words))
+        for word in words or []:
+            word_start = _ticks(word["start"])
+            word_starts.append(word_start - previous_word)
+            word_lengths.append(_ticks(word["end"]) - word_start)
+            previous_word = word_start
+
+    payload = {
+        "v": COMPACT_VERSION,
+        "unit": UNIT,
+        "lines": [entry["line"] for entry in lyrics],
+        "line_start": line_starts,
+        "line_length": line_lengths,
+        "word_count": word_counts,
+        "word_start": word_starts,
+        "word_length": word_lengths,
+    }
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), mtime=0)
+
+
+def decode_compact(data: bytes):
+    """Inverse of encode_compact(); word text comes from splitting each line on spaces."""
+    payload = json.loads(gzip.decompress(data))
+    if payload.get("v") != COMPACT_VERSION:
+        raise ValueError(f"Unsupported compact lyrics version {payload.get('v')}")
+    unit = payload["unit"]
+
+    lyrics = []
+    line_tick = word_tick = 0
+    word_index = 0
+    for i, text in enumerate(payload["lines"]):
+        line_tick += payload["line_start"][i]
+        entry = {
+            "line": text,
+            "start": round(line_tick * unit, 3),
+            "end": round((line_tick + payload["line_length"][i]) * unit, 3),
+        }
+
+        count = payload["word_count"][i]
+        if count >= 0:
+            words = text.split(" ")
+            entry["words"] = []
+            for k in range(count):
+                word_tick += payload["word_start"][word_index]
+                entry["words"].append({
+                    "word": words[k] if k < len(words) else "",
+                    "start": round(word_tick * unit, 3),
+                    "end": round((word_tick + payload["word_length"][word_index]) * unit, 3),
+                })
+                word_index += 1
+        lyrics.append(entry)
+    return lyrics
@@ -0,0 +1,52 @@
+import unittest
+import gzip
+import json
+
+from shared.lyrics_timing import decode_compact, encode_compact
+
+LYRICS = [
+    {"line": "hello world", "start": 0.2, "end": 1.2, "words": [
+        {"word": "hello", "start": 0.2, "end": 0.7},
+        {"word": "world", "start": 0.7, "end": 1.2},
+    ]},
+    {"line": "how are you", "start": 1.7, "end": 3.2, "words": [
+        {"word": "how", "start": 1.7, "end": 2.2},
+        {"word": "are", "start": 2.2, "end": 2.7},
+        {"word": "you", "start": 2.7, "end": 3.2},
+    ]},
+]
+
+
+class TestLyricsTiming(unittest.TestCase):
+
+    def test_round_trip_keeps_lines_words_and_centisecond_times(self):
+        self.assertEqual(decode_compact(encode_compact(LYRICS)), LYRICS)
+
+    def test_lines_without_word_timings_round_trip_as_before(self):
+        lyrics = [{"line": "la la", "start": 3.0, "end": 4.5}, LYRICS[1]]
+        self.assertEqual(decode_compact(encode_compact(lyrics)), lyrics)
+
+    def test_compact_form_is_much_smaller_than_lyrics_json(self):
+        words = [{"word": f"word{i}", "start": i * 0.4 + 0.123, "end": i * 0.4 + 0.456} for i in range(400)]
+        lyrics = [
+            {"line": " ".join(w["word"] for w in words[i:i + 8]), "start": words[i]["start"],
+             "end": words[i + 7]["end"], "words": words[i:i + 8]}
+            for i in range(0, 400, 8)
+        ]
+
+        as_json = json.dumps(lyrics, indent=2).encode()
+        compact = encode_compact(lyrics)
+
+        self.assertLess(len(compact) * 4, len(as_json))
+        self.assertLess(len(compact), len(gzip.compress(as_json)))
+        for entry, decoded in zip(lyrics, decode_compact(compact)):
+            for word, decoded_word in zip(entry["words"], decoded["words"]):
+                self.assertAlmostEqual(word["start"], decoded_word["start"], delta=0.005)
+
+    def test_unknown_version_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_compact(gzip.compress(json.dumps({"v": 99}).encode()))
+
+
+if __name__ == "__main__":
+    unittest.main()
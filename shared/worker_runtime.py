@@ -0,0 +1,117 @@
+import functools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import pika
+
+from shared import constants
+
+
+class ThreadsafeChannel:
+    """
+    Wraps a pika BlockingChannel so publish/ack/nack can be called from any thread.
+
+    pika's BlockingConnection is not thread-safe: calls made off the connection
+    thread are handed to it with connection.add_callback_threadsafe and run the
+    next time it processes I/O. Calls made on the connection thread run directly.
+    Everything else (queue_declare, basic_qos, ...) is passed straight through and
+    must only be used from the connection thread.
+    """
+
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+        self.owner_thread = threading.get_ident()
+
+    def _call(self, fn, *args, **kwargs):
+        if threading.get_ident() == self.owner_thread:
+            fn(*args, **kwargs)
+        else:
+            self.connection.add_callback_threadsafe(functools.partial(fn, *args, **kwargs))
+
+    def basic_publish(self, *args, **kwargs):
+        self._call(self.channel.basic_publish, *args, **kwargs)
+
+    def basic_ack(self, *args, **kwargs):
+        self._call(self.channel.basic_ack, *args, **kwargs)
+
+    def basic_nack(self, *args, **kwargs):
+        self._call(self.channel.basic_nack, *args, **kwargs)
+
+    def basic_reject(self, *args, **kwargs):
+        self._call(self.channel.basic_reject, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.channel, name)
+
+
+class WorkerRuntime:
+    """
+    Consumes a queue and runs each message's handler on an executor thread.
+
+    The connection thread only moves messages and heartbeats, so a long split or
+    alignment no longer starves the heartbeat and the heartbeat interval can stay
+    short. Up to max_in_flight messages are unacked and processed at once; the
+    broker's prefetch count is set to match. handler(ch, method, properties, body)
+    keeps the signature of a pika callback and is responsible for acking or
+    nacking; ch is a ThreadsafeChannel, so it may do so from its worker thread.
+    """
+
+    def __init__(self, max_in_flight: int = 1, heartbeat: int = constants.RABBITMQ_HEARTBEAT, name: str = "Worker"):
+        self.max_in_flight = max(1, max_in_flight)
+        self.heartbeat = heartbeat
+        self.name = name
+        self.connection = None
+        self.channel = None
+        self.executor = None
+
+    def connect(self):
+        credentials = pika.PlainCredentials(constants.RABBITMQ_USER, constants.RABBITMQ_PASS)
+        self.connection = pika.BlockingConnection(pika.ConnectionParameters(
+            host=constants.RABBITMQ_HOST,
+            heartbeat=self.heartbeat,
+            blocked_connection_timeout=300,
+            connection_attempts=3,
+            retry_delay=5,
+            credentials=credentials
+        ))
+        self.channel = ThreadsafeChannel(self.connection, self.connection.channel())
+        return self.channel
+
+    def consume(self, queue_name: str, handler):
+        """Blocks consuming queue_name until interrupted. connect() must have been called first."""
+        self.channel.owner_thread = threading.get_ident()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix=self.name)
+        self.channel.basic_qos(prefetch_count=self.max_in_flight)
+        self.channel.basic_consume(queue_name, functools.partial(self._on_message, handler))
+
+        print(f"[{self.name}] Listening on queue: {queue_name} "
+              f"(max in flight: {self.max_in_flight}, heartbeat: {self.heartbeat}s)")
+        try:
+            self.channel.start_consuming()
+        except KeyboardInterrupt:
+            self.channel.stop_consuming()
+        finally:
+            self.close()
+
+    def close(self):
+        # Let running jobs finish, then flush the acks they queued on the connection.
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        if self.connection is not None and self.connection.is_open:
+            self.connection.process_data_events(time_limit=0)
+            self.connection.close()
+
+    def _on_message(self, handler, _channel, method, properties, body):
+        self.executor.submit(self._run_handler, handler, method, properties, body)
+
+    def _run_handler(self, handler, method, properties, body):
+        try:
+            handler(self.channel, method, properties, body)
+        except Exception as e:
+            # Handlers ack/nack themselves; this only catches bugs that escaped them.
+            print(f"[{self.name}] Unhandled error for delivery {method.delivery_tag}: {e}")
+            traceback.print_exc()
+            self.channel.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
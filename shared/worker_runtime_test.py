@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from shared.worker_runtime import ThreadsafeChannel, WorkerRuntime
+
+
+class TestThreadsafeChannel(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = MagicMock()
+        self.raw_channel = MagicMock()
+        self.ch = ThreadsafeChannel(self.connection, self.raw_channel)
+
+    def test_calls_on_connection_thread_run_directly(self):
+        self.ch.basic_ack(delivery_tag=1)
+
+        self.raw_channel.basic_ack.assert_called_once_with(delivery_tag=1)
+        self.connection.add_callback_threadsafe.assert_not_called()
+
+    def test_calls_from_other_threads_are_scheduled_on_connection(self):
+        t = threading.Thread(target=self.ch.basic_nack, kwargs={"delivery_tag": 2, "requeue": False})
+        t.start()
+        t.join()
+
+        self.raw_channel.basic_nack.assert_not_called()
+        scheduled = self.connection.add_callback_threadsafe.call_args.args[0]
+        scheduled()
+        self.raw_channel.basic_nack.assert_called_once_with(delivery_tag=2, requeue=False)
+
+
+class TestWorkerRuntime(unittest.TestCase):
+
+    def setUp(self):
+        self.connection = MagicMock()
+        self.connection.add_callback_threadsafe.side_effect = lambda cb: cb()
+        self.connection.is_open = False
+        self.raw_channel = MagicMock()
+        self.runtime = WorkerRuntime(max_in_flight=2, name="Test")
+        self.runtime.connection = self.connection
+        self.runtime.channel = ThreadsafeChannel(self.connection, self.raw_channel)
+        self.runtime.executor = ThreadPoolExecutor(max_workers=2)
+
+    def deliver(self, handler, tag):
+        self.runtime._on_message(handler, self.raw_channel, MagicMock(delivery_tag=tag), None, b"{}")
+
+    def test_consume_sets_prefetch_to_max_in_flight(self):
+        self.runtime.consume("jobs", lambda *args: None)
+
+        self.raw_channel.basic_qos.assert_called_once_with(prefetch_count=2)
+        self.assertEqual(self.raw_channel.basic_consume.call_args.args[0], "jobs")
+        self.raw_channel.start_consuming.assert_called_once()
+
+    def test_messages_run_concurrently_up_to_max_in_flight(self):
+        both_started = threading.Barrier(2, timeout=5)
+
+        def handler(ch, method, properties, body):
+            both_started.wait()
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+        for tag in (1, 2):
+            self.deliver(handler, tag)
+        self.runtime.executor.shutdown(wait=True)
+
+        acked = sorted(c.kwargs["delivery_tag"] for c in self.raw_channel.basic_ack.call_args_list)
+        self.assertEqual(acked, [1, 2])
+
+    def test_delivery_returns_before_handler_finishes(self):
+        release = threading.Event()
+
+        def handler(ch, method, properties, body):
+            release.wait(5)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+        started = time.monotonic()
+        self.deliver(handler, 7)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.raw_channel.basic_ack.assert_not_called()
+
+        release.set()
+        self.runtime.executor.shutdown(wait=True)
+        self.raw_channel.basic_ack.assert_called_once_with(delivery_tag=7)
+        self.connection.add_callback_threadsafe.assert_called_once()
+
+    def test_unhandled_handler_error_nacks_message(self):
+        def handler(ch, method, properties, body):
+            raise RuntimeError("bug")
+
+        self.deliver(handler, 3)
+        self.runtime.executor.shutdown(wait=True)
+
+        self.raw_channel.basic_nack.assert_called_once_with(delivery_tag=3, requeue=False)
+
+
+if __name__ == "__main__":
+    unittest.main()
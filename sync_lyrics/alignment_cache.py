@@ -0,0 +1,178 @@
+"""
+Content-keyed cache of word-level alignments.
+
+Entries live at gcs_utils.get_alignment_cache_url(vocals_hash, lyrics_hash), so
+the same vocals and lyrics under another song ID are never aligned twice. Each
+vocals hash also keeps a "latest" entry. When only some lines of the lyrics
+changed, the unchanged lines keep their word times and just the edited region
+is re-aligned, against the slice of audio between its unchanged neighbours.
+"""
+import difflib
+import hashlib
+import json
+import os
+import traceback
+
+from audio_segments import ALIGN_SAMPLE_RATE, write_mono_wav
+from voice_activity import AlignedWord
+
+# Bump when alignment changes enough that old entries shouldn't be reused.
+CACHE_VERSION = 1
+LYRICS_ALIGN_CACHE_ENABLED = os.getenv("LYRICS_ALIGN_CACHE_ENABLED", "true").lower() == "true"
+# Past this fraction of changed lines a partial re-align isn't worth it; align it all.
+LYRICS_REALIGN_MAX_CHANGED = float(os.getenv("LYRICS_REALIGN_MAX_CHANGED", "0.5"))
+# Extra audio either side of an edited region, so its first and last words aren't clipped.
+REALIGN_PADDING_SECONDS = 0.5
+
+
+def lyrics_hash(lines) -> str:
+    """Hash of the words and line breaks that get aligned (whitespace differences don't count)."""
+    return hashlib.sha256(json.dumps([CACHE_VERSION, lines]).encode()).hexdigest()
+
+
+def content_hash(data: bytes) -> str:
+    """Hash of an encoded vocals file, as downloaded."""
+    return hashlib.sha256(f"{CACHE_VERSION}:".encode() + data).hexdigest()
+
+
+def load_alignment(gcs_utils, vocals_hash: str, key: str = "latest"):
+    """Returns the cached entry ({"lines", "words"}) or None. Errors are logged and count as a miss."""
+    url = gcs_utils.get_alignment_cache_url(vocals_hash, key)
+    try:
+        if not gcs_utils.gcs_file_exists(url):
+            return None
+        entry = json.loads(gcs_utils.download_bytes_from_gcs(url))
+        entry["words"] = [AlignedWord(*word) for word in entry["words"]]
+        return entry
+    except Exception as e:
+        print(f"[AlignCache] Could not read {url}: {e}")
+        traceback.print_exc()
+        return None
+
+
+def store_alignment(gcs_utils, vocals_hash: str, lines, words):
+    """Stores words (anything with word/time_start/time_end) under the lyrics' own key and as "latest"."""
+    try:
+        data = json.dumps({
+            "version": CACHE_VERSION,
+            "lines": lines,
+            "words": [[w.word, w.time_start, w.time_end] for w in words],
+        }).encode()
+        for key in (lyrics_hash(lines), "latest"):
+            gcs_utils.upload_bytes_to_gcs(gcs_utils.get_alignment_cache_url(vocals_hash, key), data,
+                                          content_type="application/json")
+        print(f"[AlignCache] Stored alignment for vocals {vocals_hash[:12]}")
+    except Exception as e:
+        print(f"[AlignCache] Failed to store alignment for vocals {vocals_hash[:12]}: {e}")
+        traceback.print_exc()
+
+
+def words_by_line(lines, words):
+    result = []
+    index = 0
+    for line in lines:
+        result.append(list(words[index:index + len(line)]))
+        index += len(line)
+    return result
+
+
+def plan_realignment(old_lines, old_words, new_lines, max_changed: float = LYRICS_REALIGN_MAX_CHANGED):
+    """
+    Diffs new_lines against a cached alignment of the same vocals.
+
+    Returns (line_words, regions), or None if too much changed to be worth it.
+    line_words holds the reused words of each unchanged new line (None for
+    edited ones). regions lists (first_line, end_line, start, end): new lines
+    [first_line, end_line) to align within [start, end] seconds, the gap
+    between the unchanged lines around them (end is None: to the end of the song).
+    """
+    old_line_words = words_by_line(old_lines, old_words)
+    matcher = difflib.SequenceMatcher(a=[tuple(l) for l in old_lines], b=[tuple(l) for l in new_lines],
+                                      autojunk=False)
+    line_words = [None] * len(new_lines)
+    regions = []
+    changed = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(i2 - i1):
+                line_words[j1 + offset] = old_line_words[i1 + offset]
+            continue
+        if j2 == j1:
+            continue  # lines removed: nothing to align
+        changed += j2 - j1
+        before = [w for words in old_line_words[:i1] for w in words]
+        after = [w for words in old_line_words[i2:] for w in words]
+        start = before[-1].time_end if before else 0.0
+        end = max(start, after[0].time_start) if after else None
+        regions.append((j1, j2, start, end))
+
+    if new_lines and changed / len(new_lines) > max_changed:
+        return None
+    return line_words, regions
+
+
+def realign(samples, new_lines, plan, working_dir: str, sample_rate: int = ALIGN_SAMPLE_RATE, force_align=None):
+    """
+    Runs a plan from plan_realignment() against mono samples and returns
+    AlignedWords for every word of new_lines. samples may be a callable that
+    decodes them, so a plan with nothing to align never decodes the vocals.
+    """
+    line_words, regions = plan
+    if regions:
+        if force_align is None:
+            from nlp_resources import get_force_align
+            force_align = get_force_align()
+        if callable(samples):
+            samples = samples()
+
+        for index, (first, end_line, start, end) in enumerate(regions):
+            transcript = " ".join(w for line in new_lines[first:end_line] for w in line)
+            if not transcript:
+                for line in range(first, end_line):
+                    line_words[line] = []
+                continue
+            window_start = max(0, int((start - REALIGN_PADDING_SECONDS) * sample_rate))
+            window_end = len(samples) if end is None else min(len(samples),
+                                                              int((end + REALIGN_PADDING_SECONDS) * sample_rate))
+            path = os.path.join(working_dir, f"realign_{index:03d}.wav")
+            write_mono_wav(path, samples[window_start:window_end], sample_rate)
+
+            offset = window_start / sample_rate
+            words = [AlignedWord(w.word, w.time_start + offset, w.time_end + offset)
+                     for w in force_align(audio_file=path, transcript=transcript).inference()]
+            for line, aligned in zip(range(first, end_line), words_by_line(new_lines[first:end_line], words)):
+                line_words[line] = aligned
+
+    return [w for words in line_words for w in words]
+
+
+def cached_alignment(gcs_utils, vocals_hash: str, lines, samples, working_dir: str):
+    """
+    Word-level alignment of lines from the cache, re-aligning only edited lines
+    when the vocals were aligned before with different lyrics. Returns None on a miss.
+    samples is passed on to realign().
+    """
+    entry = load_alignment(gcs_utils, vocals_hash, lyrics_hash(lines))
+    if entry is not None:
+        print(f"[AlignCache] Hit for vocals {vocals_hash[:12]}, skipped alignment")
+        return entry["words"]
+
+    previous = load_alignment(gcs_utils, vocals_hash)
+    if previous is None:
+        print(f"[AlignCache] Miss for vocals {vocals_hash[:12]}")
+        return None
+
+    plan = plan_realignment(previous["lines"], previous["words"], lines)
+    if plan is None:
+        print(f"[AlignCache] Lyrics changed too much for a partial re-align of {vocals_hash[:12]}")
+        return None
+
+    print(f"[AlignCache] Re-aligning {sum(r[1] - r[0] for r in plan[1])} of {len(lines)} lines")
+    try:
+        words = realign(samples, lines, plan, working_dir)
+    except Exception as e:
+        print(f"[AlignCache] Partial re-align failed, aligning the whole song instead: {e}")
+        traceback.print_exc()
+        return None
+    store_alignment(gcs_utils, vocals_hash, lines, words)
+    return words
@@ -0,0 +1,119 @@
+import unittest
+from unittest.mock import patch
+import os
+import shutil
+import tempfile
+import wave
+
+import numpy as np
+
+from alignment_cache import (
+    cached_alignment, content_hash, load_alignment, lyrics_hash, plan_realignment, realign, store_alignment
+)
+from shared.local_gcs_utils import LocalGCSUtils
+from voice_activity import AlignedWord
+
+OLD_LINES = [["hello", "world"], ["how", "are", "you"], [], ["good", "night"]]
+OLD_WORDS = [
+    AlignedWord("hello", 1.0, 1.5), AlignedWord("world", 1.5, 2.0),
+    AlignedWord("how", 4.0, 4.5), AlignedWord("are", 4.5, 5.0), AlignedWord("you", 5.0, 5.5),
+    AlignedWord("good", 8.0, 8.5), AlignedWord("night", 8.5, 9.0),
+]
+
+
+class WindowForceAlign:
+    """Fake aligner: spreads the transcript evenly over the file it is given and records each call."""
+
+    calls = []
+
+    def __init__(self, audio_file, transcript):
+        with wave.open(audio_file, "rb") as wav:
+            self.duration = wav.getnframes() / wav.getframerate()
+        self.words = transcript.split()
+        WindowForceAlign.calls.append((self.duration, transcript))
+
+    def inference(self):
+        step = self.duration / len(self.words)
+        return [AlignedWord(w, i * step, (i + 1) * step) for i, w in enumerate(self.words)]
+
+
+class TestAlignmentCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.gcs = LocalGCSUtils(os.path.join(self.tmp, "gcs"))
+        WindowForceAlign.calls = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def fail_decode(self):
+        self.fail("vocals decoded without anything to align")
+
+    def test_hashes_depend_on_content_only(self):
+        self.assertEqual(content_hash(b"same vocals"), content_hash(bytearray(b"same vocals")))
+        self.assertNotEqual(content_hash(b"same vocals"), content_hash(b"other vocals"))
+        self.assertEqual(lyrics_hash(OLD_LINES), lyrics_hash([list(line) for line in OLD_LINES]))
+        self.assertNotEqual(lyrics_hash(OLD_LINES), lyrics_hash(OLD_LINES[:2]))
+
+    def test_exact_hit_skips_alignment(self):
+        store_alignment(self.gcs, "v1", OLD_LINES, OLD_WORDS)
+
+        words = cached_alignment(self.gcs, "v1", OLD_LINES, self.fail_decode, self.tmp)
+
+        self.assertEqual(words, OLD_WORDS)
+        self.assertEqual(load_alignment(self.gcs, "v1")["lines"], OLD_LINES)
+
+    def test_unreadable_entry_is_a_miss(self):
+        self.gcs.upload_bytes_to_gcs(self.gcs.get_alignment_cache_url("v1", lyrics_hash(OLD_LINES)), b"{not json")
+        self.assertIsNone(load_alignment(self.gcs, "v1", lyrics_hash(OLD_LINES)))
+        self.assertIsNone(cached_alignment(self.gcs, "v1", OLD_LINES, self.fail_decode, self.tmp))
+
+    def test_plan_realigns_only_the_edited_line_between_its_neighbours(self):
+        new_lines = [["hello", "world"], ["how", "is", "you"], [], ["good", "night"]]
+
+        line_words, regions = plan_realignment(OLD_LINES, OLD_WORDS, new_lines)
+
+        self.assertEqual(regions, [(1, 2, 2.0, 8.0)])
+        self.assertEqual(line_words[0], OLD_WORDS[:2])
+        self.assertIsNone(line_words[1])
+        self.assertEqual(line_words[3], OLD_WORDS[5:])
+
+    def test_plan_for_appended_lines_runs_to_the_end_and_big_edits_give_up(self):
+        _, regions = plan_realignment(OLD_LINES, OLD_WORDS, OLD_LINES + [["encore"]])
+        self.assertEqual(regions, [(4, 5, 9.0, None)])
+
+        rewritten = [["all"], ["new"], ["words"], ["good", "night"]]
+        self.assertIsNone(plan_realignment(OLD_LINES, OLD_WORDS, rewritten))
+
+    @patch("nlp_resources.get_force_align", return_value=WindowForceAlign)
+    def test_partial_realign_aligns_the_audio_window_and_updates_the_cache(self, _):
+        store_alignment(self.gcs, "v1", OLD_LINES, OLD_WORDS)
+        new_lines = [["hello", "world"], ["how", "is", "you"], [], ["good", "night"]]
+
+        words = cached_alignment(self.gcs, "v1", new_lines, lambda: np.zeros(16000 * 10, dtype=np.float32), self.tmp)
+
+        # Only the edited line went to the aligner, with 2.0-8.0s plus 0.5s padding each side.
+        self.assertEqual(len(WindowForceAlign.calls), 1)
+        duration, transcript = WindowForceAlign.calls[0]
+        self.assertEqual(transcript, "how is you")
+        self.assertAlmostEqual(duration, 7.0)
+
+        self.assertEqual([w.word for w in words], ["hello", "world", "how", "is", "you", "good", "night"])
+        self.assertEqual(words[:2], OLD_WORDS[:2])
+        self.assertAlmostEqual(words[2].time_start, 1.5)
+        self.assertAlmostEqual(words[4].time_end, 8.5)
+        self.assertEqual(load_alignment(self.gcs, "v1", lyrics_hash(new_lines))["words"], words)
+
+    def test_realign_fills_removed_and_blank_regions_without_aligning(self):
+        plan = plan_realignment(OLD_LINES, OLD_WORDS, [["hello", "world"], ["good", "night"]], max_changed=1.0)
+
+        words = realign(self.fail_decode, [["hello", "world"], ["good", "night"]], plan, self.tmp,
+                        force_align=WindowForceAlign)
+
+        self.assertEqual(words, OLD_WORDS[:2] + OLD_WORDS[5:])
+        self.assertEqual(WindowForceAlign.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,285 @@
+"""
+Segment-wise forced alignment.
+
+A whole-song ForceAlign pass is slow and its memory grows with track length.
+Here the vocals are cut at silent gaps into segments of roughly
+LYRICS_SEGMENT_SECONDS, each lyric line is assigned to a segment in proportion
+to how much singing the segment holds, and the segments are aligned
+independently in a process pool. Word timings are shifted back onto the song
+timeline and stitched in order, so callers see the same words a single pass
+would return.
+
+The split by voiced time is only a guess: a held note or a fast verse can put
+lines in the wrong segment, and ForceAlign then forces them onto that audio
+anyway. Such segments show up as words squeezed against the segment edges or as
+a words-per-voiced-second rate far from the other segments'; when any segment
+looks like that, the whole transcript is aligned again in one align_full pass.
+"""
+import os
+import subprocess
+import wave
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import threading
+
+import numpy as np
+
+from voice_activity import (
+    FRAME_SECONDS, LYRICS_VAD, AlignedWord, frame_energy_db, silent_gaps, trim_to_voice, voiced_frames
+)
+
+ALIGN_SAMPLE_RATE = 16000  # what ForceAlign's wav2vec2 model runs at
+
+LYRICS_SEGMENT_SECONDS = float(os.getenv("LYRICS_SEGMENT_SECONDS", "30"))
+LYRICS_MIN_GAP_SECONDS = float(os.getenv("LYRICS_MIN_GAP_SECONDS", "0.4"))
+LYRICS_ALIGN_PROCESSES = int(os.getenv("LYRICS_ALIGN_PROCESSES", str(max(1, min(4, os.cpu_count() or 1)))))
+# Words shorter than LYRICS_MIN_WORD_SECONDS within LYRICS_EDGE_SECONDS of a segment edge count as
+# crammed; a segment whose rate differs from the others' median by LYRICS_RATE_OUTLIER times is an outlier.
+LYRICS_MIN_WORD_SECONDS = float(os.getenv("LYRICS_MIN_WORD_SECONDS", "0.05"))
+LYRICS_EDGE_SECONDS = float(os.getenv("LYRICS_EDGE_SECONDS", "1.0"))
+LYRICS_RATE_OUTLIER = float(os.getenv("LYRICS_RATE_OUTLIER", "3.0"))
+
+Segment = namedtuple("Segment", "start end first_line end_line")  # samples [start, end), lines [first_line, end_line)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def load_mono(source, sample_rate: int = ALIGN_SAMPLE_RATE):
+    """
+    Decodes any ffmpeg-readable audio to mono float32 at sample_rate. source is
+    a file path or the encoded file's bytes, which are piped to ffmpeg so they
+    never touch the disk.
+    """
+    in_memory = isinstance(source, (bytes, bytearray))
+    proc = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", "pipe:0" if in_memory else source,
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        input=bytes(source) if in_memory else b"", stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False
+    )
+    if proc.returncode != 0:
+        name = f"{len(source)} bytes of audio" if in_memory else source
+        raise RuntimeError(f"ffmpeg could not decode {name}: {proc.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(proc.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def write_mono_wav(path: str, samples, sample_rate: int = ALIGN_SAMPLE_RATE):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+
+
+def choose_cuts(gaps, total_frames: int, target_frames: int):
+    """Gap midpoints to cut at, keeping segments at least target_frames long where gaps allow."""
+    cuts = []
+    last = 0
+    for start, end in gaps:
+        if start == 0 or end >= total_frames:
+            continue  # leading/trailing silence isn't a boundary between sung parts
+        middle = (start + end) // 2
+        if middle - last >= target_frames and total_frames - middle >= target_frames // 2:
+            cuts.append(middle)
+            last = middle
+    return cuts
+
+
+def assign_lines(line_word_counts, voiced_per_segment):
+    """
+    Splits lines across segments in proportion to each segment's voiced time.
+
+    Returns one (first_line, end_line) range per segment. Boundaries fall on
+    line breaks, so no line is split, and the ranges cover every line in order.
+    """
+    words_before = np.concatenate([[0], np.cumsum(line_word_counts)])  # words ahead of each line break
+    total_words = words_before[-1]
+    total_voiced = float(sum(voiced_per_segment))
+
+    ranges = []
+    first = 0
+    covered = 0.0
+    for index, voiced in enumerate(voiced_per_segment):
+        if index == len(voiced_per_segment) - 1:
+            end = len(line_word_counts)
+        else:
+            covered += voiced
+            target = total_words * covered / total_voiced if total_voiced else 0.0
+            # The line break nearest the proportional word position, never going backwards.
+            end = first + int(np.argmin(np.abs(words_before[first:] - target)))
+        ranges.append((first, end))
+        first = end
+    return ranges
+
+
+def plan_segments(samples, line_word_counts, sample_rate: int = ALIGN_SAMPLE_RATE,
+                  segment_seconds: float = LYRICS_SEGMENT_SECONDS, min_gap_seconds: float = LYRICS_MIN_GAP_SECONDS):
+    """
+    Cuts the vocals at silent gaps and assigns lyric lines to the pieces.
+
+    Segments that end up with no words are folded into the next one (or the
+    previous one at the end), so every segment has something to align.
+    """
+    frame = int(sample_rate * FRAME_SECONDS)
+    voiced = voiced_frames(frame_energy_db(samples, sample_rate))
+    gaps = silent_gaps(voiced, max(1, int(min_gap_seconds / FRAME_SECONDS)))
+    cuts = choose_cuts(gaps, len(voiced), max(1, int(segment_seconds / FRAME_SECONDS)))
+
+    edges = [0] + cuts + [len(voiced)]
+    voiced_per_segment = [int(voiced[a:b].sum()) for a, b in zip(edges, edges[1:])]
+    line_ranges = assign_lines(line_word_counts, voiced_per_segment)
+
+    segments = []
+    pending_start = None
+    for (a, b), (first, end) in zip(zip(edges, edges[1:]), line_ranges):
+        start = a * frame if pending_start is None else pending_start
+        stop = len(samples) if b == len(voiced) else b * frame
+        if sum(line_word_counts[first:end]) == 0:
+            pending_start = start
+            continue
+        segments.append(Segment(start, stop, first, end))
+        pending_start = None
+
+    if pending_start is not None and segments:
+        last = segments[-1]
+        segments[-1] = Segment(last.start, len(samples), last.first_line, len(line_word_counts))
+    return segments
+
+
+def crammed_words(words, start: float, end: float, min_word_seconds: float = LYRICS_MIN_WORD_SECONDS,
+                  edge_seconds: float = LYRICS_EDGE_SECONDS) -> int:
+    """How many words were squeezed into slivers at the edges of the segment [start, end) (seconds)."""
+    return sum(1 for w in words
+               if w.time_end - w.time_start < min_word_seconds
+               and (w.time_start - start < edge_seconds or end - w.time_end < edge_seconds))
+
+
+def voiced_rate(words, voiced) -> float:
+    """Words per voiced second over the stretch of audio the words were aligned to."""
+    if not words:
+        return 0.0
+    first = int(words[0].time_start / FRAME_SECONDS)
+    last = int(np.ceil(words[-1].time_end / FRAME_SECONDS))
+    return len(words) / max(float(voiced[first:last].sum()) * FRAME_SECONDS, FRAME_SECONDS)
+
+
+def implausible_segments(results, segments, voiced, sample_rate: int = ALIGN_SAMPLE_RATE,
+                         rate_outlier: float = LYRICS_RATE_OUTLIER):
+    """
+    (segment index, reason) for every segment whose aligned words look forced:
+    crammed against the segment edges, or sung at a rate rate_outlier times off
+    the median of the other segments.
+    """
+    rates = [voiced_rate(words, voiced) for words in results]
+    problems = []
+    for index, (words, segment) in enumerate(zip(results, segments)):
+        crammed = crammed_words(words, segment.start / sample_rate, segment.end / sample_rate)
+        others = [rate for i, rate in enumerate(rates) if i != index and rate > 0]
+        typical = float(np.median(others)) if others else 0.0
+        if crammed >= max(2, 0.2 * len(words)):
+            problems.append((index, f"{crammed} of {len(words)} words crammed at the segment edges"))
+        elif typical and rates[index] and not typical / rate_outlier <= rates[index] <= typical * rate_outlier:
+            problems.append((index, f"{rates[index]:.2f} words per voiced second, {typical:.2f} elsewhere"))
+    return problems
+
+
+def _init_align_process(threads: int):
+    # Spawned children haven't imported torch yet, so this caps its thread pool.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+
+
+def align_segment(audio_path: str, transcript: str, offset: float):
+    """Pool task: aligns one segment file and returns (word, start, end) tuples on the song timeline."""
+    from nlp_resources import get_force_align
+
+    ForceAlign = get_force_align()
+    words = ForceAlign(audio_file=audio_path, transcript=transcript).inference()
+    return [(w.word, w.time_start + offset, w.time_end + offset) for w in words]
+
+
+def get_align_pool(processes: int = LYRICS_ALIGN_PROCESSES):
+    """
+    One pool per worker process, created on first use and reused across jobs so
+    every child loads the alignment model once. Spawned rather than forked: the
+    worker has pika and executor threads running.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            threads = max(1, (os.cpu_count() or 1) // processes)
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=_init_align_process, initargs=(threads,))
+            print(f"[Segment Align] Started {processes} alignment processes, {threads} threads each")
+        return _pool
+
+
+def _force_align(force_align):
+    if force_align is None:
+        from nlp_resources import get_force_align
+        force_align = get_force_align()
+    return force_align
+
+
+def align_full(samples, transcript: str, working_dir: str, sample_rate: int = ALIGN_SAMPLE_RATE, force_align=None):
+    """
+    One ForceAlign pass over the whole track. ForceAlign only reads files, so the
+    decoded samples go through a 16 kHz mono wav, already at the model's rate.
+    force_align defaults to forcealign's ForceAlign.
+    """
+    path = os.path.join(working_dir, "vocals_16k.wav")
+    write_mono_wav(path, samples, sample_rate)
+    return _force_align(force_align)(audio_file=path, transcript=transcript).inference()
+
+
+def align_voiced(samples, transcript: str, working_dir: str, sample_rate: int = ALIGN_SAMPLE_RATE, force_align=None):
+    """
+    One ForceAlign pass over just the voiced parts of the samples (see voice_activity.py).
+
+    Returns AlignedWord objects with times on the original song timeline.
+    """
+    trimmed, time_map, _ = trim_to_voice(samples, sample_rate)
+    path = os.path.join(working_dir, "vocals_voiced.wav")
+    write_mono_wav(path, trimmed, sample_rate)
+    return time_map.remap_words(_force_align(force_align)(audio_file=path, transcript=transcript).inference())
+
+
+def align_in_segments(samples, lines, working_dir: str, pool=None, sample_rate: int = ALIGN_SAMPLE_RATE,
+                      segment_seconds: float = LYRICS_SEGMENT_SECONDS, vad: bool = LYRICS_VAD):
+    """
+    Aligns lines (lists of words) against mono samples segment by segment.
+
+    With vad, long silences are trimmed first, so segments only hold singing.
+    Returns AlignedWord objects for every word, in transcript order, with times
+    in seconds from the start of the song.
+    """
+    time_map = None
+    if vad:
+        samples, time_map, _ = trim_to_voice(samples, sample_rate)
+    segments = plan_segments(samples, [len(line) for line in lines], sample_rate, segment_seconds)
+    if pool is None:
+        pool = get_align_pool()
+    print(f"[Segment Align] {len(samples) / sample_rate:.1f}s of vocals in {len(segments)} segments")
+
+    futures = []
+    for index, segment in enumerate(segments):
+        path = os.path.join(working_dir, f"segment_{index:03d}.wav")
+        write_mono_wav(path, samples[segment.start:segment.end], sample_rate)
+        transcript = " ".join(w for line in lines[segment.first_line:segment.end_line] for w in line)
+        futures.append(pool.submit(align_segment, path, transcript, segment.start / sample_rate))
+
+    results = [[AlignedWord(*word) for word in future.result()] for future in futures]
+    voiced = voiced_frames(frame_energy_db(samples, sample_rate))
+    problems = implausible_segments(results, segments, voiced, sample_rate)
+    if problems:
+        for index, reason in problems:
+            print(f"[Segment Align] Segment {index} looks misassigned: {reason}")
+        print("[Segment Align] Falling back to a single full-length alignment")
+        transcript = " ".join(w for line in lines for w in line)
+        aligned = [AlignedWord(w.word, w.time_start, w.time_end)
+                   for w in align_full(samples, transcript, working_dir, sample_rate)]
+    else:
+        aligned = [word for words in results for word in words]
+    return time_map.remap_words(aligned) if time_map else aligned
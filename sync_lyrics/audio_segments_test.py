@@ -0,0 +1,160 @@
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import wave
+
+import numpy as np
+
+from audio_segments import (
+    ALIGN_SAMPLE_RATE, Segment, align_in_segments, assign_lines, frame_energy_db, implausible_segments,
+    plan_segments, silent_gaps, voiced_frames
+)
+from voice_activity import AlignedWord
+
+
+def sung(seconds, sample_rate=ALIGN_SAMPLE_RATE):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def rest(seconds, sample_rate=ALIGN_SAMPLE_RATE):
+    return np.full(int(seconds * sample_rate), 1e-4, dtype=np.float32)
+
+
+class FakeForceAlign:
+    """Spreads the transcript's words evenly over the segment file, like a (very naive) aligner."""
+
+    def __init__(self, audio_file, transcript):
+        with wave.open(audio_file, "rb") as wav:
+            self.duration = wav.getnframes() / wav.getframerate()
+        self.words = transcript.split()
+
+    def inference(self):
+        step = self.duration / max(1, len(self.words))
+        return [type("Word", (), {"word": w, "time_start": i * step, "time_end": (i + 1) * step})()
+                for i, w in enumerate(self.words)]
+
+
+class CrammingForceAlign(FakeForceAlign):
+    """Fits one word per second of audio and, like a forced aligner given too many words, squeezes the rest in at the end."""
+
+    def inference(self):
+        fits = int(self.duration)
+        words = [(w, float(i), i + 1.0) for i, w in enumerate(self.words[:fits])]
+        extra = self.words[fits:]
+        words += [(w, self.duration - 0.01 * (len(extra) - i), self.duration - 0.01 * (len(extra) - i - 1))
+                  for i, w in enumerate(extra)]
+        return [type("Word", (), {"word": w, "time_start": a, "time_end": b})() for w, a, b in words]
+
+
+class TestAudioSegments(unittest.TestCase):
+
+    def test_silent_gaps_finds_long_unvoiced_runs(self):
+        voiced = np.array([1, 1, 0, 0, 0, 1, 0, 1, 0, 0], dtype=bool)
+        self.assertEqual(silent_gaps(voiced, min_frames=2), [(2, 5), (8, 10)])
+
+    def test_quiet_frames_are_unvoiced(self):
+        voiced = voiced_frames(frame_energy_db(np.concatenate([sung(1), rest(1)]), ALIGN_SAMPLE_RATE))
+        self.assertTrue(voiced[:50].all())
+        self.assertFalse(voiced[50:].any())
+
+    def test_assign_lines_follows_voiced_time_and_covers_every_line(self):
+        # Four 2-word lines; the first segment holds three quarters of the singing.
+        ranges = assign_lines([2, 2, 2, 2], [30, 10])
+        self.assertEqual(ranges, [(0, 3), (3, 4)])
+
+        # A silent segment gets no lines; the last one always takes the rest.
+        self.assertEqual(assign_lines([2, 0, 2], [10, 0, 10]), [(0, 1), (1, 1), (1, 3)])
+
+    def test_plan_segments_cuts_in_gaps_and_folds_empty_segments(self):
+        samples = np.concatenate([rest(2), sung(4), rest(1), sung(4), rest(1), sung(4), rest(3)])
+
+        segments = plan_segments(samples, [3, 3, 3], segment_seconds=3)
+
+        self.assertEqual([(s.first_line, s.end_line) for s in segments], [(0, 1), (1, 2), (2, 3)])
+        self.assertEqual(segments[0].start, 0)
+        self.assertEqual(segments[-1].end, len(samples))
+        for previous, current in zip(segments, segments[1:]):
+            self.assertEqual(previous.end, current.start)
+        # Cuts land in the one-second rests, not mid-phrase.
+        self.assertAlmostEqual(segments[1].start / ALIGN_SAMPLE_RATE, 6.5, delta=0.1)
+        self.assertAlmostEqual(segments[2].start / ALIGN_SAMPLE_RATE, 11.5, delta=0.1)
+
+    def test_short_tracks_stay_in_one_segment(self):
+        samples = np.concatenate([sung(4), rest(1), sung(4)])
+        segments = plan_segments(samples, [2, 2], segment_seconds=30)
+        self.assertEqual([(s.start, s.end, s.first_line, s.end_line) for s in segments], [(0, len(samples), 0, 2)])
+
+    @patch("nlp_resources.get_force_align", return_value=FakeForceAlign)
+    def test_align_in_segments_stitches_words_onto_the_song_timeline(self, _):
+        samples = np.concatenate([sung(4), rest(1), sung(4)])
+        lines = [["one", "two"], [], ["three", "four"]]
+        working_dir = tempfile.mkdtemp()
+        try:
+            with ThreadPoolExecutor(2) as pool:
+                aligned = align_in_segments(samples, lines, working_dir, pool=pool, segment_seconds=3,
+                                            vad=False)
+            files = sorted(os.listdir(working_dir))
+        finally:
+            shutil.rmtree(working_dir)
+
+        self.assertEqual(files, ["segment_000.wav", "segment_001.wav"])
+        self.assertEqual([w.word for w in aligned], ["one", "two", "three", "four"])
+        self.assertAlmostEqual(aligned[2].time_start, 4.5, delta=0.05)
+        self.assertAlmostEqual(aligned[3].time_end, 9.0, delta=0.05)
+        starts = [w.time_start for w in aligned]
+        self.assertEqual(starts, sorted(starts))
+
+    @patch("nlp_resources.get_force_align", return_value=FakeForceAlign)
+    def test_align_in_segments_skips_silence_and_maps_times_back(self, _):
+        samples = np.concatenate([rest(10), sung(4), rest(1), sung(4)])
+        working_dir = tempfile.mkdtemp()
+        try:
+            with ThreadPoolExecutor(2) as pool:
+                aligned = align_in_segments(samples, [["one", "two"], ["three", "four"]], working_dir,
+                                            pool=pool, segment_seconds=3, vad=True)
+        finally:
+            shutil.rmtree(working_dir)
+
+        # The aligner only saw the last 9.3s (0.3s of padding before the first phrase).
+        self.assertAlmostEqual(aligned[0].time_start, 9.7, delta=0.05)
+        self.assertAlmostEqual(aligned[-1].time_end, 19.0, delta=0.05)
+
+
+    def test_implausible_segments_flags_crammed_edges_and_rate_outliers(self):
+        voiced = np.ones(3000, dtype=bool)  # 30s of singing
+        segments = [Segment(0, 10 * ALIGN_SAMPLE_RATE, 0, 1), Segment(10 * ALIGN_SAMPLE_RATE, 20 * ALIGN_SAMPLE_RATE, 1, 2),
+                    Segment(20 * ALIGN_SAMPLE_RATE, 30 * ALIGN_SAMPLE_RATE, 2, 3)]
+        even = [[AlignedWord("w", start + i, start + i + 1.0) for i in range(10)] for start in (0, 10, 20)]
+        self.assertEqual(implausible_segments(even, segments, voiced), [])
+
+        crammed = list(even)
+        crammed[1] = even[1][:7] + [AlignedWord("w", 19.97 + 0.01 * i, 19.98 + 0.01 * i) for i in range(3)]
+        self.assertEqual([index for index, _ in implausible_segments(crammed, segments, voiced)], [1])
+
+        squeezed = list(even)
+        squeezed[2] = [AlignedWord("w", 20 + 0.2 * i, 20.2 + 0.2 * i) for i in range(10)]  # all in 2s of 10s
+        self.assertEqual([index for index, _ in implausible_segments(squeezed, segments, voiced)], [2])
+
+    @patch("nlp_resources.get_force_align", return_value=CrammingForceAlign)
+    def test_misassigned_segments_fall_back_to_one_full_pass(self, _):
+        samples = np.concatenate([sung(4), rest(1), sung(4)])
+        # By voiced time the first segment gets one word and the second seven, more than its 4.5s hold.
+        lines = [["one"], ["two", "three", "four", "five", "six", "seven", "eight"]]
+        working_dir = tempfile.mkdtemp()
+        try:
+            with ThreadPoolExecutor(2) as pool:
+                aligned = align_in_segments(samples, lines, working_dir, pool=pool, segment_seconds=3, vad=False)
+            files = sorted(os.listdir(working_dir))
+        finally:
+            shutil.rmtree(working_dir)
+
+        self.assertIn("vocals_16k.wav", files)
+        self.assertEqual([w.word for w in aligned], [w for line in lines for w in line])
+        self.assertTrue(all(w.time_end - w.time_start >= 0.5 for w in aligned))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import functools
+import os
+import threading
+
+# Baked into the image by the Dockerfile; nothing is fetched at runtime unless
+# NLTK_DOWNLOAD_MISSING is set (handy for running the worker outside Docker).
+NLTK_DATA = os.getenv("NLTK_DATA", "/app/nltk_data")
+NLTK_DOWNLOAD_MISSING = os.getenv("NLTK_DOWNLOAD_MISSING", "false").lower() == "true"
+
+# Resource path -> nltk package id. g2p_en (used by forcealign) tags words with the
+# perceptron tagger and looks pronunciations up in cmudict.
+NLTK_RESOURCES = {
+    "taggers/averaged_perceptron_tagger": "averaged_perceptron_tagger",
+    "taggers/averaged_perceptron_tagger_eng": "averaged_perceptron_tagger_eng",
+    "corpora/cmudict": "cmudict",
+}
+
+_lock = threading.Lock()
+_resources_ready = False
+_force_align = None
+
+
+def _use_nltk_data_path(nltk):
+    if NLTK_DATA not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA)
+
+
+def missing_nltk_resources(resources=NLTK_RESOURCES):
+    """Resources not found on the NLTK data path, either unpacked or as the .zip nltk ships."""
+    import nltk
+
+    _use_nltk_data_path(nltk)
+    missing = []
+    for resource in resources:
+        for name in (resource, f"{resource}.zip"):
+            try:
+                nltk.data.find(name)
+                break
+            except LookupError:
+                continue
+        else:
+            missing.append(resource)
+    return missing
+
+
+def ensure_nltk_resources(download: bool = None):
+    """
+    Checks once per process that the NLTK data forcealign needs is on disk.
+
+    Raises LookupError naming what is missing, unless download is enabled, in
+    which case the missing packages are fetched into NLTK_DATA first.
+    """
+    global _resources_ready
+    if _resources_ready:
+        return
+
+    with _lock:
+        if _resources_ready:
+            return
+        if download is None:
+            download = NLTK_DOWNLOAD_MISSING
+
+        missing = missing_nltk_resources()
+        if missing and download:
+            import nltk
+
+            for resource in missing:
+                print(f"[NLTK] Downloading {NLTK_RESOURCES[resource]} into {NLTK_DATA}")
+                nltk.download(NLTK_RESOURCES[resource], download_dir=NLTK_DATA, quiet=True)
+            missing = missing_nltk_resources()
+        if missing:
+            raise LookupError(f"NLTK resources missing from {NLTK_DATA}: {', '.join(missing)}")
+
+        _share_pos_tagger()
+        _resources_ready = True
+        print(f"[NLTK] Resources found in {NLTK_DATA}")
+
+
+def _share_pos_tagger():
+    # nltk < 3.9 unpickles the perceptron tagger on every pos_tag() call; load it
+    # once and reuse it for every job in this process.
+    import nltk.tag
+
+    get_tagger = getattr(nltk.tag, "_get_tagger", None)
+    if get_tagger is not None and not hasattr(get_tagger, "cache_info"):
+        nltk.tag._get_tagger = functools.lru_cache(maxsize=None)(get_tagger)
+
+
+def get_force_align():
+    """Imports forcealign (torch, torchaudio, g2p_en) on first use and returns its ForceAlign class."""
+    global _force_align
+    if _force_align is None:
+        ensure_nltk_resources()
+        with _lock:
+            if _force_align is None:
+                from forcealign import ForceAlign
+
+                _force_align = ForceAlign
+    return _force_align
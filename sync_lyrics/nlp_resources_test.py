@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import types
+import zipfile
+
+import nlp_resources
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Worker startup (module import) must stay well clear of the old multi-second
+# nltk.download round trips, and must not touch the network at all.
+STARTUP_BUDGET_SECONDS = 10.0
+
+OFFLINE_IMPORT = """
+import socket, sys, time
+
+def refuse(*args, **kwargs):
+    raise OSError("network access during startup")
+
+socket.socket.connect = refuse
+socket.create_connection = refuse
+socket.getaddrinfo = refuse
+
+started = time.perf_counter()
+import sync_lyrics
+elapsed = time.perf_counter() - started
+
+assert "nltk" not in sys.modules, "nltk imported at startup"
+assert "forcealign" not in sys.modules, "forcealign imported at startup"
+print(f"STARTUP_SECONDS {elapsed:.3f}")
+"""
+
+
+def bake(root):
+    """Lays out NLTK data the way the Dockerfile does: unpacked taggers plus cmudict.zip."""
+    for name in ("averaged_perceptron_tagger", "averaged_perceptron_tagger_eng"):
+        os.makedirs(os.path.join(root, "taggers", name))
+    os.makedirs(os.path.join(root, "corpora"))
+    with zipfile.ZipFile(os.path.join(root, "corpora", "cmudict.zip"), "w") as z:
+        z.writestr("cmudict/cmudict", "HELLO  HH AH0 L OW1\n")
+
+
+class TestNlpResources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        patchers = [
+            patch.object(nlp_resources, "NLTK_DATA", self.tmp),
+            patch.object(nlp_resources, "_resources_ready", False),
+            patch.object(nlp_resources, "_force_align", None),
+            patch("nltk.data.path", []),
+            patch("nltk.download"),
+        ]
+        self.mock_download = [p.start() for p in patchers][-1]
+        for p in patchers:
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_startup_is_offline_and_fast(self):
+        env = dict(os.environ, NLTK_DATA=self.tmp,
+                   PYTHONPATH=os.pathsep.join([os.path.dirname(HERE), HERE]))
+        proc = subprocess.run([sys.executable, "-c", OFFLINE_IMPORT], cwd=HERE, env=env,
+                              capture_output=True, text=True, timeout=120)
+
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        seconds = float(proc.stdout.split("STARTUP_SECONDS")[-1])
+        print(f"[NLTK] sync_lyrics imported offline in {seconds:.3f}s")
+        self.assertLess(seconds, STARTUP_BUDGET_SECONDS)
+
+    def test_baked_resources_are_found_without_downloading(self):
+        bake(self.tmp)
+
+        self.assertEqual(nlp_resources.missing_nltk_resources(), [])
+        nlp_resources.ensure_nltk_resources()
+
+        self.mock_download.assert_not_called()
+        self.assertTrue(nlp_resources._resources_ready)
+
+    def test_missing_resources_fail_fast_when_downloads_are_off(self):
+        os.makedirs(os.path.join(self.tmp, "taggers", "averaged_perceptron_tagger"))
+
+        with self.assertRaises(LookupError) as ctx:
+            nlp_resources.ensure_nltk_resources(download=False)
+
+        self.assertIn("corpora/cmudict", str(ctx.exception))
+        self.mock_download.assert_not_called()
+        self.assertFalse(nlp_resources._resources_ready)
+
+    def test_missing_resources_are_downloaded_when_enabled(self):
+        def download(package, download_dir, quiet):
+            if not os.path.isdir(os.path.join(download_dir, "corpora")):
+                bake(download_dir)
+
+        self.mock_download.side_effect = download
+
+        nlp_resources.ensure_nltk_resources(download=True)
+
+        self.assertEqual([c.args[0] for c in self.mock_download.call_args_list],
+                         ["averaged_perceptron_tagger", "averaged_perceptron_tagger_eng", "cmudict"])
+        self.assertTrue(nlp_resources._resources_ready)
+
+    def test_force_align_is_imported_once(self):
+        bake(self.tmp)
+        fake = types.ModuleType("forcealign")
+        fake.ForceAlign = MagicMock()
+
+        with patch.dict(sys.modules, {"forcealign": fake}):
+            first = nlp_resources.get_force_align()
+            del fake.ForceAlign
+            second = nlp_resources.get_force_align()
+
+        self.assertIs(first, second)
+
+
+if __name__ == "__main__":
+    unittest.main()
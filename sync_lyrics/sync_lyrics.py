@@ -1,31 +1,43 @@
 import datetime
+import functools
 import json
 import os
+import shutil
+import tempfile
 import traceback
-import re
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
-from bs4 import BeautifulSoup
 import pika
-from forcealign import ForceAlign
 
+from alignment_cache import LYRICS_ALIGN_CACHE_ENABLED, cached_alignment, content_hash, store_alignment
+from audio_segments import align_full, align_in_segments, align_voiced, load_mono
+from nlp_resources import ensure_nltk_resources
 from shared import gcs_utils
 from shared import constants
-
-import os
-import nltk
-nltk.data.path.append(os.environ.get("NLTK_DATA", "/app/nltk_data"))
-print("downloading averaged_perceptron_tagger")
-nltk.download('averaged_perceptron_tagger')
-print("done averaged_perceptron_tagger")
-print("downloading averaged_perceptron_tagger")
-nltk.download('averaged_perceptron_tagger_eng')
-print("done averaged_perceptron_tagger_eng")
+from shared.lyrics_store import lookup_lyrics
+from shared.lyrics_timing import COMPACT_ARTIFACT, encode_compact
+from shared.worker_runtime import WorkerRuntime
+from voice_activity import LYRICS_VAD
 
 RABBITMQ_HOST = constants.RABBITMQ_HOST
 LYRICS_QUEUE_NAME = constants.LYRICS_QUEUE_NAME
 EVENT_TRACKER_QUEUE_NAME = constants.EVENT_TRACKER_QUEUE_NAME
 
+# Songs aligned concurrently by one process (each runs on its own executor thread).
+LYRICS_MAX_IN_FLIGHT = int(os.getenv("LYRICS_MAX_IN_FLIGHT", "1"))
+
+# "full" aligns the whole track in one ForceAlign pass; "segmented" cuts it at silent
+# gaps and aligns the pieces in a process pool (see audio_segments.py).
+LYRICS_ALIGN_MODE = os.getenv("LYRICS_ALIGN_MODE", "full")
+
+# Adds per-word start/end to each lyrics.json line and writes the compact timing file.
+LYRICS_WORD_TIMINGS = os.getenv("LYRICS_WORD_TIMINGS", "true").lower() == "true"
+# Highlights are moved this much earlier than the aligned times, so they lead the singing slightly.
+TIMING_SHIFT_SECONDS = 0.3
+
+# Vocals renditions ForceAlign can read, lossless first.
+VOCALS_FORMATS = ["flac", "wav", "opus", "aac"]
+
 # Queue functions
 def notify_event_tracker(ch, status, job_id="", song_id="", error_message=None):
     event_tracker_message = {
@@ -47,123 +59,21 @@ def notify_event_tracker(ch, status, job_id="", song_id="", error_message=None):
     )
     print(f"[EventTracker] Notified event tracker about lyrics syncing status for job: {job_id}")
 
-def build_azlyrics_url(artist, title):
-    """Build a URL to AZLyrics using only the main artist."""
-    artist = re.split(r'\s*(?:ft\.?|feat\.?|featuring|&|,|/|\+|x)\s*', artist, flags=re.IGNORECASE)[0]
-
-    def clean(string):
-        return re.sub(r'[^a-z0-9]', '', string.lower())
-
-    artist = clean(artist)
-    title = clean(title)
-    return f"https://www.azlyrics.com/lyrics/{artist}/{title}.html"
-
-def scrape_azlyrics(url):
-    """Scrape and clean lyrics from AZLyrics page."""
-    headers = {"User-Agent": "Mozilla/5.0"}
-    res = requests.get(url, headers=headers)
-
-    if res.status_code != 200:
-        raise Exception(f"Failed to fetch AZLyrics page: {res.status_code}")
-
-    soup = BeautifulSoup(res.text, "html.parser")
-    divs = soup.find_all("div", attrs={"class": None, "id": None})
-
-    for div in divs:
-        if div.text.strip():
-            raw_lyrics = div.text.strip()
-            lines = raw_lyrics.splitlines()
-
-            cleaned_lines = []
-            for line in lines:
-                stripped = line.strip()
-
-                # Skip lines starting with [Explicit:]
-                if stripped.startswith("[Explicit:]"):
-                    continue
-
-                # Remove [Clean and radio:] or similar
-                stripped = re.sub(r"^\[\s*clean[^\]]*\]\s*:? ?", "", stripped, flags=re.IGNORECASE)
-
-                cleaned_lines.append(stripped)
-
-            return "\n".join(cleaned_lines)
-
-    raise Exception("AZLyrics: No valid lyrics div found.")
-
-def get_lyrics_from_azlyrics(artist, title):
-    try:
-        az_url = build_azlyrics_url(artist, title)
-        print(f"[AZLyrics Scraper] Trying AZLyrics: {az_url}")
-        lyrics = scrape_azlyrics(az_url)
-        return lyrics
-    except Exception as e:
-        print(f"[AZLyrics Scraper] Failed for {artist} - {title}: {e}")
-        return None
-
 # Core functionality
-def get_genius_url(song_id):
-    return f"https://genius.com/songs/{song_id}"
-
-
 def download_and_store_lyrics(song_id, song_name, artist_name):
-    print(f"[Lyrics Scraper] Attempting AZLyrics for: {artist_name} - {song_name}")
-    lyrics_text = get_lyrics_from_azlyrics(artist_name, song_name)
-
-    if not lyrics_text:
-        print(f"[Lyrics Scraper] Falling back to Genius for: {song_id}")
-        genius_url = get_genius_url(song_id)
-
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
-
-        try:
-            response = requests.get(genius_url, headers=headers)
-            if response.status_code != 200:
-                print(f"[Lyrics Scraper] Failed to fetch Genius page for {song_id}")
-                return False
-
-            soup = BeautifulSoup(response.text, "html.parser")
-            lyrics_divs = soup.find_all("div", {"data-lyrics-container": "true"})
-            if not lyrics_divs:
-                print(f"[Lyrics Scraper] No lyrics container found for {song_id}")
-                return False
-
-            lyrics = []
-            for div in lyrics_divs:
-                for elem in div.children:
-                    if elem.name == "a":
-                        text = elem.get_text(separator="\n")
-                    elif elem.name is None:
-                        text = str(elem).strip()
-                    else:
-                        continue
-
-                    if text.startswith("[") and text.endswith("]"):
-                        continue
-
-                    lyrics.append(text)
-
-            lyrics_text = "\n".join(filter(None, (line.strip() for line in lyrics)))
-        except Exception as e:
-            print(f"[Lyrics Scraper] Unexpected error while fetching Genius for {song_id}: {e}")
-            traceback.print_exc()
-            return False
+    print(f"[Lyrics Scraper] Fetching lyrics for: {artist_name} - {song_name}")
+    found = lookup_lyrics(artist_name, song_name, song_id)
+    if not found:
+        print(f"[Lyrics Scraper] No lyrics found for {song_id}")
+        return False
+    source, lyrics_text = found
 
-    # Save lyrics to disk and GCS
     try:
-        local_dir = os.path.join("downloads", song_id)
-        os.makedirs(local_dir, exist_ok=True)
-        local_path = os.path.join(local_dir, "lyrics.txt")
-
-        with open(local_path, "w") as f:
-            f.write(lyrics_text)
-
         lyrics_gcs_path = gcs_utils.get_artifact_url(song_id, "lyrics.txt")
-        gcs_utils.upload_file_to_gcs(lyrics_gcs_path, local_path)
+        gcs_utils.upload_bytes_to_gcs(lyrics_gcs_path, lyrics_text.encode("utf-8"),
+                                      content_type="text/plain; charset=utf-8")
 
-        print(f"[Lyrics Scraper] Uploaded lyrics.txt to {lyrics_gcs_path}")
+        print(f"[Lyrics Scraper] Uploaded {source} lyrics.txt to {lyrics_gcs_path}")
         return True
     except Exception as e:
         print(f"[Lyrics Scraper] Failed to save lyrics for {song_id}: {e}")
@@ -171,75 +81,123 @@ def download_and_store_lyrics(song_id, song_name, artist_name):
         return False
 
 
+def build_line_timings(lines, aligned_words, word_timings=LYRICS_WORD_TIMINGS):
+    """
+    Groups aligned words (anything with time_start/time_end) back into the lyrics.json line entries.
+    With word_timings, each entry also lists its words with their own start/end.
+    """
+    result = []
+    w_idx = 0
+    for original_words in lines:
+        if not original_words:
+            continue
+        start, end = None, None
+        line_words = []
+        word_entries = []
+        for word in original_words:
+            if w_idx >= len(aligned_words):
+                break
+            aligned_word = aligned_words[w_idx]
+            line_words.append(word)
+            if start is None:
+                start = aligned_word.time_start
+            end = aligned_word.time_end
+            word_entries.append({
+                "word": word,
+                "start": max(0, aligned_word.time_start - TIMING_SHIFT_SECONDS),
+                "end": max(0, aligned_word.time_end - TIMING_SHIFT_SECONDS)
+            })
+            w_idx += 1
+        # Shift both start and end backward, clamp to >= 0
+        shifted_start = max(0, start - TIMING_SHIFT_SECONDS)
+        shifted_end = max(0, end - TIMING_SHIFT_SECONDS)
+
+        entry = {
+            "line": " ".join(line_words),
+            "start": shifted_start,
+            "end": shifted_end
+        }
+        if word_timings:
+            entry["words"] = word_entries
+        result.append(entry)
+    return result
+
+
+def run_alignment(samples, lines, working_dir):
+    """Word-level alignment of lines (lists of words) against the decoded vocals, in the configured mode."""
+    transcript = ' '.join(w for line in lines for w in line)
+    if LYRICS_ALIGN_MODE == "segmented":
+        print(f"[Lyrics Worker] Running ForceAlign segment by segment...")
+        aligned_words = align_in_segments(samples, lines, working_dir)
+    elif LYRICS_VAD:
+        print(f"[Lyrics Worker] Running ForceAlign on the voiced parts...")
+        aligned_words = align_voiced(samples, transcript, working_dir)
+    else:
+        print(f"[Lyrics Worker] Running ForceAlign...")
+        aligned_words = align_full(samples, transcript, working_dir)
+    return aligned_words
+
+
+def fetch_inputs(lyrics_url, vocals_url):
+    """Downloads lyrics.txt and the vocals stem concurrently, both straight into memory."""
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        lyrics = pool.submit(gcs_utils.download_bytes_from_gcs, lyrics_url)
+        vocals = pool.submit(gcs_utils.download_bytes_from_gcs, vocals_url)
+        return lyrics.result().decode("utf-8"), vocals.result()
+
+
 def align_lyrics(song_id: str):
     print(f"[Lyrics Worker] Processing song ID: {song_id}")
 
     lyrics_url = gcs_utils.get_artifact_url(song_id, "lyrics.txt")
-    vocals_url = gcs_utils.get_artifact_url(song_id, "vocals.wav")
     output_url = gcs_utils.get_artifact_url(song_id, "lyrics.json")
 
     if gcs_utils.gcs_file_exists(output_url):
         print(f"[Lyrics Worker] lyrics.json already exists, skipping {song_id}")
         return
 
-    working_dir = os.path.join("downloads", song_id)
-    os.makedirs(working_dir, exist_ok=True)
+    vocals_url = gcs_utils.find_stem_url(song_id, "vocals", VOCALS_FORMATS)
+    if not vocals_url:
+        raise FileNotFoundError(f"No vocals stem found in GCS for {song_id}")
+
+    # Only the 16 kHz mono wavs handed to ForceAlign are written here. One directory per job:
+    # with LYRICS_MAX_IN_FLIGHT > 1 two jobs for the same song can run at once.
+    os.makedirs("downloads", exist_ok=True)
+    working_dir = tempfile.mkdtemp(prefix=f"{song_id}-", dir="downloads")
 
     try:
-        local_lyrics = os.path.join(working_dir, "lyrics.txt")
-        local_audio = os.path.join(working_dir, "vocals.wav")
-        local_output = os.path.join(working_dir, "lyrics.json")
+        lyrics_text, vocals_data = fetch_inputs(lyrics_url, vocals_url)
+        lines = [line.split() for line in lyrics_text.splitlines()]
 
-        # Download GCS lyrics and audio
-        gcs_utils.download_file_from_gcs(lyrics_url, local_lyrics)
-        gcs_utils.download_file_from_gcs(vocals_url, local_audio)
+        # Decoded once, on first use: an exact cache hit never needs the audio.
+        @functools.lru_cache(maxsize=None)
+        def vocals_samples():
+            return load_mono(vocals_data)
 
-        with open(local_lyrics, 'r') as f:
-            raw_lines = [line.strip() for line in f.readlines()]
-        lines = [line.split() for line in raw_lines]
-        flat_words = [w for line in lines for w in line]
+        vocals_hash = content_hash(vocals_data) if LYRICS_ALIGN_CACHE_ENABLED else None
+        aligned_words = None
+        if vocals_hash:
+            aligned_words = cached_alignment(gcs_utils, vocals_hash, lines, vocals_samples, working_dir)
+        if aligned_words is None:
+            aligned_words = run_alignment(vocals_samples(), lines, working_dir)
+            if vocals_hash:
+                store_alignment(gcs_utils, vocals_hash, lines, aligned_words)
 
-        print(f"[Lyrics Worker] Running ForceAlign...")
-        align = ForceAlign(audio_file=local_audio, transcript=' '.join(flat_words))
-        aligned_words = align.inference()
-
-        result = []
-        w_idx = 0
-        for original_words in lines:
-            if not original_words:
-                continue
-            start, end = None, None
-            line_words = []
-            for word in original_words:
-                if w_idx >= len(aligned_words):
-                    break
-                aligned_word = aligned_words[w_idx]
-                line_words.append(word)
-                if start is None:
-                    start = aligned_word.time_start
-                end = aligned_word.time_end
-                w_idx += 1
-            # Shift both start and end backward by 0.2s, clamp to >= 0
-            shifted_start = max(0, start - 0.3)
-            shifted_end = max(0, end - 0.3)
-
-            result.append({
-                "line": " ".join(line_words),
-                "start": shifted_start,
-                "end": shifted_end
-            })
+        result = build_line_timings(lines, aligned_words)
 
-        with open(local_output, "w") as f:
-            json.dump(result, f, indent=2)
-        gcs_utils.upload_file_to_gcs(output_url, local_output)
+        gcs_utils.upload_bytes_to_gcs(output_url, json.dumps(result, indent=2).encode(),
+                                      content_type="application/json")
 
         print(f"[Lyrics Worker] Uploaded lyrics.json to: {output_url}")
 
+        if LYRICS_WORD_TIMINGS:
+            # Written after lyrics.json, which stays the completion marker and the fallback.
+            compact_url = gcs_utils.get_artifact_url(song_id, COMPACT_ARTIFACT)
+            gcs_utils.upload_bytes_to_gcs(compact_url, encode_compact(result), content_type="application/gzip")
+            print(f"[Lyrics Worker] Uploaded {COMPACT_ARTIFACT} to: {compact_url}")
+
     finally:
-        if os.path.exists(working_dir):
-            for f in os.listdir(working_dir):
-                os.remove(os.path.join(working_dir, f))
-            os.rmdir(working_dir)
+        shutil.rmtree(working_dir, ignore_errors=True)
         print(f"[Lyrics Worker] Done processing {song_id}")
 
 
@@ -292,26 +250,15 @@ def callback(ch, method, properties, body):
 
 def start_worker():
     print("Starting Sync Lyrics worker...")
-    credentials = pika.PlainCredentials(constants.RABBITMQ_USER, constants.RABBITMQ_PASS)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(
-        host=RABBITMQ_HOST,
-        heartbeat=600,
-        blocked_connection_timeout=300,
-        connection_attempts=3,
-        retry_delay=5,
-        socket_timeout=600,
-        credentials=credentials
-    ))
-    channel = connection.channel()
+    # Fail fast on a badly built image; forcealign itself is imported by the first job.
+    ensure_nltk_resources()
+    runtime = WorkerRuntime(max_in_flight=LYRICS_MAX_IN_FLIGHT, name="Lyrics Worker")
+    channel = runtime.connect()
 
     channel.queue_declare(queue=EVENT_TRACKER_QUEUE_NAME)
-
     channel.queue_declare(queue=LYRICS_QUEUE_NAME)
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(LYRICS_QUEUE_NAME, callback)
 
-    print(f"[Lyrics Worker] Listening on queue: {LYRICS_QUEUE_NAME}")
-    channel.start_consuming()
+    runtime.consume(LYRICS_QUEUE_NAME, callback)
 
 
 if __name__ == "__main__":
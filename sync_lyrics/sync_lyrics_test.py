@@ -4,10 +4,15 @@ import os
 import json
 import tempfile
 import shutil
+import threading
 
+import numpy as np
+
+from shared.lyrics_providers import build_azlyrics_url
+from shared.lyrics_timing import decode_compact
 from sync_lyrics import (
-    build_azlyrics_url,
     align_lyrics,
+    build_line_timings,
     callback
 )
 
@@ -17,22 +22,36 @@ class TestLyricsSyncer(unittest.TestCase):
         url = build_azlyrics_url("Drake ft. Travis Scott", "SICKO Mode")
         self.assertEqual(url, "https://www.azlyrics.com/lyrics/drake/sickomode.html")
 
-    @patch("lyrics_syncer.gcs_utils")
-    @patch("lyrics_syncer.ForceAlign")
-    def test_align_lyrics_happy_path(self, MockForceAlign, mock_gcs):
-        # Setup
+    @patch("sync_lyrics.LYRICS_VAD", False)
+    @patch("sync_lyrics.LYRICS_ALIGN_CACHE_ENABLED", False)
+    @patch("sync_lyrics.gcs_utils")
+    @patch("sync_lyrics.load_mono")
+    @patch("nlp_resources.get_force_align")
+    def test_align_lyrics_happy_path(self, mock_get_force_align, mock_load_mono, mock_gcs):
+        # Setup: "GCS" lives in a temp dir, and the worker's downloads/ dir goes next to it.
         song_id = "abc123"
         temp_dir = tempfile.mkdtemp()
-        download_path = os.path.join(temp_dir, song_id)
-        os.makedirs(download_path, exist_ok=True)
+        bucket_path = os.path.join(temp_dir, "bucket", song_id)
+        os.makedirs(bucket_path, exist_ok=True)
+        uploaded = {}
+        # Both downloads have to be in flight at once to get past the barrier.
+        both_downloading = threading.Barrier(2, timeout=5)
+
+        def download(url):
+            both_downloading.wait()
+            with open(url, "rb") as f:
+                return f.read()
 
-        mock_gcs.get_artifact_url.side_effect = lambda sid, f: os.path.join(download_path, f)
+        def upload(url, data, content_type=None):
+            uploaded[url] = data
+
+        mock_gcs.get_artifact_url.side_effect = lambda sid, f: os.path.join(bucket_path, f)
         mock_gcs.gcs_file_exists.return_value = False
-        mock_gcs.download_file_from_gcs = MagicMock()
-        mock_gcs.upload_file_to_gcs = MagicMock()
+        mock_gcs.download_bytes_from_gcs.side_effect = download
+        mock_gcs.upload_bytes_to_gcs.side_effect = upload
 
-        lyrics_txt = os.path.join(download_path, "lyrics.txt")
-        vocals_wav = os.path.join(download_path, "vocals.wav")
+        lyrics_txt = os.path.join(bucket_path, "lyrics.txt")
+        vocals_wav = os.path.join(bucket_path, "vocals.wav")
 
         with open(lyrics_txt, "w") as f:
             f.write("hello world\nhow are you")
@@ -40,6 +59,9 @@ class TestLyricsSyncer(unittest.TestCase):
         with open(vocals_wav, "wb") as f:
             f.write(b"fake_wav_data")
 
+        mock_gcs.find_stem_url.return_value = vocals_wav
+        mock_load_mono.return_value = np.zeros(16000 * 4, dtype=np.float32)
+
         mock_aligned = [
             MagicMock(time_start=0.5, time_end=1.0),
             MagicMock(time_start=1.0, time_end=1.5),
@@ -47,22 +69,46 @@ class TestLyricsSyncer(unittest.TestCase):
             MagicMock(time_start=2.5, time_end=3.0),
             MagicMock(time_start=3.0, time_end=3.5)
         ]
+        MockForceAlign = mock_get_force_align.return_value
         MockForceAlign.return_value.inference.return_value = mock_aligned
 
-        with patch("lyrics_syncer.os.path.exists", return_value=True), \
-             patch("lyrics_syncer.os.listdir", return_value=["lyrics.txt", "vocals.wav"]), \
-             patch("lyrics_syncer.os.remove"), \
-             patch("lyrics_syncer.os.rmdir"):
-
+        cwd = os.getcwd()
+        os.chdir(temp_dir)
+        try:
             align_lyrics(song_id)
-
-        output_path = os.path.join(download_path, "lyrics.json")
-        self.assertTrue(os.path.exists(output_path) or mock_gcs.upload_file_to_gcs.called)
-
-        shutil.rmtree(temp_dir)
-
-    @patch("lyrics_syncer.gcs_utils")
-    @patch("lyrics_syncer.notify_event_tracker")
+            self.assertEqual(os.listdir("downloads"), [])
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(temp_dir)
+
+        # The vocals were decoded from memory and ForceAlign got the 16 kHz rendition.
+        mock_load_mono.assert_called_once_with(b"fake_wav_data")
+        audio_file = MockForceAlign.call_args.kwargs["audio_file"]
+        self.assertTrue(audio_file.endswith("vocals_16k.wav"))
+        # Each job works in its own directory, so concurrent jobs for one song don't share files.
+        self.assertTrue(os.path.basename(os.path.dirname(audio_file)).startswith(f"{song_id}-"))
+        mock_gcs.download_file_from_gcs.assert_not_called()
+
+        result = json.loads(uploaded[os.path.join(bucket_path, "lyrics.json")])
+        self.assertEqual([entry["line"] for entry in result], ["hello world", "how are you"])
+        self.assertAlmostEqual(result[0]["start"], 0.2)
+        self.assertAlmostEqual(result[1]["end"], 3.2)
+        self.assertEqual([w["word"] for w in result[1]["words"]], ["how", "are", "you"])
+        self.assertAlmostEqual(result[0]["words"][1]["start"], 0.7)
+        self.assertAlmostEqual(result[0]["words"][1]["end"], 1.2)
+
+        compact = uploaded[os.path.join(bucket_path, "lyrics.compact.json.gz")]
+        self.assertEqual(decode_compact(compact)[1]["words"][2], {"word": "you", "start": 2.7, "end": 3.2})
+
+    def test_build_line_timings_can_leave_out_words(self):
+        aligned = [MagicMock(time_start=1.0, time_end=1.5), MagicMock(time_start=1.5, time_end=2.0)]
+
+        result = build_line_timings([["hi", "there"], []], aligned, word_timings=False)
+
+        self.assertEqual(result, [{"line": "hi there", "start": 0.7, "end": 1.7}])
+
+    @patch("sync_lyrics.gcs_utils")
+    @patch("sync_lyrics.notify_event_tracker")
     def test_callback_missing_lyrics_txt(self, mock_notify, mock_gcs):
         ch = MagicMock()
         method = MagicMock()
@@ -82,7 +128,7 @@ class TestLyricsSyncer(unittest.TestCase):
         mock_notify.assert_called_once()
         ch.basic_nack.assert_called_once_with(delivery_tag="xyz", requeue=False)
 
-    @patch("lyrics_syncer.notify_event_tracker")
+    @patch("sync_lyrics.notify_event_tracker")
     def test_callback_malformed_json(self, mock_notify):
         ch = MagicMock()
         method = MagicMock()
@@ -0,0 +1,59 @@
+import unittest
+import shutil
+import tempfile
+import wave
+
+from vad_benchmark import fixture_lines, fixture_vocals, run_benchmark
+from audio_segments import ALIGN_SAMPLE_RATE
+
+
+class CountingForceAlign:
+    """Stands in for ForceAlign: records how much audio it was given and spreads words over it."""
+
+    seen_seconds = []
+
+    def __init__(self, audio_file, transcript):
+        with wave.open(audio_file, "rb") as wav:
+            self.duration = wav.getnframes() / wav.getframerate()
+        self.words = transcript.split()
+        CountingForceAlign.seen_seconds.append(self.duration)
+
+    def inference(self):
+        step = self.duration / len(self.words)
+        return [type("Word", (), {"word": w, "time_start": i * step, "time_end": (i + 1) * step})()
+                for i, w in enumerate(self.words)]
+
+
+class TestVadBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        CountingForceAlign.seen_seconds = []
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir, ignore_errors=True)
+
+    def test_fixture_has_one_line_per_phrase(self):
+        samples, phrases = fixture_vocals()
+
+        self.assertAlmostEqual(len(samples) / ALIGN_SAMPLE_RATE, 124, delta=0.1)
+        self.assertEqual(len(fixture_lines(phrases)), len(phrases))
+        self.assertEqual(phrases[0][0], 20)
+
+    def test_vad_skips_the_instrumental_parts_of_the_fixture(self):
+        samples, phrases = fixture_vocals()
+
+        report = run_benchmark(samples, fixture_lines(phrases), self.working_dir, force_align=CountingForceAlign)
+
+        full, trimmed = CountingForceAlign.seen_seconds
+        self.assertAlmostEqual(full, report["audio_seconds"], delta=0.01)
+        self.assertAlmostEqual(trimmed / full, 1 - report["skipped_fraction"], delta=0.01)
+        # 60 of the 124 seconds are intro, break and outro; padding keeps a little of each.
+        self.assertGreater(report["skipped_fraction"], 0.4)
+        self.assertLess(report["skipped_fraction"], 60 / 124)
+        for key in ("full_seconds", "vad_seconds", "speedup", "mean_line_start_drift", "max_line_start_drift"):
+            self.assertIn(key, report)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Energy-based voice activity detection for Spleeter vocals stems.
+
+Vocals stems are near-silent through intros, solos and outros, but ForceAlign
+still runs its model over every second of them. trim_to_voice() cuts the
+long silences out before alignment and returns a TimeMap that puts the
+aligned word times back on the original song timeline.
+"""
+import bisect
+import os
+from collections import namedtuple
+
+import numpy as np
+
+FRAME_SECONDS = 0.02
+
+# Frames this far below the song's loud passages count as silence.
+LYRICS_SILENCE_DB = float(os.getenv("LYRICS_SILENCE_DB", "35"))
+LYRICS_VAD = os.getenv("LYRICS_VAD", "true").lower() == "true"
+# Only silences at least this long are cut out; shorter ones are breaths between phrases.
+LYRICS_VAD_MIN_SILENCE_SECONDS = float(os.getenv("LYRICS_VAD_MIN_SILENCE_SECONDS", "1.5"))
+# Audio kept either side of each voiced region, so word onsets and tails aren't clipped.
+LYRICS_VAD_PADDING_SECONDS = float(os.getenv("LYRICS_VAD_PADDING_SECONDS", "0.3"))
+
+# Same fields ForceAlign's word objects expose, so callers can treat both alike.
+AlignedWord = namedtuple("AlignedWord", "word time_start time_end")
+
+
+def frame_energy_db(samples, sample_rate: int, frame_seconds: float = FRAME_SECONDS):
+    """RMS level of each non-overlapping frame, in dBFS."""
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.asarray(samples[:count * frame], dtype=np.float32).reshape(count, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-6))
+
+
+def voiced_frames(energy_db, silence_db: float = LYRICS_SILENCE_DB, floor_db: float = -60.0):
+    """
+    Marks frames with singing in them. The reference level is a high percentile
+    rather than the peak so one transient doesn't push everything into silence.
+    """
+    if len(energy_db) == 0:
+        return np.zeros(0, dtype=bool)
+    reference = np.percentile(energy_db, 99)
+    return energy_db >= max(reference - silence_db, floor_db)
+
+
+def silent_gaps(voiced, min_frames: int):
+    """(start_frame, end_frame) of every unvoiced run at least min_frames long."""
+    gaps = []
+    padded = np.concatenate([[True], voiced, [True]])
+    changes = np.flatnonzero(padded[1:] != padded[:-1])
+    for start, end in zip(changes[::2], changes[1::2]):
+        if end - start >= min_frames:
+            gaps.append((int(start), int(end)))
+    return gaps
+
+
+def voiced_regions(samples, sample_rate: int, min_silence_seconds: float = LYRICS_VAD_MIN_SILENCE_SECONDS,
+                   padding_seconds: float = LYRICS_VAD_PADDING_SECONDS):
+    """(start_sample, end_sample) of the audio to keep: everything but long silences, less padding."""
+    frame = max(1, int(sample_rate * FRAME_SECONDS))
+    voiced = voiced_frames(frame_energy_db(samples, sample_rate))
+    if not voiced.any():
+        return [(0, len(samples))]  # nothing stands out; let the aligner see it all
+
+    padding = int(padding_seconds * sample_rate)
+    regions = []
+    start = 0
+    for gap_start, gap_end in silent_gaps(voiced, max(1, int(min_silence_seconds / FRAME_SECONDS))):
+        cut_start = gap_start * frame + padding if gap_start > 0 else 0
+        cut_end = gap_end * frame - padding if gap_end < len(voiced) else len(samples)
+        if cut_end <= cut_start:
+            continue
+        if cut_start > start:
+            regions.append((start, cut_start))
+        start = cut_end
+    if start < len(samples):
+        regions.append((start, len(samples)))
+    return regions
+
+
+class TimeMap:
+    """Maps times in the trimmed audio back to the original timeline."""
+
+    def __init__(self, regions, sample_rate: int):
+        self.trimmed_starts = []
+        self.original_starts = []
+        position = 0
+        for start, end in regions:
+            self.trimmed_starts.append(position / sample_rate)
+            self.original_starts.append(start / sample_rate)
+            position += end - start
+
+    def to_original(self, seconds: float, end: bool = False) -> float:
+        """
+        A time exactly on a join belongs to the region after it, or to the one
+        before it when end is set (a word ending there doesn't jump the cut silence).
+        """
+        if not self.trimmed_starts:
+            return seconds
+        find = bisect.bisect_left if end else bisect.bisect_right
+        index = max(0, find(self.trimmed_starts, seconds) - 1)
+        return self.original_starts[index] + seconds - self.trimmed_starts[index]
+
+    def remap_words(self, words):
+        """Aligned words (anything with word/time_start/time_end) as AlignedWords on the original timeline."""
+        return [AlignedWord(w.word, self.to_original(w.time_start), self.to_original(w.time_end, end=True))
+                for w in words]
+
+
+def trim_to_voice(samples, sample_rate: int, **kwargs):
+    """
+    Drops long silences from a mono vocals track.
+
+    Returns (trimmed_samples, time_map, skipped_fraction) and logs how much
+    audio the aligner will no longer have to process.
+    """
+    regions = voiced_regions(samples, sample_rate, **kwargs)
+    trimmed = np.concatenate([samples[start:end] for start, end in regions]) if regions else samples[:0]
+    skipped = 1.0 - len(trimmed) / len(samples) if len(samples) else 0.0
+    print(f"[VAD] Skipping {skipped:.1%} of the vocals "
+          f"({(len(samples) - len(trimmed)) / sample_rate:.1f}s of {len(samples) / sample_rate:.1f}s)")
+    return trimmed, TimeMap(regions, sample_rate), skipped
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+
+from voice_activity import AlignedWord, TimeMap, trim_to_voice, voiced_regions
+
+RATE = 1000
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.5 * np.sin(2 * np.pi * 50 * t)).astype(np.float32)
+
+
+def hush(seconds):
+    return np.full(int(seconds * RATE), 1e-4, dtype=np.float32)
+
+
+class TestVoiceActivity(unittest.TestCase):
+
+    def test_long_silences_are_cut_with_padding_and_short_ones_kept(self):
+        samples = np.concatenate([hush(5), tone(2), hush(0.5), tone(2), hush(4), tone(1), hush(3)])
+
+        regions = voiced_regions(samples, RATE, min_silence_seconds=1.5, padding_seconds=0.2)
+
+        self.assertEqual(regions, [(4800, 9700), (13300, 14700)])
+
+    def test_all_quiet_track_is_kept_whole(self):
+        samples = np.zeros(RATE * 3, dtype=np.float32)
+        self.assertEqual(voiced_regions(samples, RATE), [(0, len(samples))])
+
+    def test_time_map_puts_trimmed_times_back_on_the_song_timeline(self):
+        time_map = TimeMap([(4800, 9700), (13300, 14700)], RATE)
+
+        self.assertAlmostEqual(time_map.to_original(0.0), 4.8)
+        self.assertAlmostEqual(time_map.to_original(1.0), 5.8)
+        self.assertAlmostEqual(time_map.to_original(5.0), 13.4)
+        # A word ending exactly on the join stays in the region before the cut.
+        self.assertAlmostEqual(time_map.to_original(4.9, end=True), 9.7)
+        self.assertAlmostEqual(time_map.to_original(4.9), 13.3)
+
+        words = time_map.remap_words([AlignedWord("hey", 4.5, 4.9), AlignedWord("you", 4.9, 5.3)])
+        self.assertEqual([w.word for w in words], ["hey", "you"])
+        np.testing.assert_allclose([(w.time_start, w.time_end) for w in words], [(9.3, 9.7), (13.3, 13.7)])
+
+    def test_trim_to_voice_reports_the_skipped_fraction(self):
+        samples = np.concatenate([hush(6), tone(4), hush(10)])
+
+        trimmed, time_map, skipped = trim_to_voice(samples, RATE, min_silence_seconds=1.0, padding_seconds=0.0)
+
+        self.assertEqual(len(trimmed), 4 * RATE)
+        self.assertAlmostEqual(skipped, 0.8)
+        self.assertAlmostEqual(time_map.to_original(0.5), 6.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -77,6 +77,11 @@ resource "kubernetes_deployment" "frontend" {
             value = "http://auth-service.default.svc.cluster.local:8000"
           }
 
+          env {
+            name  = "LYRICS_STORE"
+            value = "gcs"
+          }
+
 
           volume_mount {
             name       = "gcp-creds"
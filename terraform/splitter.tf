@@ -40,6 +40,28 @@ resource "kubernetes_deployment" "music_splitter" {
             container_port = 8080
           }
 
+          # The worker only consumes after its model has loaded and warmed up;
+          # readiness mirrors that so rollouts and autoscaling wait for it.
+          readiness_probe {
+            http_get {
+              path = "/readyz"
+              port = 8080
+            }
+            initial_delay_seconds = 10
+            period_seconds        = 10
+            failure_threshold     = 3
+          }
+
+          liveness_probe {
+            http_get {
+              path = "/healthz"
+              port = 8080
+            }
+            initial_delay_seconds = 30
+            period_seconds        = 30
+            failure_threshold     = 3
+          }
+
           env {
             name  = "RABBITMQ_HOST"
             value = "rabbitmq.default.svc.cluster.local"
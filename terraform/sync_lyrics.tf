@@ -70,6 +70,11 @@ resource "kubernetes_deployment" "sync_lyrics" {
             value = "/app/torch_cache"
           }
 
+          env {
+            name  = "LYRICS_STORE"
+            value = "gcs"
+          }
+
           volume_mount {
             name       = "gcp-creds"
             mount_path = "/secrets"